@@ -0,0 +1,141 @@
+import json
+import os
+import re
+
+from dart_lexer import IDENT, OPEN, PUNCT, STRING, tokenize
+from repair_cache import CACHE_DIR
+from replace_engine import compile_keys
+from repair_rules import Edit, Rule
+
+# Lookup index over the ARB catalogs under lib/l10n.
+#
+# Every message key in the template catalog (app_en.arb) becomes a set of
+# Dart literals it may appear as in a screen that lost its LanguageProvider:
+# 'addTrip', "addTrip", 'add_trip' and "add_trip", each mapped to the
+# message text quoted and escaped the same way. The index is built once and
+# stored as JSON under the cache dir, keyed on the stat of the catalog it
+# was built from, so a run only parses the ARB JSON again after the catalog
+# changes; in a long --watch session the loaded index is checked against the
+# same stat before each use.
+
+ARB_DIR = 'lib/l10n'
+TEMPLATE_LOCALE = 'en'
+INDEX_VERSION = 2
+
+# Named arguments whose string value is shown to the user
+UI_TEXT_ARGS = {'label', 'labelText', 'hintText', 'helperText', 'errorText',
+                'title', 'subtitle', 'text', 'tooltip', 'semanticLabel', 'message'}
+
+_PLACEHOLDER = re.compile(r"[{}]")
+
+def catalog_path(locale):
+    return os.path.join(ARB_DIR, f'app_{locale}.arb')
+
+def catalog_paths():
+    # The catalogs the index is built from: the template's text is what the
+    # screens had before they lost their LanguageProvider
+    return [catalog_path(TEMPLATE_LOCALE)]
+
+def snake_case(key):
+    return re.sub(r'(?<=[a-z0-9])([A-Z])', r'_\1', key).lower()
+
+def dart_literal(text, quote):
+    text = text.replace('\\', '\\\\').replace('$', '\\$').replace(quote, '\\' + quote)
+    return quote + text.replace('\n', '\\n') + quote
+
+def load_messages(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        catalog = json.load(f)
+    # '@key' entries are metadata, '@@locale' and friends are file attributes
+    return {k: v for k, v in catalog.items() if not k.startswith('@') and isinstance(v, str)}
+
+def build_index():
+    messages = {}
+    for path in catalog_paths():
+        if os.path.exists(path):
+            messages.update(load_messages(path))
+    table = {}
+    for key, text in messages.items():
+        # ICU placeholders, plurals and selects can't become a plain literal
+        if _PLACEHOLDER.search(text):
+            continue
+        for alias in (key, snake_case(key)):
+            for quote in ("'", '"'):
+                table[quote + alias + quote] = dart_literal(text, quote)
+    return table
+
+def _sources_stamp():
+    stamp = []
+    for path in catalog_paths():
+        if os.path.exists(path):
+            st = os.stat(path)
+            stamp.append([path, st.st_mtime_ns, st.st_size])
+    return stamp
+
+# cache_dir -> (stamp, table) of the index loaded last
+_loaded = {}
+
+def load_index(cache_dir=CACHE_DIR):
+    # literal -> replacement literal, rebuilt only when the catalog changed
+    stamp = _sources_stamp()
+    loaded = _loaded.get(cache_dir)
+    if loaded is not None and loaded[0] == stamp:
+        return loaded[1]
+    cache_path = os.path.join(cache_dir, 'arb_index.json')
+    table = None
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached['version'] == INDEX_VERSION and cached['sources'] == stamp:
+            table = cached['table']
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    if table is None:
+        table = build_index()
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = cache_path + f'.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'sources': stamp, 'table': table}, f)
+        os.replace(tmp, cache_path)
+    _loaded[cache_dir] = (stamp, table)
+    return table
+
+def is_ui_text(content, tokens, i):
+    # Text('key') / const Text("key"), or label: 'key' and the like
+    if i < 2:
+        return False
+    before, callee = tokens[i - 1], tokens[i - 2]
+    if before.kind == OPEN and content[before.start] == '(':
+        return callee.kind == IDENT and content[callee.start:callee.end] == 'Text'
+    if before.kind == PUNCT and content[before.start] == ':':
+        return callee.kind == IDENT and content[callee.start:callee.end] in UI_TEXT_ARGS
+    return False
+
+class CatalogRule(Rule):
+    # Replaces catalog key literals with their message text, but only where
+    # the literal is UI text; the same words are also used as map keys and
+    # Firestore fields ('email', 'trips'), which must stay as they are
+    def __init__(self, name):
+        super().__init__(name)
+        self._byte_table = None
+        self._byte_pattern = None
+
+    def may_match_bytes(self, data):
+        # Any catalog literal will do, found in one scan of the bytes; the
+        # pattern is compiled again when the catalog changed
+        table = load_index()
+        if table is not self._byte_table:
+            pattern = compile_keys(table).pattern if table else '(?!)'
+            self._byte_table = table
+            self._byte_pattern = re.compile(pattern.encode('utf-8'))
+        return self._byte_pattern.search(data) is not None
+
+    def edits(self, content):
+        table = load_index()
+        tokens = tokenize(content)
+        for i, token in enumerate(tokens):
+            if token.kind != STRING:
+                continue
+            replacement = table.get(content[token.start:token.end])
+            if replacement is not None and is_ui_text(content, tokens, i):
+                yield Edit(token.start, token.end, replacement, self.name)
@@ -0,0 +1,259 @@
+import argparse
+import importlib
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+from arb_index import ARB_DIR
+from repair_common import iter_dart_files, read_file, write_file
+from repair_rules import STATS
+
+# Benchmarks for the repair passes.
+#
+# Builds synthetic trees at multiples of the size of lib/ from the real
+# screens under lib/views, seeds them with the broken patterns the passes
+# exist to fix and copies in the ARB catalogs the catalog-driven passes
+# read. Every script (and repair_all) is then run from its own command line
+# on a scratch copy of each tree, file walk and writes included, for
+# files/s, MB/s and peak RSS, and where the time goes is profiled rule by
+# rule, using the named rules of repair_rules. Results are written as JSON
+# and can be compared with a saved baseline to catch regressions.
+#
+#   python bench_repairs.py                       # 1x, 10x, 100x
+#   python bench_repairs.py --scales 1 10 --save bench_baseline.json
+#   python bench_repairs.py --baseline bench_baseline.json
+
+CORPUS_DIR = '.bench_corpus'
+TEMPLATE_ROOT = 'lib/views'
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS = [
+    'repair_translations',
+    'repair_translations_class',
+    'fix_translations',
+    'repair_comments',
+    'repair_compilation',
+    'repair_bus_list',
+    'repair_final_syntax',
+    'migrate_calls',
+    'final_fix',
+    'restore_ui_text',
+    'fix_user_pages_text',
+    'repair_all',
+]
+
+# Broken constructs left behind by the LanguageProvider removal, one of them
+# picked per seeded widget. {key} is replaced with a localization-style key.
+BROKEN_SNIPPETS = [
+    "      Text(\n        // '{key}',\n        style: const TextStyle(fontSize: 14),\n      ),\n",
+    "      Text(\n        // '{key}'\n            .toUpperCase(),\n      ),\n",
+    "      // child: Text('{key}'),\n",
+    "      // label: Text(\"{key}\"),\n",
+    "      _kpiCard( // '{key}', 12),\n",
+    "      Text(languageProvider\n          .translate('{key}')),\n",
+    "      Text(Provider.of<LanguageProvider>(context).translate(\"{key}\")),\n",
+    "      Text(lp.translate('{key}')),\n",
+    "      Text(Translations.translate('{key}', lang)),\n",
+    "      Text(\n        // Provider.of<LanguageProvider>(context, listen: false)\n"
+    "            .translate(label.toLowerCase().replaceAll(' ', '_')),\n      ),\n",
+    "      Tab( // text: '{key}'),\n",
+    "      Text(controller.fromCity?.toLowerCase(\n          .replaceAll(' ', '_')),\n",
+]
+
+KEYS = ['good_morning', 'where_from', 'search', 'route_management', 'refunds',
+        'status_pending', 'stat_delayed', 'tab_revenue', 'bulk_booking', 'download_pdf']
+
+def seeded_block(rng, index, count):
+    # A widget full of broken constructs appended to a template file
+    lines = [f"\nclass _BenchSeed{index} extends StatelessWidget {{\n",
+             "  @override\n  Widget build(BuildContext context) {\n",
+             "    final lp = Provider.of<LanguageProvider>(context);\n",
+             "    return Column(children: [\n"]
+    for _ in range(count):
+        lines.append(rng.choice(BROKEN_SNIPPETS).replace('{key}', rng.choice(KEYS)))
+    lines.append("    ]);\n  }\n}\n")
+    return ''.join(lines)
+
+def generate_corpus(out_dir, scale, seed=0, density=8):
+    # Copies lib/views templates until the tree is `scale` times the size of
+    # lib/. Copy 0 keeps the real paths so path-targeted passes still fire.
+    rng = random.Random(seed)
+    templates = [(p, read_file(p)) for p in iter_dart_files(TEMPLATE_ROOT)]
+    target = scale * sum(os.path.getsize(p) for p in iter_dart_files('lib'))
+    written = 0
+    copy = 0
+    shutil.rmtree(out_dir, ignore_errors=True)
+    while written < target:
+        for index, (path, content) in enumerate(templates):
+            if written >= target:
+                break
+            if copy:
+                path = os.path.join(os.path.dirname(path), f'bench_{copy}', os.path.basename(path))
+            content += seeded_block(rng, index, density)
+            path = os.path.join(out_dir, path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_file(path, content)
+            written += len(content.encode('utf-8'))
+        copy += 1
+    copy_catalogs(out_dir)
+
+def copy_catalogs(out_dir):
+    # The catalogs (and the localizations generated from them) the
+    # catalog-driven passes look keys up in
+    shutil.copytree(ARB_DIR, os.path.join(out_dir, ARB_DIR), dirs_exist_ok=True)
+
+def corpus_path(scale):
+    return os.path.join(CORPUS_DIR, f'{scale}x')
+
+def load_fix_content(script):
+    module = importlib.import_module(script)
+    return module.repair_content if script == 'repair_all' else module.fix_content
+
+@contextmanager
+def scratch_copy(corpus):
+    # A throwaway copy of the corpus to run in, so neither the scripts'
+    # writes nor the caches they keep (arb_index, --incremental) end up in it
+    with tempfile.TemporaryDirectory(prefix='bench_') as work:
+        shutil.copytree(os.path.join(corpus, 'lib'), os.path.join(work, 'lib'))
+        yield work
+
+def peak_rss_kb(usage):
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    if sys.platform == 'darwin':
+        return usage.ru_maxrss // 1024
+    return usage.ru_maxrss
+
+def time_script(script, corpus):
+    # Runs in a fresh process, which starts the script's own command line as
+    # its only child, so the children's peak RSS is the script's
+    with scratch_copy(corpus) as work:
+        before = {p: read_file(p) for p in iter_dart_files(os.path.join(work, 'lib'))}
+        size = sum(len(content.encode('utf-8')) for content in before.values())
+        cmd = [sys.executable, os.path.join(HERE, f'{script}.py'), '--no-snapshot']
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=work, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        seconds = time.perf_counter() - start
+        changed = sum(read_file(p) != content for p, content in before.items())
+    return {
+        'files': len(before),
+        'bytes': size,
+        'changed': changed,
+        'seconds': seconds,
+        'files_per_s': len(before) / seconds if seconds else 0.0,
+        'mb_per_s': size / 1e6 / seconds if seconds else 0.0,
+        'peak_rss_kb': peak_rss_kb(resource.getrusage(resource.RUSAGE_CHILDREN)),
+    }
+
+def profile_rules(script, corpus):
+    # Per named rule (see repair_rules): matches, time in the rule and its
+    # throughput over the corpus
+    fix_content = load_fix_content(script)
+    with scratch_copy(corpus) as work:
+        os.chdir(work)
+        contents = [(p, read_file(p)) for p in iter_dart_files('lib')]
+        STATS.enabled = True
+        for filepath, content in contents:
+            STATS.filepath = filepath
+            fix_content(filepath, content)
+        os.chdir(HERE)
+    size = sum(len(c.encode('utf-8')) for _, c in contents)
+    stats = {}
+    for name, entry in STATS.by_rule().items():
+        stats[name] = {
+            'matches': entry['matches'],
+            'files': len(entry['files']),
+            'seconds': entry['seconds'],
+            'bytes_delta': entry['bytes_delta'],
+            'mb_per_s': size / 1e6 / entry['seconds'] if entry['seconds'] else 0.0,
+        }
+    return stats
+
+def run_worker(kind, script, corpus):
+    cmd = [sys.executable, os.path.abspath(__file__), '--worker', kind, script, os.path.abspath(corpus)]
+    out = subprocess.run(cmd, check=True, capture_output=True, text=True,
+                         cwd=HERE).stdout
+    return json.loads(out)
+
+def compare(results, baseline, threshold):
+    # Flags scripts whose throughput dropped by more than `threshold`
+    regressions = []
+    for scale, scripts in results['scales'].items():
+        for script, result in scripts.items():
+            before = baseline.get('scales', {}).get(scale, {}).get(script)
+            if before and before['mb_per_s'] and result['mb_per_s'] < before['mb_per_s'] * (1 - threshold):
+                regressions.append(f"{scale} {script}: {before['mb_per_s']:.2f} -> {result['mb_per_s']:.2f} MB/s")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the repair passes on synthetic trees")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--scripts', nargs='+', default=SCRIPTS, choices=SCRIPTS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--regenerate', action='store_true', help="rebuild the corpora even if present")
+    parser.add_argument('--no-rules', action='store_true', help="skip the per-rule profile")
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--save', metavar='BASELINE', help="also store the results as a baseline")
+    parser.add_argument('--baseline', help="compare against a saved baseline; exit 1 on regressions")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="allowed throughput drop against the baseline (default: 0.2)")
+    parser.add_argument('--worker', nargs=3, metavar=('KIND', 'SCRIPT', 'CORPUS'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        kind, script, corpus = args.worker
+        result = time_script(script, corpus) if kind == 'time' else profile_rules(script, corpus)
+        json.dump(result, sys.stdout)
+        return
+
+    results = {'python': sys.version.split()[0], 'seed': args.seed, 'scales': {}, 'rules': {}}
+    for scale in args.scales:
+        corpus = corpus_path(scale)
+        if args.regenerate or not os.path.isdir(corpus):
+            print(f"Generating {scale}x corpus in {corpus}")
+            generate_corpus(corpus, scale, args.seed)
+        elif not os.path.isdir(os.path.join(corpus, ARB_DIR)):
+            # A corpus generated before the catalogs were copied in
+            copy_catalogs(corpus)
+        label = f'{scale}x'
+        results['scales'][label] = {}
+        for script in args.scripts:
+            result = run_worker('time', script, corpus)
+            results['scales'][label][script] = result
+            print(f"{label:>5} {script:<26} {result['files']:>7} files {result['seconds']:8.3f}s "
+                  f"{result['files_per_s']:9.1f} files/s {result['mb_per_s']:7.2f} MB/s "
+                  f"{result['peak_rss_kb'] / 1024:7.1f} MB peak")
+
+    if not args.no_rules:
+        # One profile on the smallest tree is enough to rank the rules
+        corpus = corpus_path(min(args.scales))
+        for script in args.scripts:
+            if script != 'repair_all':
+                results['rules'][script] = run_worker('rules', script, corpus)
+        print("\nSlowest rules:")
+        rules = [(entry['seconds'], name, entry) for script_rules in results['rules'].values()
+                 for name, entry in script_rules.items()]
+        for seconds, name, entry in sorted(rules, reverse=True)[:15]:
+            print(f"  {name:<48} {entry['matches']:>7} matches {seconds:8.4f}s {entry['mb_per_s']:9.2f} MB/s")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
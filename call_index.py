@@ -0,0 +1,292 @@
+import argparse
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+from dart_lexer import CLOSE, COMMENTS, IDENT, OPEN, PUNCT, tokenize
+from repair_common import iter_dart_files, read_file
+from repair_rules import NOTICES, Edit, Rule, check_edits
+
+# Index of call sites, and the signature migrations that run off it.
+#
+# One pass over a file's tokens finds every `name(` / `a.b.name(` /
+# `Name<T>(` call with its arguments: for each, the name if it is a named
+# argument and the span of its expression. Commented-out code isn't
+# indexed. A parameter list that looks like a call but is followed by a
+# body (`{`, `=>`, `async`) is kept as a declaration, which migrations
+# leave alone, as is one directly in a class body followed by `;` (a
+# constructor without a body, an abstract method) or `:` (an initializer
+# list), unless it comes after the `=` of a field initializer.
+#
+# A MigrationRule changes the named arguments of every call to one callee
+# at once, from that index: rename, drop, or retype (rewrite the
+# expression, e.g. `t.tripId` -> `t`, where it has the expected shape).
+# A call site whose renamed argument doesn't have that shape is left alone
+# and reported for migrating by hand.
+#
+#   python call_index.py ConductorTripManagementScreen Navigator.pushReplacement
+
+CallSite = namedtuple('CallSite', 'callee start open close args declaration')
+# `start` is where the argument begins (its name, if named), `value` where
+# its expression does
+Argument = namedtuple('Argument', 'name start value end')
+
+# Words that take a parenthesized expression without being calls
+_NOT_CALLEES = {'if', 'for', 'while', 'switch', 'catch', 'return', 'on', 'in', 'assert', 'super', 'this'}
+# What follows a parameter list rather than an argument list; `;` and `:`
+# only directly in a class body
+_BODY_STARTS = {'{', '=>', 'async', 'sync'}
+_MEMBER_ENDS = {';', ':'}
+# Words that open a body of class members
+_CLASS_WORDS = {'class', 'mixin', 'extension'}
+
+def _code(tokens):
+    # The tokens that aren't comments
+    return [token for token in tokens if token.kind not in COMMENTS]
+
+def _callee(content, tokens, i):
+    # The name called by the `(` at tokens[i], e.g. 'Navigator.push', or None
+    j = i - 1
+    if j >= 0 and content[tokens[j].start] == '>' and tokens[j].kind == PUNCT:
+        # Type arguments: Name<A, B<C>>(
+        depth = 0
+        while j >= 0:
+            char = content[tokens[j].start]
+            if tokens[j].kind == PUNCT and char in '<>':
+                depth += 1 if char == '>' else -1
+            elif tokens[j].kind != IDENT and char not in ',.?':
+                return None
+            j -= 1
+            if depth == 0:
+                break
+    if j < 0 or tokens[j].kind != IDENT:
+        return None
+    end = tokens[j].end
+    start = tokens[j].start
+    while j >= 2 and content[tokens[j - 1].start:tokens[j - 1].end] == '.' and tokens[j - 2].kind == IDENT:
+        j -= 2
+        start = tokens[j].start
+    name = content[start:end]
+    if name in _NOT_CALLEES:
+        return None
+    return name, start
+
+def _after(content, tokens, i):
+    # The text of the code token after tokens[i], with `=>` read as one
+    if i + 1 >= len(tokens):
+        return ''
+    token = tokens[i + 1]
+    text = content[token.start:token.end]
+    if text == '=' and i + 2 < len(tokens) and content[tokens[i + 2].start] == '>' \
+            and tokens[i + 2].start == token.end:
+        return '=>'
+    return text
+
+def _argument(content, tokens, first, last):
+    # The Argument made of tokens[first..last]
+    start = tokens[first].start
+    end = tokens[last].end
+    if first + 1 < last and tokens[first].kind == IDENT and tokens[first + 1].kind == PUNCT \
+            and content[tokens[first + 1].start] == ':':
+        return Argument(content[start:tokens[first].end], start, tokens[first + 2].start, end)
+    return Argument(None, start, start, end)
+
+@lru_cache(maxsize=32)
+def index_calls(content):
+    # Every call site in the file, in the order their `(` appear
+    tokens = _code(tokenize(content))
+    sites = []
+    # One frame per open bracket: [site, args, first token of the current
+    # argument, last token of it, member]; `site` is None for brackets that
+    # aren't call parens, `member` is None except for class bodies, where it
+    # says whether the current member has had its `=` (or `=>`)
+    stack = []
+    class_header = False
+
+    def take(i):
+        if stack:
+            frame = stack[-1]
+            if frame[2] is None:
+                frame[2] = i
+            frame[3] = i
+
+    def finish(frame):
+        if frame[0] is not None and frame[2] is not None:
+            frame[1].append(_argument(content, tokens, frame[2], frame[3]))
+        frame[2] = frame[3] = None
+
+    for i, token in enumerate(tokens):
+        char = content[token.start]
+        member = stack[-1][4] if stack else None
+        if token.kind == OPEN:
+            take(i)
+            callee = _callee(content, tokens, i) if char == '(' else None
+            site = None
+            if callee is not None:
+                site = [callee[0], callee[1], token.start]
+                sites.append(site)
+            body = char == '{' and class_header
+            class_header = class_header and not body
+            stack.append([site, [], None, None, False if body else None])
+        elif token.kind == CLOSE:
+            if not stack:
+                continue
+            frame = stack.pop()
+            finish(frame)
+            site = frame[0]
+            if site is not None:
+                after = _after(content, tokens, i)
+                # stack[-1] is now the frame the call sits in
+                in_member = bool(stack) and stack[-1][4] is False
+                declaration = after in _BODY_STARTS or (after in _MEMBER_ENDS and in_member)
+                site.extend([token.start, tuple(frame[1]), declaration])
+            if char == '}' and stack and stack[-1][4] is not None:
+                # A method body ends its member
+                stack[-1][4] = False
+            take(i)
+        elif token.kind == PUNCT and char == ',' and stack:
+            finish(stack[-1])
+        else:
+            take(i)
+            if token.kind == IDENT and content[token.start:token.end] in _CLASS_WORDS:
+                class_header = True
+            elif token.kind == PUNCT and char == ';':
+                class_header = False
+                if member is not None:
+                    stack[-1][4] = False
+            elif token.kind == PUNCT and char == '=' and member is not None:
+                stack[-1][4] = True
+    for frame in stack:
+        # Never closed: the arguments up to the end of the file
+        finish(frame)
+        if frame[0] is not None:
+            frame[0].extend([None, tuple(frame[1]), False])
+    return tuple(CallSite(*site) for site in sites)
+
+def calls_to(content, callee):
+    return [site for site in index_calls(content) if site.callee == callee]
+
+def position(content, offset):
+    # (line, column), both from 1
+    line = content.count('\n', 0, offset) + 1
+    return line, offset - content.rfind('\n', 0, offset)
+
+def build_index(root_dir='lib'):
+    # callee -> [(filepath, CallSite)] across the tree, one tokenize per file
+    index = {}
+    for filepath in iter_dart_files(root_dir):
+        for site in index_calls(read_file(filepath)):
+            index.setdefault(site.callee, []).append((filepath, site))
+    return index
+
+class MigrationRule(Rule):
+    # A signature change of `callee`, applied to its named arguments at every
+    # call site:
+    #   rename   {old name: new name}; a call that already passes the new
+    #            name as well is left to be migrated by hand (manual)
+    #   drop     names whose arguments are removed, with their comma
+    #   retype   {name (after renaming): (pattern, template)}; an expression
+    #            the pattern matches in full is replaced by the expanded
+    #            template, any other is left as it is. An argument renamed
+    #            into a retyped one changes type with its name, so a call
+    #            site where its expression doesn't match isn't migrated at
+    #            all but left to be migrated by hand (manual)
+    def __init__(self, name, callee, rename=None, drop=(), retype=None, paths=None):
+        super().__init__(name, paths, (callee.rsplit('.', 1)[-1],))
+        self.callee = callee
+        self.rename = dict(rename or {})
+        self.drop = set(drop)
+        self.retype = {arg: (re.compile(pattern), template) for arg, (pattern, template) in (retype or {}).items()}
+
+    def _drops(self, site):
+        # Spans removing the dropped arguments, each with one comma
+        args = site.args
+        dropped = [i for i, arg in enumerate(args) if arg.name in self.drop]
+        if not dropped:
+            return []
+        kept = [i for i in range(len(args)) if i not in dropped]
+        if not kept:
+            # Whatever the parens hold goes
+            return [(site.open + 1, site.close if site.close is not None else args[-1].end)]
+        spans = [(args[i].start, args[i + 1].start) for i in dropped if i < kept[-1]]
+        if dropped[-1] > kept[-1]:
+            # The trailing ones go with the comma in front of them
+            spans.append((args[kept[-1]].end, args[dropped[-1]].end))
+        return spans
+
+    def _blocked(self, content, site):
+        # (argument, why) for a call site the migration can't rewrite, or
+        # None: a renamed argument whose new name the call already passes,
+        # or whose expression the retype pattern doesn't match
+        passed = {arg.name for arg in site.args}
+        for arg in site.args:
+            name = self.rename.get(arg.name, arg.name)
+            if arg.name is None or name == arg.name:
+                continue
+            if name in passed:
+                return arg, f"the call already passes `{name}`"
+            if name in self.retype and not self.retype[name][0].fullmatch(content, arg.value, arg.end):
+                return arg, "the expression isn't a form the migration knows"
+        return None
+
+    def manual(self, content):
+        # (site, argument, why) for every call site edits() leaves alone
+        found = []
+        for site in calls_to(content, self.callee):
+            blocked = None if site.declaration else self._blocked(content, site)
+            if blocked is not None:
+                found.append((site, *blocked))
+        return found
+
+    def edits(self, content):
+        # Sorted, since a call's edits can come after those of the calls
+        # nested in it
+        edits = []
+        for site in calls_to(content, self.callee):
+            if site.declaration or self._blocked(content, site) is not None:
+                continue
+            for start, end in self._drops(site):
+                edits.append(Edit(start, end, '', self.name))
+            for arg in site.args:
+                if arg.name is None or arg.name in self.drop:
+                    continue
+                name = self.rename.get(arg.name, arg.name)
+                if name != arg.name:
+                    edits.append(Edit(arg.start, arg.start + len(arg.name), name, self.name))
+                if name in self.retype:
+                    pattern, template = self.retype[name]
+                    m = pattern.fullmatch(content, arg.value, arg.end)
+                    if m and m.expand(template) != m.group():
+                        edits.append(Edit(arg.value, arg.end, m.expand(template), self.name))
+        return check_edits(edits)
+
+def note_manual(filepath, content, rules):
+    # Notes the call sites the migrations leave to be done by hand, for the
+    # runner to warn about once (repair_rules.NOTICES)
+    for rule in rules:
+        if not rule.applies_to(filepath) or not rule.may_match(content):
+            continue
+        for site, arg, why in rule.manual(content):
+            line, col = position(content, arg.start)
+            text = ' '.join(content[arg.start:arg.end].split())
+            NOTICES.add(f"{filepath}:{line}:{col}: {rule.name}: `{text}` not migrated, {why}; "
+                        f"migrate this call by hand")
+
+def main():
+    parser = argparse.ArgumentParser(description="List the call sites of functions and constructors")
+    parser.add_argument('--root', default='lib')
+    parser.add_argument('callees', nargs='+', metavar='CALLEE', help="e.g. Text or Navigator.push")
+    args = parser.parse_args()
+
+    index = build_index(args.root)
+    for callee in args.callees:
+        for filepath, site in index.get(callee, ()):
+            content = read_file(filepath)
+            line, col = position(content, site.start)
+            arguments = ', '.join((f"{arg.name}: " if arg.name else '') + ' '.join(content[arg.value:arg.end].split())
+                                  for arg in site.args)
+            kind = ' (declaration)' if site.declaration else ''
+            print(f"{filepath}:{line}:{col}: {callee}({arguments}){kind}")
+
+if __name__ == "__main__":
+    main()
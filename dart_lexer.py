@@ -0,0 +1,394 @@
+import bisect
+import re
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
+from itertools import compress
+from operator import itemgetter
+
+# Streaming Dart tokenizer shared by the repair passes.
+#
+# A file is tokenized once, left to right, into (kind, start, end) spans over
+# the original text. Whitespace is skipped; everything else, including
+# comments, is a token. String literals (raw, triple-quoted, with nested
+# ${...} interpolation) come out as a single token so rules never match
+# inside them by accident. tokenize() is memoised on the content, so passes
+# that leave a file unchanged all share the same token list, and a file a
+# pass rewrote is lexed again only around the text the pass changed.
+
+Token = namedtuple('Token', 'kind start end')
+# Token's own __new__, without the call through Python it makes
+_new_token = tuple.__new__
+
+IDENT = 'ident'
+NUMBER = 'number'
+STRING = 'string'
+UNTERMINATED_STRING = 'unterminated_string'
+LINE_COMMENT = 'line_comment'
+BLOCK_COMMENT = 'block_comment'
+OPEN = 'open'
+CLOSE = 'close'
+PUNCT = 'punct'
+
+COMMENTS = (LINE_COMMENT, BLOCK_COMMENT)
+STRINGS = (STRING, UNTERMINATED_STRING)
+
+# A match starts with the whitespace before the token. Comments that
+# hold no nested comment and one-line strings whose interpolations are
+# plain `${...}` (no brackets, quotes, slashes) are matched whole; any other
+# comment or string stops at its opening and is finished by
+# _block_comment_end or _string_end.
+_TOKEN = re.compile(r"""
+    \s*(?:
+    (?P<line_comment>//[^\n]*)
+  | (?P<block_comment>/\*[^*/]*(?:(?:\*(?!/)|/(?!\*))[^*/]*)*\*/)
+  | (?P<comment_open>/\*)
+  | (?P<string>r'(?!'')[^'\n]*'|r"(?!"")[^"\n]*"
+             |'(?!'')[^'\\$\n]*(?:(?:\\.|\$(?!\{)|\$\{[^{}'"\n/]*\})[^'\\$\n]*)*'
+             |"(?!"")[^"\\$\n]*(?:(?:\\.|\$(?!\{)|\$\{[^{}'"\n/]*\})[^"\\$\n]*)*")
+  | (?P<quote>r?(?:'''|\"\"\"|'|\"))
+  | (?P<ident>[A-Za-z_$][\w$]*)
+  | (?P<number>0[xX][0-9a-fA-F]+|\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+  | (?P<open>[(\[{])
+  | (?P<close>[)\]}])
+  | (?P<punct>\S))
+""", re.VERBOSE | re.DOTALL)
+
+_BLOCK_COMMENT_DELIM = re.compile(r"/\*|\*/")
+
+# Characters a string body can skip over without looking at them
+_STRING_BODY = {
+    ("'", False): re.compile(r"[^'\\$\n]*"),
+    ('"', False): re.compile(r'[^"\\$\n]*'),
+    ("'''", False): re.compile(r"[^'\\$]*"),
+    ('"""', False): re.compile(r'[^"\\$]*'),
+    ("'", True): re.compile(r"[^'\n]*"),
+    ('"', True): re.compile(r'[^"\n]*'),
+    ("'''", True): re.compile(r"[^']*"),
+    ('"""', True): re.compile(r'[^"]*'),
+}
+
+def _block_comment_end(content, pos):
+    # Dart block comments nest
+    depth = 1
+    while depth:
+        m = _BLOCK_COMMENT_DELIM.search(content, pos)
+        if m is None:
+            return len(content)
+        depth += 1 if m.group() == '/*' else -1
+        pos = m.end()
+    return pos
+
+def _interpolation_end(content, pos, triple):
+    # `pos` is just past `${`; returns the position just past its `}`. In a
+    # single-line string an unclosed `${` ends with the line, so a file full
+    # of them doesn't nest one string inside the next all the way down.
+    depth = 1
+    while pos < len(content):
+        last = pos
+        kind, start, pos = _next_token(content, pos)
+        if not triple and content.find('\n', last, start) != -1:
+            return content.find('\n', last, start)
+        if kind == OPEN and content[start] == '{':
+            depth += 1
+        elif kind == CLOSE and content[start] == '}':
+            depth -= 1
+            if depth == 0:
+                return pos
+    return pos
+
+def _string_end(content, pos, quote, raw):
+    # `pos` is just past the opening quote; returns (end, terminated)
+    body = _STRING_BODY[(quote, raw)]
+    triple = len(quote) == 3
+    n = len(content)
+    while True:
+        pos = body.match(content, pos).end()
+        if pos >= n:
+            return n, False
+        if content.startswith(quote, pos):
+            return pos + len(quote), True
+        ch = content[pos]
+        if ch == '\n' and not triple:
+            return pos, False
+        if ch == '\\' and not raw:
+            pos += 2
+        elif ch == '$' and not raw and content.startswith('${', pos):
+            pos = _interpolation_end(content, pos + 2, triple)
+        else:
+            # `$name`, or a lone quote inside a triple-quoted string
+            pos += 1
+
+_IDENT_AT = re.compile(r"[A-Za-z_][\w]*")
+
+def string_parts(content, token):
+    # The pieces of a one-line, non-raw string literal: ('text', start, end)
+    # for runs of literal text (escapes as written) and ('expr', start, end)
+    # for each interpolated expression, `$name` or the inside of `${...}`.
+    # None for raw, triple-quoted and unterminated strings.
+    quote = content[token.start]
+    if token.kind != STRING or quote not in '\'"' or content.startswith(quote * 3, token.start):
+        return None
+    parts = []
+    pos = run = token.start + 1
+    end = token.end - 1
+    while pos < end:
+        char = content[pos]
+        if char == '\\':
+            pos += 2
+            continue
+        if char != '$':
+            pos += 1
+            continue
+        if content.startswith('${', pos):
+            expr_end = _interpolation_end(content, pos + 2, False)
+            parts.append(('expr', pos + 2, expr_end - 1))
+        else:
+            m = _IDENT_AT.match(content, pos + 1)
+            if m is None:
+                pos += 1
+                continue
+            expr_end = m.end()
+            parts.append(('expr', pos + 1, expr_end))
+        if run < pos:
+            parts.insert(-1, ('text', run, pos))
+        pos = run = expr_end
+    if run < end:
+        parts.append(('text', run, end))
+    return parts
+
+def _finish(content, m):
+    # (kind, start, end) of a token _TOKEN matched only the opening of
+    if m.lastgroup == 'comment_open':
+        return BLOCK_COMMENT, m.start('comment_open'), _block_comment_end(content, m.end())
+    text = m.group('quote')
+    end, terminated = _string_end(content, m.end(), text.lstrip('r'), text.startswith('r'))
+    return (STRING if terminated else UNTERMINATED_STRING), m.start('quote'), end
+
+_UNFINISHED = ('comment_open', 'quote')
+
+def _next_token(content, pos):
+    m = _TOKEN.match(content, pos)
+    if m is None:
+        return None, len(content), len(content)
+    kind = m.lastgroup
+    if kind in _UNFINISHED:
+        return _finish(content, m)
+    return kind, m.start(kind), m.end()
+
+# A token is decided by the text from where it starts to this many
+# characters past its end (`1` looks ahead for `.5` or `e+5`)
+LOOKAHEAD = 3
+_CACHE_SIZE = 32
+_cache = OrderedDict()
+
+def _common_prefix(a, b, limit):
+    # Length of the common prefix of a and b, at most `limit`, found by
+    # halving: each probe compares one slice in C
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def _common_suffix(a, b, limit):
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:len(a) - lo] == b[len(b) - mid:len(b) - lo]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def common_ends(old, new):
+    # (prefix, suffix): the lengths of the text old and new start and end
+    # with, not overlapping, so old[prefix:len(old) - suffix] became
+    # new[prefix:len(new) - suffix]
+    limit = min(len(old), len(new))
+    prefix = _common_prefix(old, new, limit)
+    return prefix, _common_suffix(old, new, limit - prefix)
+
+# Past the first change, every so many tokens (twice as many after each
+# miss) lexing looks for the text of the token it just lexed in the next
+# _WINDOW characters of `old`, and takes over `old`'s tokens for as long as
+# the two agree: a pass that made a few edits far apart is lexed again only
+# around each of them
+_RESYNC = 8
+_PROBE = 24
+_WINDOW = 4096
+
+def _realign(old, old_tokens, content, start, lo):
+    # (first, last, shift): old_tokens[first:last] moved on by `shift` are
+    # tokens of content from `start` on. None if they can't be found.
+    at = old.find(content[start:start + _PROBE], lo, lo + _WINDOW)
+    if at == -1:
+        return None
+    first = bisect.bisect_left(old_tokens, at, key=lambda token: token.start)
+    if first == len(old_tokens) or old_tokens[first].start != at:
+        return None
+    same = _common_prefix(content[start:start + _WINDOW], old[at:at + _WINDOW], _WINDOW)
+    last = bisect.bisect_right(old_tokens, at + same - LOOKAHEAD, key=lambda token: token.end)
+    if last - first < 2:
+        return None
+    return first, last, start - at
+
+def _relex(old, old_tokens, content):
+    # The tokens of `content`, reusing those of `old` outside the span where
+    # the two differ. Tokens that end before the first change (with room for
+    # their lookahead) are kept as they are; lexing starts after them and
+    # stops at the first token past the last change that starts where one of
+    # `old`'s did, since everything from there on is the same text. In
+    # between, _realign skips over the text the changes left alone. With
+    # old = '' this is a plain left-to-right lex.
+    prefix, suffix = common_ends(old, content)
+    delta = len(content) - len(old)
+    changed_end = len(content) - suffix
+    keep = bisect.bisect_right(old_tokens, prefix - LOOKAHEAD, key=lambda token: token.end)
+    tokens = list(old_tokens[:keep])
+    pos = lo = tokens[-1].end if tokens else 0
+    append = tokens.append
+    n = len(content)
+    interval = wait = _RESYNC
+    while pos < n:
+        # One finditer runs until a token it only matched the opening of
+        for m in _TOKEN.finditer(content, pos):
+            kind = m.lastgroup
+            if kind in _UNFINISHED:
+                kind, start, pos = _finish(content, m)
+            else:
+                start, pos = m.span(kind)
+            if start >= changed_end:
+                i = bisect.bisect_left(old_tokens, start - delta, key=lambda token: token.start)
+                if i < len(old_tokens) and old_tokens[i].start == start - delta:
+                    if delta:
+                        tokens.extend(_new_token(Token, (token.kind, token.start + delta, token.end + delta))
+                                      for token in old_tokens[i:])
+                    else:
+                        tokens.extend(old_tokens[i:])
+                    return tuple(tokens)
+            wait -= 1
+            if not wait and old_tokens:
+                found = _realign(old, old_tokens, content, start, lo)
+                if found:
+                    first, last, shift = found
+                    tokens.extend(_new_token(Token, (token.kind, token.start + shift, token.end + shift))
+                                  for token in old_tokens[first:last])
+                    lo = old_tokens[last - 1].end
+                    pos = lo + shift
+                    interval = wait = _RESYNC
+                    break
+                interval *= 2
+                wait = interval
+            append(_new_token(Token, (kind, start, pos)))
+            if pos != m.end():
+                break
+        else:
+            break
+    return tuple(tokens)
+
+def tokenize(content):
+    # Memoised on the content. Content not seen yet is lexed against the
+    # content tokenized last, which in a pass chain is the same file as the
+    # previous pass left it.
+    tokens = _cache.get(content)
+    if tokens is not None:
+        _cache.move_to_end(content)
+        return tokens
+    if _cache:
+        old = next(reversed(_cache))
+        tokens = _relex(old, _cache[old], content)
+    else:
+        tokens = _relex('', (), content)
+    _cache[content] = tokens
+    if len(_cache) > _CACHE_SIZE:
+        _cache.popitem(last=False)
+    return tokens
+
+def clear_cache():
+    _cache.clear()
+    _tokens_of.cache_clear()
+
+def token_text(content, token):
+    return content[token.start:token.end]
+
+def line_end(content, pos, lines=0):
+    # End of the line holding `pos`, or of the line `lines` lines below it
+    for _ in range(lines + 1):
+        end = content.find('\n', pos)
+        if end == -1:
+            return len(content)
+        pos = end + 1
+    return pos - 1
+
+# Brackets, statement ends and (skipped) single-line string literals
+_CONSTRUCT_DELIM = re.compile(r"""[()\[\]{};]|'(?:[^'\\\n]|\\.)*'?|"(?:[^"\\\n]|\\.)*"?""")
+
+def construct_end(content, pos, bracketed, limit):
+    # End of the construct starting at `pos`, without tokenizing: just past
+    # the bracket matching the first one opened when `bracketed`, otherwise
+    # just past the `;` ending the statement, or at the bracket closing the
+    # one the construct sits in. Comments are read as code, since the passes
+    # rewrite commented-out code. Never more than `limit` characters on.
+    stop = min(len(content), pos + limit)
+    depth = 0
+    for m in _CONSTRUCT_DELIM.finditer(content, pos, stop):
+        char = content[m.start()]
+        if char in '([{':
+            depth += 1
+        elif char in ')]}':
+            depth -= 1
+            if depth < 0:
+                return m.start()
+            if depth == 0 and bracketed:
+                return m.end()
+        elif char == ';' and depth == 0 and not bracketed:
+            return m.end()
+    return stop
+
+@lru_cache(maxsize=64)
+def _tokens_of(content, kind, text):
+    # The tokens of `kind`, spelled `text` unless it is None. Picked out by
+    # kind in C, since most of a file is tokens of other kinds, and kept:
+    # the rules of a pass look for the same kinds in the same text.
+    tokens = tokenize(content)
+    found = compress(tokens, map(kind.__eq__, map(itemgetter(0), tokens)))
+    if text is not None:
+        return tuple(token for token in found if content[token.start:token.end] == text)
+    return tuple(found)
+
+def match_tokens(pattern, content, kind, text=None, lines=None):
+    # pattern.finditer restricted to real tokens: `pattern` is only tried
+    # (anchored) where a token of `kind` starts, optionally only tokens
+    # spelled `text`. The match must end inside the token itself, or with
+    # `lines` set, before the end of the line that many lines below it.
+    # Matches don't overlap.
+    last = 0
+    for token in _tokens_of(content, kind, text):
+        if token.start < last:
+            continue
+        endpos = token.end if lines is None else line_end(content, token.start, lines)
+        m = pattern.match(content, token.start, endpos)
+        if m:
+            yield m
+            last = m.end()
+
+def subn_tokens(pattern, repl, content, kind, text=None, lines=None):
+    # re.subn over match_tokens. Returns the new content, built in a single
+    # join, and the number of matches.
+    parts = []
+    last = 0
+    for m in match_tokens(pattern, content, kind, text, lines):
+        parts.append(content[last:m.start()])
+        parts.append(repl(m) if callable(repl) else m.expand(repl))
+        last = m.end()
+    if not parts:
+        return content, 0
+    matches = len(parts) // 2
+    parts.append(content[last:])
+    return ''.join(parts), matches
+
+def sub_tokens(pattern, repl, content, kind, text=None, lines=None):
+    return subn_tokens(pattern, repl, content, kind, text, lines)[0]
@@ -0,0 +1,240 @@
+import bisect
+import sys
+from collections import Counter, OrderedDict, namedtuple
+from itertools import compress
+from operator import itemgetter
+
+from dart_lexer import (BLOCK_COMMENT, CLOSE, LINE_COMMENT, LOOKAHEAD, OPEN, UNTERMINATED_STRING, common_ends,
+                        tokenize)
+from repair_rules import EditConflict
+
+# Structural check of a Dart file, in place of waiting on `flutter analyze`.
+#
+# One pass over the tokens finds unbalanced ( [ {, unterminated strings and
+# block comments. An opener that is never closed also names the line
+# comments after it that hold closing delimiters, which is how a pass that
+# comments out a line usually breaks a file: `// ),` swallows the `)` the
+# `Text(` above it needed.
+#
+# Every pass is guarded with it: a rewrite that leaves the file with a
+# problem it didn't have is rejected and the pass's input kept, even if the
+# rewrite fixed others, as is one whose rules made overlapping edits
+# (repair_rules.EditConflict). A pass
+# that chains other passes (a module with PASSES, i.e. repair_all) isn't
+# guarded as a whole, since the scheduler guards each of the passes it
+# runs.
+#
+#   python dart_validate.py [path ...]   # default: every .dart file under lib/
+
+Problem = namedtuple('Problem', 'line col message')
+
+PAIRS = {')': '(', ']': '[', '}': '{'}
+
+# Turned off by --no-validate
+ENABLED = True
+
+class _Lines:
+    # Line starts are only looked for once a position is asked for, which
+    # for a sound file is never
+    def __init__(self, content):
+        self.content = content
+        self.starts = None
+
+    def position(self, offset):
+        if self.starts is None:
+            self.starts = [0]
+            pos = self.content.find('\n')
+            while pos != -1:
+                self.starts.append(pos + 1)
+                pos = self.content.find('\n', pos + 1)
+        line = bisect.bisect_right(self.starts, offset)
+        return line, offset - self.starts[line - 1] + 1
+
+def _closers(text):
+    # Closing delimiters a comment would have needed left uncommented, e.g.
+    # `),` in `// ),`
+    depth = {}
+    swallowed = []
+    for char in text:
+        if char in '([{':
+            depth[char] = depth.get(char, 0) + 1
+        elif char in PAIRS:
+            opener = PAIRS[char]
+            if depth.get(opener):
+                depth[opener] -= 1
+            else:
+                swallowed.append(char)
+    return ''.join(swallowed)
+
+def _unclosed(content, lines, opener, closer):
+    message = f"`{content[opener]}` is never closed"
+    if closer is not None:
+        line, col = lines.position(closer)
+        message = f"`{content[opener]}` is not closed before the `{content[closer]}` at {line}:{col}"
+    # The opener is still open at every line comment up to the closer
+    tokens = tokenize(content)
+    first = bisect.bisect_right(tokens, opener, key=lambda token: token.start)
+    for token in tokens[first:]:
+        if closer is not None and token.start >= closer:
+            break
+        if token.kind == LINE_COMMENT:
+            closers = _closers(content[token.start + 2:token.end])
+            if closers:
+                line, col = lines.position(token.start)
+                return message + f"; the comment at {line}:{col} swallows `{closers}`"
+    return message
+
+def _message(content, lines, offset, kind, closer):
+    if kind.startswith('extra '):
+        return f"`{content[offset]}` has nothing to close"
+    if kind.startswith('unclosed '):
+        return _unclosed(content, lines, offset, closer)
+    if kind == 'string':
+        return "unterminated string"
+    return "unterminated block comment"
+
+# The only tokens the scan looks at
+_CHECKED = frozenset((OPEN, CLOSE, UNTERMINATED_STRING, BLOCK_COMMENT))
+
+# Every this many checked tokens the scan saves where it got to, so a file
+# a pass rewrote is scanned again only from before the first change
+_STRIDE = 64
+_CACHE_SIZE = 16
+_scans = OrderedDict()
+
+def _scan(content):
+    # (offset, kind, closer) for every problem, in file order; the kind
+    # says what the problem is without saying where. A closer that doesn't
+    # match the innermost opener closes the nearest one it does match, and
+    # the openers in between are reported, with the offset of that closer,
+    # so one missing `)` is reported once rather than as a mismatch at every
+    # bracket after it. Messages are only spelled out (_message) for the
+    # problems that get reported. Memoised; content not seen yet picks up
+    # from the content scanned last, like dart_lexer.tokenize.
+    scanned = _scans.get(content)
+    if scanned is not None:
+        _scans.move_to_end(content)
+        return scanned[0]
+    tokens = tokenize(content)
+    found = []
+    stack = []
+    states = []
+    first = 0
+    if _scans:
+        old = next(reversed(_scans))
+        _, old_found, old_states = _scans[old]
+        # Tokens ending this far before the first change are the same ones
+        saved = bisect.bisect_right(old_states, common_ends(old, content)[0] - LOOKAHEAD, key=itemgetter(0))
+        if saved:
+            start, old_stack, count = old_states[saved - 1]
+            states = old_states[:saved]
+            found = old_found[:count]
+            stack = list(old_stack)
+            first = bisect.bisect_left(tokens, start, key=itemgetter(1))
+    rest = tokens[first:]
+    for n, (kind, start, end) in enumerate(compress(rest, map(_CHECKED.__contains__, map(itemgetter(0), rest))), 1):
+        if n % _STRIDE == 0:
+            states.append((start, tuple(stack), len(found)))
+        if kind == OPEN:
+            stack.append(start)
+        elif kind == CLOSE:
+            opening = PAIRS[content[start]]
+            depth = len(stack) - 1
+            while depth >= 0 and content[stack[depth]] != opening:
+                depth -= 1
+            if depth < 0:
+                found.append((start, 'extra ' + content[start], None))
+                continue
+            for opener in stack[depth + 1:]:
+                found.append((opener, 'unclosed ' + content[opener], start))
+            del stack[depth:]
+        elif kind == UNTERMINATED_STRING:
+            found.append((start, 'string', None))
+        elif not content.startswith('*/', end - 2) or end - start < 4:
+            found.append((start, 'comment', None))
+    problems = found + [(opener, 'unclosed ' + content[opener], None) for opener in stack]
+    problems.sort()
+    problems = tuple(problems)
+    _scans[content] = (problems, found, states)
+    if len(_scans) > _CACHE_SIZE:
+        _scans.popitem(last=False)
+    return problems
+
+def clear_cache():
+    _scans.clear()
+
+def check(content):
+    # Every problem found, in file order, as a tuple
+    lines = _Lines(content)
+    return tuple(Problem(*lines.position(offset), _message(content, lines, offset, kind, closer))
+                 for offset, kind, closer in _scan(content))
+
+def introduced(content, new_content):
+    # The problems of new_content that content didn't have. The files the
+    # passes run on are broken to begin with, so a rewrite is judged by
+    # whether it broke something, not by whether the result is sound. A
+    # problem is the same one when it is of the same kind at the same place
+    # once the rewrite is accounted for: outside the text the rewrite
+    # changed, offsets map straight across, and inside it any problem of
+    # the kind the old text had there matches.
+    old_problems = _scan(content)
+    new_problems = _scan(new_content)
+    if not new_problems:
+        return []
+    prefix, suffix = common_ends(content, new_content)
+
+    def place(offset, text):
+        if offset < prefix:
+            return offset
+        if offset >= len(text) - suffix:
+            return offset - len(text)
+        return None
+
+    had = Counter((kind, place(offset, content)) for offset, kind, _ in old_problems)
+    lines = _Lines(new_content)
+    found = []
+    for offset, kind, closer in new_problems:
+        key = (kind, place(offset, new_content))
+        if had[key]:
+            had[key] -= 1
+        else:
+            found.append(Problem(*lines.position(offset), _message(new_content, lines, offset, kind, closer)))
+    return found
+
+def chains_passes(fix_content):
+    return getattr(sys.modules.get(fix_content.__module__), 'PASSES', None) is not None
+
+def guard(name, fix_content, filepath, content):
+    # Runs one pass, keeping its input if its rewrite makes the file worse
+    if chains_passes(fix_content):
+        return fix_content(filepath, content)
+    try:
+        new_content = fix_content(filepath, content)
+    except EditConflict as e:
+        line, col = _Lines(content).position(e.second.start)
+        print(f"error: {filepath}:{line}:{col}: {name} rewrite rejected: {e.second.rule} and {e.first.rule} "
+              f"both rewrite this text", file=sys.stderr)
+        return content
+    if not ENABLED or new_content == content:
+        return new_content
+    problems = introduced(content, new_content)
+    if not problems:
+        return new_content
+    line, col, message = problems[0]
+    print(f"warning: {filepath}:{line}:{col}: {name} rewrite rejected: {message}", file=sys.stderr)
+    return content
+
+def main():
+    # repair_common guards its passes with this module, so only import it here
+    from repair_common import iter_dart_files, read_file
+    paths = sys.argv[1:] or list(iter_dart_files('lib'))
+    found = 0
+    for filepath in paths:
+        for line, col, message in check(read_file(filepath)):
+            print(f"{filepath}:{line}:{col}: {message}")
+            found += 1
+    if found:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
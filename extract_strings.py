@@ -0,0 +1,522 @@
+import argparse
+import bisect
+import json
+import os
+import re
+import sys
+from collections import namedtuple
+
+import gen_l10n
+from arb_index import UI_TEXT_ARGS, load_messages
+from dart_lexer import CLOSE, COMMENTS, IDENT, OPEN, PUNCT, STRING, string_parts, tokenize
+from repair_common import DIFF, WRITE, finish_file, iter_dart_files, read_file
+from repair_rules import Edit, apply_edits
+from repair_snapshots import SNAPSHOT_DIR, new_run_id, record_run, rollback_run
+
+# Moves hard-coded UI strings into the template ARB catalog.
+#
+# Every .dart file is tokenized once. A string literal is UI text when it is
+# the whole first argument of Text(...) and the like (UI_CALLEES) or the
+# whole value of a named argument such as label: / hintText:
+# (arb_index.UI_TEXT_ARGS), sits in the build method of a widget (a
+# StatelessWidget or a State), and holds at least one letter outside its
+# interpolations. Identical messages share one key (`Exit` and `EXIT` get
+# one each), and a message the catalog already has keeps its key. `$name` and `${expr}`
+# become {placeholders}, passed back in as arguments:
+#   Text('Seats for ${trip.route}')
+#   -> Text(AppLocalizations.of(context)!.seatsFor(trip.route))
+# with "seatsFor": "Seats for {route}" added to app_en.arb. The `const` of
+# the Text itself is dropped; a literal in a larger const expression is left
+# alone, and so is one whose `context` has no Localizations above it: inside
+# a MaterialApp(...) with no localizationsDelegates, or inside one built
+# with the build method's own context rather than a `(context)` closure of
+# its own. A MaterialApp's title: becomes onGenerateTitle:. A message with
+# no words to name a key after (`LKR $price`, `07xxxxxxxx`) is listed for a
+# key by hand instead.
+#
+# With --batch N a run rewrites at most N files (in path order), so each
+# run's diff and the entries it appends stay small enough to review; run it
+# again for the next batch. The new entries are appended to the template, gen_l10n
+# regenerates the localizations (the other locales fall back to the template
+# until translated), and the files the run rewrites are snapshotted for
+# --rollback like a repair run.
+#
+#   python extract_strings.py --diff               # what a run would do
+#   python extract_strings.py --batch 10           # the next 10 files under lib/
+#   python extract_strings.py --check $(git diff --cached --name-only -- '*.dart')
+#   python extract_strings.py --rollback last
+
+UI_CALLEES = {'Text', 'SelectableText', 'Tooltip', '_kpiCard'}
+# Widgets that put a Localizations (given localizationsDelegates) below them
+APPS = {'MaterialApp', 'CupertinoApp', 'WidgetsApp'}
+ACCESSOR = 'AppLocalizations.of(context)!'
+IMPORT = "import 'package:buslink/l10n/app_localizations.dart';"
+# Words of the message a new key is made of
+KEY_WORDS = 4
+
+_DART_KEYWORDS = {
+    'abstract', 'as', 'assert', 'async', 'await', 'break', 'case', 'catch', 'class', 'const', 'continue',
+    'default', 'do', 'else', 'enum', 'export', 'extends', 'false', 'final', 'finally', 'for', 'if',
+    'import', 'in', 'is', 'new', 'null', 'return', 'super', 'switch', 'this', 'throw', 'true', 'try',
+    'var', 'void', 'while', 'with', 'yield',
+}
+_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', 'v': '\v'}
+_ESCAPE = re.compile(r"\\(u\{[0-9a-fA-F]+\}|u[0-9a-fA-F]{4}|x[0-9a-fA-F]{2}|.)", re.DOTALL)
+# Translation keys, which restore_ui_text and the catalog rules deal with
+_KEY_LIKE = re.compile(r"[a-z0-9]+(?:_[a-z0-9]+)+\Z")
+_WORD = re.compile(r"[A-Za-z0-9]+")
+# A word a key can be made of: letters with a vowel in them (not `LKR`,
+# `xxxxxxxx` or the `h` of `h:m`), or a number following one
+_SPELLED = re.compile(r"[A-Za-z]*[AEIOUYaeiouy][A-Za-z]*\Z")
+# Parentheses that aren't a parameter list in front of a body
+_CONTROL = {'if', 'for', 'while', 'switch', 'catch'}
+_LAST_NAME = re.compile(r"(?:[\w$]+[?!]?\.)*([A-Za-z_][\w$]*)\Z")
+
+# A UI literal found in a file. `message` is the ARB text, `exprs` the Dart
+# expressions of its placeholders (in `names` order), `const` the span of a
+# `const ` to drop with it. A `title` spans the whole `title: '...'` of an
+# app, which becomes an onGenerateTitle callback.
+Found = namedtuple('Found', 'start end message names exprs const title')
+Skipped = namedtuple('Skipped', 'start text reason')
+
+def _unescape(text):
+    def decode(m):
+        escape = m.group(1)
+        if escape.startswith('u{'):
+            return chr(int(escape[2:-1], 16))
+        if escape[0] in 'ux' and len(escape) > 1:
+            return chr(int(escape[1:], 16))
+        return _ESCAPES.get(escape, escape)
+    return _ESCAPE.sub(decode, text)
+
+def _message(content, parts):
+    # (ARB message, placeholder names, their expressions), or None when the
+    # literal isn't plain text with interpolations
+    pieces = []
+    names = []
+    exprs = []
+    for kind, start, end in parts:
+        text = content[start:end]
+        if kind == 'text':
+            text = _unescape(text)
+            if '{' in text or '}' in text:
+                return None
+            pieces.append(text)
+            continue
+        if text in exprs:
+            pieces.append('{' + names[exprs.index(text)] + '}')
+            continue
+        m = _LAST_NAME.match(text)
+        base = m.group(1).strip('_$') if m else ''
+        base = base if base and not base[0].isdigit() else 'value'
+        name = base
+        count = 1
+        while name in names:
+            count += 1
+            name = f"{base}{count}"
+        names.append(name)
+        exprs.append(text)
+        pieces.append('{' + name + '}')
+    return ''.join(pieces), names, exprs
+
+def _const_before(content, code, j):
+    # The (start, end) of a `const ` ending just before code[j + 1], looking
+    # past type arguments (`const <Widget>[`), or None
+    if j >= 0 and content[code[j].start] == '>' and code[j].kind == PUNCT:
+        depth = 0
+        while j >= 0:
+            char = content[code[j].start]
+            if char in '<>' and code[j].kind == PUNCT:
+                depth += 1 if char == '>' else -1
+            j -= 1
+            if depth == 0:
+                break
+    if j >= 0 and code[j].kind == IDENT and content[code[j].start:code[j].end] == 'const':
+        return code[j].start, code[j + 1].start
+    return None
+
+def _words_before(content, code, j):
+    # The words from the end of the previous statement or member up to
+    # code[j], in order
+    words = []
+    while j >= 0 and content[code[j].start] not in '{};)':
+        words.append(content[code[j].start:code[j].end])
+        j -= 1
+    words.reverse()
+    return words
+
+def _widget_class(content, code, i):
+    # 'stateless' or 'state' when the `{` at code[i] opens the body of a
+    # class extending StatelessWidget or State<...>, the classes with a build
+    # method
+    words = _words_before(content, code, i - 1)
+    if 'class' not in words or 'extends' not in words:
+        return None
+    base = words[words.index('extends') + 1:]
+    if base[:1] == ['StatelessWidget']:
+        return 'stateless'
+    if base[:2] == ['State', '<']:
+        return 'state'
+    return None
+
+def _builds(content, code, j):
+    # Whether the member named at code[j] of a widget class is its build
+    # method or another method returning a widget
+    if content[code[j].start:code[j].end] == 'build':
+        return True
+    return any(word.endswith('Widget') for word in _words_before(content, code, j - 1))
+
+def _names_arg(content, code, i, name):
+    # Whether the call whose `(` is code[i] has a `name:` argument
+    depth = 0
+    for j in range(i, len(code)):
+        kind = code[j].kind
+        if kind == OPEN:
+            depth += 1
+        elif kind == CLOSE:
+            depth -= 1
+            if depth == 0:
+                return False
+        elif (depth == 1 and kind == IDENT and content[code[j].start:code[j].end] == name
+              and j + 1 < len(code) and content[code[j + 1].start] == ':'):
+            return True
+    return False
+
+def _localized(stack, frame, named):
+    # Why a literal in `frame` can't look up its text through `context`, or
+    # None when it can. `context` is the one bound by the innermost closure or
+    # build method around the literal; it has Localizations above it unless
+    # an app sits between the two, or the nearest app around it has no
+    # localizationsDelegates. 'title' when the literal is the title: of an
+    # app that has them.
+    bound = False
+    for outer in reversed(stack):
+        if outer[5] in ('app', 'bare app'):
+            if bound:
+                return None if outer[5] == 'app' else "no Localizations above its context"
+            if outer is frame and outer[5] == 'app' and named == 'title':
+                return 'title'
+            return "no Localizations above its context"
+        bound = bound or outer[3]
+    return None
+
+def find_literals(content):
+    # ([Found], [Skipped]) over one sweep of the file's tokens
+    code = [token for token in tokenize(content) if token.kind not in COMMENTS]
+    found = []
+    skipped = []
+    # Frames: [bracket, callee, const span, binds context, `context` seen,
+    # role] for every open bracket, plus '=>' frames for closure bodies. The
+    # role is 'stateless' / 'state' for a widget class body, 'method' for the
+    # parameters of its build method or of a method returning a widget (a
+    # build helper), 'build' for their body, 'app' / 'bare app' for an app
+    # with / without localizationsDelegates, and None otherwise.
+    stack = []
+    pending = None
+
+    def text(token):
+        return content[token.start:token.end]
+
+    def close_arrows():
+        while stack and stack[-1][0] == '=>':
+            stack.pop()
+
+    for i, token in enumerate(code):
+        char = content[token.start]
+        if token.kind == OPEN:
+            callee = None
+            role = None
+            if char == '(' and i and code[i - 1].kind == IDENT:
+                # The whole dotted name, so pw.Text (package:pdf) isn't Text
+                j = i - 1
+                while j >= 2 and text(code[j - 1]) == '.' and code[j - 2].kind == IDENT:
+                    j -= 2
+                callee = content[code[j].start:code[i - 1].end]
+                const = _const_before(content, code, j - 1)
+                if callee.split('.')[0] in APPS:
+                    role = 'app' if _names_arg(content, code, i, 'localizationsDelegates') else 'bare app'
+                elif stack and stack[-1][5] in ('stateless', 'state') and _builds(content, code, j):
+                    role = 'method'
+            else:
+                const = _const_before(content, code, i - 1)
+            if char == '{':
+                role = pending if pending == 'build' else _widget_class(content, code, i)
+            stack.append([char, callee, const, char == '{' and pending is not None, False, role])
+            pending = None
+            continue
+        if token.kind == CLOSE:
+            close_arrows()
+            if not stack:
+                continue
+            frame = stack.pop()
+            # A parameter list naming `context`, followed by the body it is in
+            # scope in: a closure's, or a build method's. A State's methods
+            # have its `context` without naming it.
+            following = text(code[i + 1]) if i + 1 < len(code) else ''
+            if frame[5] == 'method' and (frame[4] or stack[-1][5] == 'state'):
+                role = 'build'
+            elif frame[0] == '(' and frame[4] and frame[1] not in _CONTROL:
+                role = 'closure'
+            else:
+                role = None
+            if role:
+                if following == '=' and i + 2 < len(code) and content[code[i + 2].start] == '>':
+                    stack.append(['=>', None, None, True, False, role if role == 'build' else None])
+                elif following in ('{', 'async'):
+                    pending = role
+            continue
+        if token.kind == PUNCT and char in ',;':
+            close_arrows()
+            continue
+        if token.kind == IDENT:
+            if text(token) == 'context' and stack:
+                stack[-1][4] = True
+            continue
+        if token.kind != STRING or not stack or i < 1:
+            continue
+        # UI text: the whole first argument of a UI_CALLEES call, or the
+        # whole value of a UI named argument of a constructor (not of, say,
+        # a function sending a notification)
+        frame = stack[-1]
+        callee = frame[1] or ''
+        before = code[i - 1]
+        named = None
+        if before.kind == OPEN:
+            ui = callee in UI_CALLEES
+        else:
+            named = text(code[i - 2]) if i >= 2 and code[i - 2].kind == IDENT else None
+            ui = (content[before.start] == ':' and named in UI_TEXT_ARGS
+                  and (callee in UI_CALLEES or callee[:1].isupper()))
+        if not ui or i + 1 >= len(code) or content[code[i + 1].start] not in ',)':
+            continue
+        parts = string_parts(content, token)
+        if parts is None:
+            continue
+        literal = text(token)
+        message = _message(content, parts)
+        if message is None:
+            skipped.append(Skipped(token.start, literal, "braces in the text"))
+            continue
+        plain = ''.join(content[start:end] for kind, start, end in parts if kind == 'text')
+        if not re.search(r"[A-Za-z]", plain) or _KEY_LIKE.match(plain):
+            continue
+        if any(outer[2] for outer in stack[:-1]):
+            skipped.append(Skipped(token.start, literal, "in a const expression"))
+            continue
+        if not any(outer[5] == 'build' for outer in stack):
+            skipped.append(Skipped(token.start, literal, "not in a widget's build method or helper"))
+            continue
+        reason = _localized(stack, frame, named)
+        if reason == 'title':
+            found.append(Found(code[i - 2].start, token.end, *message, frame[2], True))
+        elif reason:
+            skipped.append(Skipped(token.start, literal, reason))
+        else:
+            found.append(Found(token.start, token.end, *message, frame[2], False))
+    return found, skipped
+
+def key_for(message):
+    # A getter name from the first words of the message, or None when it
+    # has no words to name one after: most of its letters are in runs with
+    # no vowel (`LKR`, `xxxxxxxx`) or a letter on its own (`h:m`, `e.g.`)
+    text = re.sub(r"\{\w+\}", ' ', message)
+    words = []
+    spelled = unspelled = 0
+    for word in _WORD.findall(text):
+        if word.isdigit():
+            if words:
+                words.append(word)
+        elif len(word) > 1 and _SPELLED.match(word) or word in ('a', 'A', 'I'):
+            words.append(word)
+            spelled += len(word)
+        else:
+            unspelled += sum(char.isalpha() for char in word)
+    if not spelled or unspelled > spelled:
+        return None
+    words = words[:KEY_WORDS]
+    key = words[0].lower() + ''.join(word[:1].upper() + word[1:].lower() for word in words[1:])
+    if key in _DART_KEYWORDS:
+        key += 'Text'
+    return key
+
+class Catalog:
+    # The template messages, and the keys given out so far
+    def __init__(self, path):
+        self.path = path
+        self.messages = load_messages(path)
+        self.keys = {}
+        for key, text in self.messages.items():
+            if not key.startswith('@'):
+                self.keys.setdefault(text, key)
+        self.added = {}
+
+    def has(self, message):
+        return message in self.keys
+
+    def key(self, message, names):
+        # The key for `message`, adding it if no key has that text yet, or
+        # None when the message needs a key picked by hand (key_for)
+        if message in self.keys:
+            return self.keys[message]
+        base = key_for(message)
+        if base is None:
+            return None
+        key = base
+        count = 1
+        while key in self.messages or key in self.added:
+            count += 1
+            key = f"{base}{count}"
+        self.keys[message] = key
+        self.added[key] = (message, names)
+        return key
+
+    def entries(self):
+        # The new entries as lines for the ARB file, 4-space indented
+        lines = []
+        for key, (message, names) in self.added.items():
+            lines.append(f"    {json.dumps(key)}: {json.dumps(message, ensure_ascii=False)}")
+            if names:
+                metadata = json.dumps({'placeholders': {name: {} for name in names}}, indent=4,
+                                      ensure_ascii=False)
+                lines.append(f"    {json.dumps('@' + key)}: " + metadata.replace('\n', '\n    '))
+        return lines
+
+    def write(self, mode=WRITE, snapshots=None):
+        # Appends the new entries in front of the closing brace, leaving
+        # the rest of the file as it is
+        content = read_file(self.path)
+        head = content.rstrip()
+        if not head.endswith('}'):
+            raise gen_l10n.ArbError(f"{self.path}: doesn't end with a closing brace")
+        head = head[:-1].rstrip()
+        separator = ',\n' if not head.endswith('{') else '\n'
+        new_content = head + separator + ',\n'.join(self.entries()) + '\n}\n'
+        return finish_file(self.path, content, new_content, mode, snapshots)
+
+def _import_edit(content):
+    # Adds the AppLocalizations import after the file's last import
+    end = 0
+    for m in re.finditer(r"^import\s+['\"][^'\"]*['\"][^;]*;[ \t]*$", content, re.MULTILINE):
+        end = m.end()
+    if end:
+        return Edit(end, end, '\n' + IMPORT, 'extract_strings')
+    return Edit(0, 0, IMPORT + '\n', 'extract_strings')
+
+def rewrite(content, found, catalog):
+    # The file with its literals replaced by catalog lookups; every literal
+    # must have a key (Catalog.key)
+    edits = []
+    for literal in found:
+        key = catalog.key(literal.message, literal.names)
+        call = f"{ACCESSOR}.{key}" + (f"({', '.join(literal.exprs)})" if literal.exprs else '')
+        if literal.title:
+            # The app's own context has no Localizations above it yet
+            call = f"onGenerateTitle: (context) => {call}"
+        edits.append(Edit(literal.start, literal.end, call, 'extract_strings'))
+        if literal.const is not None and not any(edit.start == literal.const[0] for edit in edits):
+            edits.append(Edit(literal.const[0], literal.const[1], '', 'extract_strings'))
+    if edits and 'l10n/app_localizations.dart' not in content:
+        edits.append(_import_edit(content))
+    return apply_edits(content, edits)
+
+def position(content, offset):
+    line_starts = [0] + [m.end() for m in re.finditer('\n', content)]
+    line = bisect.bisect_right(line_starts, offset)
+    return line, offset - line_starts[line - 1] + 1
+
+def main():
+    parser = argparse.ArgumentParser(description="Move hard-coded UI strings into the ARB catalog")
+    parser.add_argument('paths', nargs='*', help="Dart files (default: every one under --root)")
+    parser.add_argument('--root', default='lib')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--check', action='store_true',
+                      help="don't write; list the strings that would move and exit 1 if there are any")
+    mode.add_argument('--diff', action='store_true',
+                      help="don't write; print the diff of the files and the template this run would change")
+    parser.add_argument('--batch', type=int, default=0, metavar='N',
+                        help="rewrite at most N files a run (default: all of them)")
+    parser.add_argument('--verbose', action='store_true', help="also list the UI strings left alone, and why")
+    parser.add_argument('--no-generate', action='store_true', help="don't run gen_l10n afterwards")
+    parser.add_argument('--no-snapshot', action='store_true',
+                        help="don't keep pre-images of the files this run rewrites")
+    parser.add_argument('--rollback', metavar='RUN',
+                        help="put back the files an earlier run rewrote (a run id, or 'last')")
+    args = parser.parse_args()
+    if args.rollback:
+        rollback_run(SNAPSHOT_DIR, args.rollback, check=args.check)
+        return
+
+    config = gen_l10n.load_config()
+    arb_dir = os.path.normpath(config['arb-dir'])
+    catalog = Catalog(os.path.join(config['arb-dir'], config['template-arb-file']))
+    paths = args.paths or list(iter_dart_files(args.root))
+    paths = [p for p in paths if p.endswith('.dart') and os.path.exists(p)
+             and not os.path.normpath(p).startswith(arb_dir + os.sep)]
+
+    # One sweep over every file before any key is given out, so keys come
+    # out the same whichever files a run starts from
+    files = []
+    for filepath in paths:
+        content = read_file(filepath)
+        found, skipped = find_literals(content)
+        for literal in skipped if args.verbose else ():
+            line, col = position(content, literal.start)
+            print(f"{filepath}:{line}:{col}: {literal.text} left alone: {literal.reason}", file=sys.stderr)
+        # A message with no words in it is left for a key picked by hand
+        keyed = []
+        for literal in found:
+            if catalog.has(literal.message) or key_for(literal.message):
+                keyed.append(literal)
+                continue
+            line, col = position(content, literal.start)
+            print(f"{filepath}:{line}:{col}: {content[literal.start:literal.end]} needs a key by hand: "
+                  f"no words to name one after", file=sys.stderr)
+        if keyed:
+            files.append((filepath, content, keyed))
+
+    if args.check:
+        for filepath, content, found in files:
+            for literal in found:
+                line, col = position(content, literal.start)
+                key = catalog.key(literal.message, literal.names)
+                print(f"{filepath}:{line}:{col}: {content[literal.start:literal.end]} -> {key}")
+        if files:
+            sys.exit(1)
+        return
+
+    batch = files[:args.batch] if args.batch > 0 else files
+    write_mode = DIFF if args.diff else WRITE
+    snapshots = None if args.diff or args.no_snapshot else SNAPSHOT_DIR
+    touched = {}
+    for filepath, content, found in batch:
+        changed = finish_file(filepath, content, rewrite(content, found, catalog), write_mode, snapshots)
+        if args.diff:
+            sys.stdout.write(changed or '')
+        elif changed:
+            print(f"Extracted {len(found)} string(s) from {filepath}")
+            if snapshots:
+                touched[filepath] = changed
+    if catalog.added:
+        changed = catalog.write(write_mode, snapshots)
+        if args.diff:
+            sys.stdout.write(changed)
+        else:
+            if snapshots:
+                touched[catalog.path] = changed
+            print(f"Added {len(catalog.added)} message(s) to {catalog.path}")
+    if len(batch) < len(files):
+        print(f"{len(files) - len(batch)} more file(s) to go; run again for the next batch", file=sys.stderr)
+    if args.diff:
+        return
+    if touched:
+        run_id = new_run_id()
+        record_run(SNAPSHOT_DIR, run_id, touched)
+        print(f"Run {run_id} (undo with --rollback {run_id})", file=sys.stderr)
+    if catalog.added and not args.no_generate:
+        try:
+            gen_l10n.update(config)
+        except gen_l10n.ArbError as e:
+            sys.exit(f"error: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -1,75 +1,56 @@
-import os
-
-def fix_bus_list(content):
-    # Fix broken Text widgets where style is orphaned
-    # Pattern: Text(string), style: ... -> Text(string, style: ...)
-    # Search for: .replaceAll(' ', '_')),
-    #             style: const TextStyle(
-    # Replace with: .replaceAll(' ', '_'),
-    #               style: const TextStyle(
-    
-    content = content.replace(".replaceAll(' ', '_')),\n                style: const TextStyle(", ".replaceAll(' ', '_'),\n                style: const TextStyle(")
-    
-    # Also fix line 668: child: Text -> Container(child: Text...) or just Text
-    # The context is inside a Column children list.
-    # The original code likely had a Container that was commented out, leaving 'child: Text' exposed?
-    # Let's just wrap it in a Container to be safe, or remove 'child:'
-    # "child: Text" is definitely wrong in a list.
-    # If we remove 'child: ', we get Text("Bus", ...) which is valid in a Column.
-    content = content.replace("child: Text(\"Bus\",", "Text(\"Bus\",")
-
-    return content
-
-def fix_conductor(content):
-    # Fix trip: t.trip -> trip: t
-    content = content.replace("ConductorTripManagementScreen(trip: t.trip)", "ConductorTripManagementScreen(trip: t)")
-    # Also remove unused import provider
-    content = content.replace("import 'package:provider/provider.dart';", "")
-    return content
-
-def remove_provider_import(content):
-    return content.replace("import 'package:provider/provider.dart';", "")
+from repair_common import run_pass
+from repair_rules import LiteralRule, edit_rules
+
+DEPENDS_ON = ['repair_final_syntax']
+
+PATH_BUS = 'lib/views/results/bus_list_screen.dart'
+PATH_CONDUCTOR = 'lib/views/conductor/conductor_dashboard.dart'
+
+# Files that only need the unused provider import dropped
+UNUSED_IMPORT_PATHS = [
+    'lib/views/layout/app_footer.dart',
+    'lib/views/layout/mobile_navbar.dart',
+    'lib/utils/location_permission_helper.dart',
+    'lib/views/admin/analytics/admin_analytics_dashboard.dart',
+    'lib/views/admin/analytics/revenue_analytics_screen.dart',
+    'lib/views/admin/bookings/admin_booking_list.dart',
+    'lib/views/admin/bookings/booking_details_screen.dart',
+    'lib/views/admin/refunds/admin_refund_details.dart',
+    'lib/views/admin/refunds/admin_refund_list.dart',
+    'lib/views/booking/my_trips_stats_widget.dart',
+    'lib/views/tracking/track_bus_screen.dart'
+]
+
+# Fix broken Text widgets where style is orphaned
+# Pattern: Text(string), style: ... -> Text(string, style: ...)
+ORPHANED_STYLE = LiteralRule(
+    'final_fix.orphaned_style',
+    ".replaceAll(' ', '_')),\n                style: const TextStyle(",
+    ".replaceAll(' ', '_'),\n                style: const TextStyle(",
+    paths=[PATH_BUS])
+# "child: Text" is definitely wrong in a Column's children list; the
+# Container that held it was commented out. Without 'child: ' we get
+# Text("Bus", ...) which is valid in a Column.
+CHILD_TEXT_IN_LIST = LiteralRule('final_fix.child_text_in_list', "child: Text(\"Bus\",", "Text(\"Bus\",",
+                                 paths=[PATH_BUS])
+# Remove the unused provider import
+PROVIDER_IMPORT = LiteralRule('final_fix.provider_import', "import 'package:provider/provider.dart';", "",
+                              paths=[PATH_CONDUCTOR] + UNUSED_IMPORT_PATHS)
+
+RULES = [ORPHANED_STYLE, CHILD_TEXT_IN_LIST, PROVIDER_IMPORT]
+
+# Analyzer codes these rules answer, for --diagnostics
+DIAGNOSTICS = {
+    'expected_token': [ORPHANED_STYLE, CHILD_TEXT_IN_LIST],
+    'undefined_named_parameter': [CHILD_TEXT_IN_LIST],
+    'unused_import': [PROVIDER_IMPORT],
+}
+
+def fix_content(filepath, content):
+    return edit_rules(RULES, content, filepath)
 
 def main():
-    # Bus List
-    path_bus = 'lib/views/results/bus_list_screen.dart'
-    if os.path.exists(path_bus):
-        with open(path_bus, 'r') as f: s = f.read()
-        s = fix_bus_list(s)
-        with open(path_bus, 'w') as f: f.write(s)
-        print("Fixed bus_list_screen.dart")
-
-    # Conductor
-    path_cond = 'lib/views/conductor/conductor_dashboard.dart'
-    if os.path.exists(path_cond):
-        with open(path_cond, 'r') as f: s = f.read()
-        s = fix_conductor(s)
-        with open(path_cond, 'w') as f: f.write(s)
-        print("Fixed conductor_dashboard.dart")
-
-    # Unused imports
-    paths = [
-        'lib/views/layout/app_footer.dart',
-        'lib/views/layout/mobile_navbar.dart',
-        'lib/utils/location_permission_helper.dart',
-        'lib/views/admin/analytics/admin_analytics_dashboard.dart',
-        'lib/views/admin/analytics/revenue_analytics_screen.dart',
-        'lib/views/admin/bookings/admin_booking_list.dart',
-        'lib/views/admin/bookings/booking_details_screen.dart',
-        'lib/views/admin/refunds/admin_refund_details.dart',
-        'lib/views/admin/refunds/admin_refund_list.dart',
-        'lib/views/booking/my_trips_stats_widget.dart',
-        'lib/views/tracking/track_bus_screen.dart'
-    ]
-    
-    for p in paths:
-        if os.path.exists(p):
-            with open(p, 'r') as f: s = f.read()
-            original_len = len(s)
-            s = remove_provider_import(s)
-            if len(s) != original_len:
-                with open(p, 'w') as f: f.write(s)
-                print(f"Cleaned {p}")
+    run_pass(fix_content, "Fixed {path}", filepaths=[PATH_BUS, PATH_CONDUCTOR] + UNUSED_IMPORT_PATHS)
 
 if __name__ == "__main__":
     main()
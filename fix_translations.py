@@ -1,20 +1,71 @@
-import os
-import re
+from repair_common import fix_path, run_pass
+from repair_rules import Phase, RegexRule
 
-def fix_file(filepath):
-    with open(filepath, 'r', encoding='utf-8') as f:
-        content = f.read()
+# Catch-all for what the two translate passes leave behind
+DEPENDS_ON = ['repair_translations', 'repair_translations_class']
 
-    original_content = content
+LANGUAGE_PROVIDER_IMPORT = RegexRule(
+    'fix_translations.language_provider_import',
+    r"import\s+['\"].*?language_provider\.dart['\"];\n?", "", anchors=('language_provider.dart',))
+APP_LOCALIZATIONS_IMPORT = RegexRule(
+    'fix_translations.app_localizations_import',
+    r"import\s+['\"].*?app_localizations\.dart['\"];\n?", "", anchors=('app_localizations.dart',))
+PROVIDER_OF_DEFINITION = RegexRule(
+    'fix_translations.provider_of_definition',
+    r"(final|var)\s+\w+\s*=\s*Provider\.of<LanguageProvider>.*?;", "",
+    anchors=('Provider.of<LanguageProvider>',))
+TRANSLATE_LITERAL = RegexRule(
+    'fix_translations.translate_literal',
+    r"\w+\.translate\((['\"])(.*?)\1\)", r"\1\2\1", anchors=('.translate(',))
+TRANSLATE_VARIABLE = RegexRule(
+    'fix_translations.translate_variable',
+    r"\w+\.translate\(([^'\"]+?)\)", r"\1", anchors=('.translate(',))
+PROVIDER_OF_TRANSLATE = RegexRule(
+    'fix_translations.provider_of_translate',
+    r"Provider\.of<LanguageProvider>\(.*?\)\.translate\((['\"])(.*?)\1\)", r"\1\2\1",
+    anchors=('Provider.of<LanguageProvider>(', ').translate('))
+PROVIDER_OF_CURRENT_LANGUAGE = RegexRule(
+    'fix_translations.provider_of_current_language',
+    r"Provider\.of<LanguageProvider>\(.*?\)\.currentLanguage", "'en'",
+    anchors=('Provider.of<LanguageProvider>(', ').currentLanguage'))
+LANGUAGE_PROVIDER_PARAMETER = RegexRule(
+    'fix_translations.language_provider_parameter',
+    r"LanguageProvider\s+(\w+)", r"dynamic \1", anchors=('LanguageProvider',))
+CONSUMER_LANGUAGE_PROVIDER = RegexRule(
+    'fix_translations.consumer_language_provider',
+    r"Consumer<LanguageProvider>", "Consumer<Object>", anchors=('Consumer<LanguageProvider>',))
+LANGUAGE_PROVIDER_TYPE = RegexRule(
+    'fix_translations.language_provider_type',
+    r":\s*LanguageProvider", ": dynamic", anchors=('LanguageProvider',))
 
-    # 1. Remove Imports
-    content = re.sub(r"import\s+['\"].*?language_provider\.dart['\"];\n?", "", content)
-    content = re.sub(r"import\s+['\"].*?app_localizations\.dart['\"];\n?", "", content)
+# One scan per phase. TRANSLATE_VARIABLE has to see TRANSLATE_LITERAL's
+# rewrites, and LANGUAGE_PROVIDER_TYPE would take `x:LanguageProvider lp`
+# from the parameter rule, so those run on their own; the rules within a
+# phase never overlap.
+DECLARATIONS = Phase('fix_translations.declarations',
+                     [LANGUAGE_PROVIDER_IMPORT, APP_LOCALIZATIONS_IMPORT, PROVIDER_OF_DEFINITION])
+PROVIDER_OF_CALLS = Phase('fix_translations.provider_of_calls',
+                          [PROVIDER_OF_TRANSLATE, PROVIDER_OF_CURRENT_LANGUAGE])
+TYPE_NAMES = Phase('fix_translations.type_names', [LANGUAGE_PROVIDER_PARAMETER, CONSUMER_LANGUAGE_PROVIDER])
 
+# Analyzer codes these rules answer, for --diagnostics
+DIAGNOSTICS = {
+    'uri_does_not_exist': [LANGUAGE_PROVIDER_IMPORT, APP_LOCALIZATIONS_IMPORT],
+    'unused_import': [LANGUAGE_PROVIDER_IMPORT, APP_LOCALIZATIONS_IMPORT],
+    'undefined_class': [PROVIDER_OF_DEFINITION, PROVIDER_OF_TRANSLATE, PROVIDER_OF_CURRENT_LANGUAGE,
+                        LANGUAGE_PROVIDER_PARAMETER, CONSUMER_LANGUAGE_PROVIDER, LANGUAGE_PROVIDER_TYPE],
+    'non_type_as_type_argument': [PROVIDER_OF_DEFINITION, PROVIDER_OF_TRANSLATE, PROVIDER_OF_CURRENT_LANGUAGE,
+                                  CONSUMER_LANGUAGE_PROVIDER],
+    'undefined_method': [TRANSLATE_LITERAL, TRANSLATE_VARIABLE],
+    'undefined_identifier': [TRANSLATE_LITERAL, TRANSLATE_VARIABLE],
+}
+
+def fix_content(filepath, content):
+    # 1. Remove Imports
     # 2. Remove Provider.of<LanguageProvider> definitions
     # Matches: final lp = Provider.of<LanguageProvider>(context);
     # Matches: final languageProvider = Provider.of<LanguageProvider>(context, listen: false);
-    content = re.sub(r"(final|var)\s+\w+\s*=\s*Provider\.of<LanguageProvider>.*?;", "", content)
+    content = DECLARATIONS.apply(content, filepath)
     
     # 3. Remove Consumer<LanguageProvider> wrapper (simplified - just removing the line might break structure, so usually we replace usage)
     # This is hard to regex safely. We'll skip stripping Consumer wrappers for now and rely on fixing the USAGE inside.
@@ -24,27 +75,23 @@ def fix_file(filepath):
     # 4. Replace .translate('key') or .translate("key") with "key" or 'key'
     # Usage: lp.translate('hello') -> 'hello'
     # Usage: languageProvider.translate("hello") -> "hello"
-    content = re.sub(r"\w+\.translate\((['\"])(.*?)\1\)", r"\1\2\1", content)
+    content = TRANSLATE_LITERAL.apply(content, filepath)
 
     # 5. Replace .translate(variable) with variable
     # Usage: lp.translate(cityKey) -> cityKey
-    content = re.sub(r"\w+\.translate\(([^'\"]+?)\)", r"\1", content)
+    content = TRANSLATE_VARIABLE.apply(content, filepath)
 
     # 6. Replace `Provider.of<LanguageProvider>(context).translate(...)` type calls
     # Usage: Provider.of<LanguageProvider>(context).translate('key') -> 'key'
-    content = re.sub(r"Provider\.of<LanguageProvider>\(.*?\)\.translate\((['\"])(.*?)\1\)", r"\1\2\1", content)
-    
     # 7. Replace `Provider.of<LanguageProvider>(context).currentLanguage` with 'en'
-    content = re.sub(r"Provider\.of<LanguageProvider>\(.*?\)\.currentLanguage", "'en'", content)
+    content = PROVIDER_OF_CALLS.apply(content, filepath)
 
     # 8. Clean up "LanguageProvider lp" in method signatures
     # Widget foo(LanguageProvider lp) -> Widget foo()  (This might break call sites, careful. Maybe just Type dynamic?)
     # Safer: Widget foo(dynamic lp)
-    content = re.sub(r"LanguageProvider\s+(\w+)", r"dynamic \1", content)
-
     # 9. Clean up Provider<LanguageProvider> in generics if any (e.g. Consumer<LanguageProvider>)
     # Consumer<LanguageProvider> -> Consumer<Object> (placeholder to avoid build error, though behavior changes)
-    content = re.sub(r"Consumer<LanguageProvider>", "Consumer<Object>", content)
+    content = TYPE_NAMES.apply(content, filepath)
 
     # 10. Fix previously commented out lines from sed that might be lingering if we run this on top
     # The sed was: // final lp = ...
@@ -52,20 +99,15 @@ def fix_file(filepath):
     # The main issue is usages.
     
     # 11. Type 'LanguageProvider' not found -> dynamic
-    content = re.sub(r":\s*LanguageProvider", ": dynamic", content)
+    content = LANGUAGE_PROVIDER_TYPE.apply(content, filepath)
 
+    return content
 
-    if content != original_content:
-        print(f"Fixing {filepath}")
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
+def fix_file(filepath):
+    fix_path(filepath, fix_content, "Fixing {path}")
 
 def main():
-    root_dir = 'lib'
-    for root, dirs, files in os.walk(root_dir):
-        for file in files:
-            if file.endswith(".dart"):
-                fix_file(os.path.join(root, file))
+    run_pass(fix_content, "Fixing {path}")
 
 if __name__ == "__main__":
     main()
@@ -1,5 +1,13 @@
 import os
 
+from replace_engine import with_quote_variants
+from repair_common import fix_path, run_pass
+from repair_rules import TableRule
+
+# Its table is checked after the shared one, and the catalog lookup is left
+# to restore_ui_text
+DEPENDS_ON = ['restore_ui_text']
+
 # Map of raw key -> English text
 replacements = {
     # HomeScreen Hero & Search
@@ -11,44 +19,38 @@ replacements = {
     '"where_from"': '"Where from?"',
     '"where_to"': '"Where to?"',
     '"departure_date"': '"Departure Date"',
-    '"search"': '"Search"',
-    '"origin"': '"Origin"',
-    '"destination"': '"Destination"',
     '"bulk_booking"': '"Bulk Booking"',
     
     # Live Journey Card
     "'journey_live'": "'Live Journey'",
-    "'your_bus_is_here'": "'Your bus is here'",
-    "'track_now'": "'TRACK NOW'",
 }
 
+HOME_SCREEN_PATH = 'lib/views/home/home_screen.dart'
+
+def fix_content(filepath, content):
+    if os.path.normpath(filepath) != os.path.normpath(HOME_SCREEN_PATH):
+        return content
+    return restore_text(content)
+
+# Also check single quote variations of the double quoted keys
+REPLACEMENTS = TableRule('fix_user_pages_text.replacements', with_quote_variants(replacements, quotes='"'))
+
+def restore_text(content):
+    return REPLACEMENTS.apply(content)
+
 def process_file(filepath):
     if not os.path.exists(filepath):
         print(f"File not found: {filepath}")
         return
 
-    with open(filepath, 'r') as f:
-        content = f.read()
-    
-    original = content
-    for key, value in replacements.items():
-        content = content.replace(key, value)
-        
-    # Also Check single quotes vs double quotes variations
-    for key, value in replacements.items():
-        if key.startswith('"') and key.endswith('"'):
-            # Try single quote version
-            sq_key = "'" + key[1:-1] + "'"
-            sq_val = "'" + value[1:-1] + "'"
-            content = content.replace(sq_key, sq_val)
-
-    if content != original:
-        with open(filepath, 'w') as f:
-            f.write(content)
-        print(f"Updated {filepath}")
+    fix_path(filepath, fix_content, "Updated {path}")
 
 def main():
-    process_file('lib/views/home/home_screen.dart')
+    if not os.path.exists(HOME_SCREEN_PATH):
+        print(f"File not found: {HOME_SCREEN_PATH}")
+        return
+
+    run_pass(fix_content, "Updated {path}", filepaths=[HOME_SCREEN_PATH])
 
 if __name__ == "__main__":
     main()
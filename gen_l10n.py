@@ -0,0 +1,497 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+
+from repair_cache import CACHE_DIR
+from repair_common import read_file, write_file
+
+# ARB -> Dart localization generator, a stand-in for `flutter gen-l10n` that
+# needs no Flutter SDK.
+#
+# Reads l10n.yaml and the app_<locale>.arb catalogs, checks that every
+# translation uses the same placeholders as the template message, and writes
+# the same files gen-l10n does (app_localizations.dart plus one
+# app_localizations_<locale>.dart per locale), already laid out the way
+# `dart format` leaves them. A manifest under the cache dir records the hash
+# of the ARB input and of the output of every generated file, so only the
+# files whose inputs changed (or that were edited by hand) are written:
+# editing app_si.arb rewrites app_localizations_si.dart and nothing else,
+# editing the template rewrites everything.
+#
+# Messages may be plain text or use simple {placeholders}; plural, select
+# and formatted (number/date) placeholders still need gen-l10n.
+#
+#   python gen_l10n.py            # regenerate what changed
+#   python gen_l10n.py --check    # exit 1 if a generated file is stale
+#   python gen_l10n.py --force    # regenerate everything
+
+CONFIG_PATH = 'l10n.yaml'
+MANIFEST_PATH = os.path.join(CACHE_DIR, 'gen_l10n.json')
+MANIFEST_VERSION = 1
+LINE_WIDTH = 80
+
+DEFAULTS = {
+    'arb-dir': 'lib/l10n',
+    'template-arb-file': 'app_en.arb',
+    'output-localization-file': 'app_localizations.dart',
+    'output-class': 'AppLocalizations',
+}
+
+# Names gen-l10n uses in the class comment of each locale file
+LANGUAGE_NAMES = {
+    'ar': 'Arabic', 'de': 'German', 'en': 'English', 'es': 'Spanish', 'fr': 'French',
+    'hi': 'Hindi', 'ja': 'Japanese', 'si': 'Sinhala Sinhalese', 'ta': 'Tamil', 'zh': 'Chinese',
+}
+
+_PLACEHOLDER = re.compile(r"\{([A-Za-z_][A-Za-z0-9_]*)\}")
+_ICU_ARGUMENT = re.compile(r"\{\s*([A-Za-z_][A-Za-z0-9_]*)\s*,\s*(plural|select|number|date|time)\b")
+_IDENT_CHAR = re.compile(r"[A-Za-z0-9_]")
+
+class ArbError(Exception):
+    pass
+
+def load_config(path=CONFIG_PATH):
+    # l10n.yaml is flat `key: value` lines; no YAML parser needed for that
+    config = dict(DEFAULTS)
+    if os.path.exists(path):
+        for line in read_file(path).splitlines():
+            line = line.split('#', 1)[0].strip()
+            if ':' in line:
+                key, value = line.split(':', 1)
+                config[key.strip()] = value.strip().strip('\'"')
+    config.setdefault('output-dir', config['arb-dir'])
+    return config
+
+def file_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+def arb_locale(path, catalog):
+    locale = catalog.get('@@locale')
+    if locale is None:
+        locale = os.path.basename(path)[len('app_'):-len('.arb')]
+    if not re.fullmatch(r"[a-z]{2,3}", locale):
+        raise ArbError(f"{path}: only language-only locales are supported, not {locale!r}")
+    return locale
+
+def parse_arb(path, data):
+    def pairs(items):
+        seen = set()
+        for key, _ in items:
+            if key in seen:
+                print(f"warning: {path}: duplicate key {key}, the last value wins", file=sys.stderr)
+            seen.add(key)
+        return dict(items)
+    try:
+        return json.loads(data.decode('utf-8'), object_pairs_hook=pairs)
+    except ValueError as e:
+        raise ArbError(f"{path}: {e}")
+
+def placeholders(key, text, metadata, path):
+    # Placeholder names in the order gen-l10n makes them parameters: the
+    # ones described in @key first, then the rest as they appear
+    match = _ICU_ARGUMENT.search(text)
+    if match:
+        raise ArbError(f"{path}: {key}: {match.group(2)} messages need flutter gen-l10n")
+    described = metadata.get('placeholders', {})
+    for name, info in described.items():
+        if info.get('format') or info.get('type') in ('DateTime', 'int', 'double', 'num'):
+            raise ArbError(f"{path}: {key}: formatted placeholder {name} needs flutter gen-l10n")
+    names = list(described)
+    for name in _PLACEHOLDER.findall(text):
+        if name not in names:
+            names.append(name)
+    return names
+
+def load_catalogs(config):
+    # [(path, raw bytes)] of every catalog, the template first
+    template_path = os.path.join(config['arb-dir'], config['template-arb-file'])
+    catalogs = []
+    for path in sorted(glob.glob(os.path.join(config['arb-dir'], 'app_*.arb'))):
+        with open(path, 'rb') as f:
+            data = f.read()
+        catalogs.append((os.path.normpath(path) == os.path.normpath(template_path), path, data))
+    if not any(is_template for is_template, _, _ in catalogs):
+        raise ArbError(f"template {template_path} not found")
+    catalogs.sort(key=lambda c: not c[0])
+    return [(path, data) for _, path, data in catalogs]
+
+def build_messages(catalogs):
+    # Parses every catalog and checks it against the template. Returns
+    # (template locale, [locale], {key: (placeholders, metadata)},
+    # {locale: {key: text}}); untranslated keys fall back to the template.
+    parsed = []
+    for path, data in catalogs:
+        catalog = parse_arb(path, data)
+        parsed.append((arb_locale(path, catalog), path, catalog))
+    template_locale, template_path, template = parsed[0]
+    keys = {}
+    for key, text in template.items():
+        if key.startswith('@'):
+            continue
+        if not re.fullmatch(r"[a-z][A-Za-z0-9_]*", key):
+            raise ArbError(f"{template_path}: {key!r} is not a valid Dart getter name")
+        metadata = template.get('@' + key, {})
+        keys[key] = (placeholders(key, text, metadata, template_path), metadata)
+    errors = []
+    texts = {}
+    for locale, path, catalog in parsed:
+        messages = {}
+        for key, text in catalog.items():
+            if key.startswith('@'):
+                continue
+            if key not in keys:
+                errors.append(f"{path}: {key} is not in the template")
+                continue
+            expected = keys[key][0]
+            found = placeholders(key, text, {}, path)
+            if set(found) != set(expected):
+                errors.append(f"{path}: {key} uses placeholders {sorted(found)}, "
+                              f"the template has {sorted(expected)}")
+            messages[key] = text
+        untranslated = [key for key in keys if key not in messages]
+        if untranslated:
+            print(f"warning: {path}: {len(untranslated)} untranslated message(s), "
+                  f"using the template for {', '.join(untranslated)}", file=sys.stderr)
+        texts[locale] = {key: messages.get(key, template[key]) for key in keys}
+    if errors:
+        raise ArbError('\n'.join(errors))
+    return template_locale, [locale for locale, _, _ in parsed], keys, texts
+
+def dart_string(text, names=()):
+    # A single-quoted Dart literal, {placeholders} interpolated
+    parts = []
+    last = 0
+    for match in _PLACEHOLDER.finditer(text):
+        if match.group(1) not in names:
+            continue
+        parts.append(_escape(text[last:match.start()]))
+        following = text[match.end():match.end() + 1]
+        name = match.group(1)
+        parts.append('${' + name + '}' if _IDENT_CHAR.match(following) else '$' + name)
+        last = match.end()
+    parts.append(_escape(text[last:]))
+    return "'" + ''.join(parts) + "'"
+
+def _escape(text):
+    return (text.replace('\\', '\\\\').replace("'", "\\'").replace('$', '\\$')
+            .replace('\n', '\\n').replace('\r', '\\r').replace('\t', '\\t'))
+
+def _width(line):
+    # dart format counts UTF-16 code units
+    return len(line.encode('utf-16-le')) // 2
+
+def _parameters(names, metadata):
+    described = metadata.get('placeholders', {})
+    return ', '.join(f"{described.get(name, {}).get('type', 'Object')} {name}" for name in names)
+
+def class_name(config, locale):
+    return config['output-class'] + locale[0].upper() + locale[1:]
+
+def locale_file(config, locale):
+    stem = config['output-localization-file'][:-len('.dart')]
+    return os.path.join(config['output-dir'], f"{stem}_{locale}.dart")
+
+def generate_locale(config, locale, keys, texts):
+    name = class_name(config, locale)
+    lines = [
+        "// ignore: unused_import",
+        "import 'package:intl/intl.dart' as intl;",
+        f"import '{config['output-localization-file']}';",
+        "",
+        "// ignore_for_file: type=lint",
+        "",
+        f"/// The translations for {LANGUAGE_NAMES.get(locale, locale)} (`{locale}`).",
+        f"class {name} extends {config['output-class']} {{",
+        f"  {name}([String locale = '{locale}']) : super(locale);",
+    ]
+    for key, (names, metadata) in keys.items():
+        literal = dart_string(texts[key], names)
+        lines += ["", "  @override"]
+        if names:
+            lines += [f"  String {key}({_parameters(names, metadata)}) {{",
+                      f"    return {literal};",
+                      "  }"]
+        else:
+            line = f"  String get {key} => {literal};"
+            if _width(line) > LINE_WIDTH:
+                lines += [f"  String get {key} =>", f"      {literal};"]
+            else:
+                lines.append(line)
+    lines.append("}")
+    return '\n'.join(lines) + '\n'
+
+def _doc(key, metadata, template_locale, text):
+    description = metadata.get('description')
+    lines = [f"  /// {description}" if description else f"  /// No description provided for @{key}."]
+    return lines + [
+        "  ///",
+        f"  /// In {template_locale}, this message translates to:",
+        f"  /// **{dart_string(text)}**",
+    ]
+
+def generate_main(config, template_locale, locales, keys, texts):
+    output = config['output-class']
+    delegate = f"_{output}Delegate"
+    import_path = os.path.relpath(os.path.join(config['output-dir'], config['output-localization-file']),
+                                  'lib').replace(os.sep, '/')
+    members = []
+    for key, (names, metadata) in keys.items():
+        members += [""] + _doc(key, metadata, template_locale, texts[template_locale][key])
+        if names:
+            members.append(f"  String {key}({_parameters(names, metadata)});")
+        else:
+            members.append(f"  String get {key};")
+    supported = ',\n'.join(f"    Locale('{locale}')" for locale in locales)
+    cases = ''.join(f"    case '{locale}':\n      return {class_name(config, locale)}();\n" for locale in locales)
+    codes = ', '.join(f"'{locale}'" for locale in locales)
+    imports = ''.join(f"import '{os.path.basename(locale_file(config, locale))}';\n" for locale in locales)
+    return MAIN_TEMPLATE.format(
+        imports=imports, output=output, delegate=delegate, import_path=import_path,
+        supported=supported, members='\n'.join(members), cases=cases, codes=codes)
+
+MAIN_TEMPLATE = """\
+import 'dart:async';
+
+import 'package:flutter/foundation.dart';
+import 'package:flutter/widgets.dart';
+import 'package:flutter_localizations/flutter_localizations.dart';
+import 'package:intl/intl.dart' as intl;
+
+{imports}
+// ignore_for_file: type=lint
+
+/// Callers can lookup localized strings with an instance of {output}
+/// returned by `{output}.of(context)`.
+///
+/// Applications need to include `{output}.delegate()` in their app's
+/// `localizationDelegates` list, and the locales they support in the app's
+/// `supportedLocales` list. For example:
+///
+/// ```dart
+/// import '{import_path}';
+///
+/// return MaterialApp(
+///   localizationsDelegates: {output}.localizationsDelegates,
+///   supportedLocales: {output}.supportedLocales,
+///   home: MyApplicationHome(),
+/// );
+/// ```
+///
+/// ## Update pubspec.yaml
+///
+/// Please make sure to update your pubspec.yaml to include the following
+/// packages:
+///
+/// ```yaml
+/// dependencies:
+///   # Internationalization support.
+///   flutter_localizations:
+///     sdk: flutter
+///   intl: any # Use the pinned version from flutter_localizations
+///
+///   # Rest of dependencies
+/// ```
+///
+/// ## iOS Applications
+///
+/// iOS applications define key application metadata, including supported
+/// locales, in an Info.plist file that is built into the application bundle.
+/// To configure the locales supported by your app, you’ll need to edit this
+/// file.
+///
+/// First, open your project’s ios/Runner.xcworkspace Xcode workspace file.
+/// Then, in the Project Navigator, open the Info.plist file under the Runner
+/// project’s Runner folder.
+///
+/// Next, select the Information Property List item, select Add Item from the
+/// Editor menu, then select Localizations from the pop-up menu.
+///
+/// Select and expand the newly-created Localizations item then, for each
+/// locale your application supports, add a new item and select the locale
+/// you wish to add from the pop-up menu in the Value field. This list should
+/// be consistent with the languages listed in the {output}.supportedLocales
+/// property.
+abstract class {output} {{
+  {output}(String locale)
+      : localeName = intl.Intl.canonicalizedLocale(locale.toString());
+
+  final String localeName;
+
+  static {output}? of(BuildContext context) {{
+    return Localizations.of<{output}>(context, {output});
+  }}
+
+  static const LocalizationsDelegate<{output}> delegate =
+      {delegate}();
+
+  /// A list of this localizations delegate along with the default localizations
+  /// delegates.
+  ///
+  /// Returns a list of localizations delegates containing this delegate along with
+  /// GlobalMaterialLocalizations.delegate, GlobalCupertinoLocalizations.delegate,
+  /// and GlobalWidgetsLocalizations.delegate.
+  ///
+  /// Additional delegates can be added by appending to this list in
+  /// MaterialApp. This list does not have to be used at all if a custom list
+  /// of delegates is preferred or required.
+  static const List<LocalizationsDelegate<dynamic>> localizationsDelegates =
+      <LocalizationsDelegate<dynamic>>[
+    delegate,
+    GlobalMaterialLocalizations.delegate,
+    GlobalCupertinoLocalizations.delegate,
+    GlobalWidgetsLocalizations.delegate,
+  ];
+
+  /// A list of this localizations delegate's supported locales.
+  static const List<Locale> supportedLocales = <Locale>[
+{supported}
+  ];
+{members}
+}}
+
+class {delegate}
+    extends LocalizationsDelegate<{output}> {{
+  const {delegate}();
+
+  @override
+  Future<{output}> load(Locale locale) {{
+    return SynchronousFuture<{output}>(lookup{output}(locale));
+  }}
+
+  @override
+  bool isSupported(Locale locale) =>
+      <String>[{codes}].contains(locale.languageCode);
+
+  @override
+  bool shouldReload({delegate} old) => false;
+}}
+
+{output} lookup{output}(Locale locale) {{
+  // Lookup logic when only language code is specified.
+  switch (locale.languageCode) {{
+{cases}  }}
+
+  throw FlutterError(
+      '{output}.delegate failed to load unsupported locale "$locale". This is likely '
+      'an issue with the localizations generation tool. Please file an issue '
+      'on GitHub with a reproducible sample app and the gen-l10n configuration '
+      'that was used.');
+}}
+"""
+
+def output_inputs(config, catalogs):
+    # Generated path -> digest of everything that file is generated from.
+    # A locale class depends on its own catalog and the template (key order,
+    # fallbacks); the main file on the template and the set of locales.
+    with open(__file__, 'rb') as f:
+        generator = file_digest(f.read())
+    setup = json.dumps([MANIFEST_VERSION, generator, sorted(config.items())])
+    template_path, template_data = catalogs[0]
+    template_digest = file_digest(template_data)
+    locales = [os.path.basename(path) for path, _ in catalogs]
+    inputs = {os.path.join(config['output-dir'], config['output-localization-file']):
+              file_digest(json.dumps([setup, template_digest, locales]).encode('utf-8'))}
+    for path, data in catalogs:
+        locale = os.path.basename(path)[len('app_'):-len('.arb')]
+        inputs[locale_file(config, locale)] = file_digest(
+            json.dumps([setup, template_digest, file_digest(data)]).encode('utf-8'))
+    return inputs
+
+def load_manifest(path):
+    try:
+        manifest = json.loads(read_file(path))
+        if manifest.get('version') == MANIFEST_VERSION:
+            return manifest['outputs']
+    except (OSError, ValueError, KeyError):
+        pass
+    return {}
+
+def save_manifest(path, outputs):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = path + f'.{os.getpid()}.tmp'
+    write_file(tmp, json.dumps({'version': MANIFEST_VERSION, 'outputs': outputs}, indent=1, sort_keys=True))
+    os.replace(tmp, path)
+
+def current_digest(path):
+    try:
+        with open(path, 'rb') as f:
+            return file_digest(f.read())
+    except OSError:
+        return None
+
+def stale_outputs(inputs, manifest):
+    # Outputs whose inputs changed since they were generated, or whose file
+    # no longer is what was generated
+    stale = []
+    for path, digest in inputs.items():
+        recorded = manifest.get(path)
+        if not recorded or recorded['inputs'] != digest or recorded['output'] != current_digest(path):
+            stale.append(path)
+    return stale
+
+def generate(config, catalogs, stale):
+    # Generated path -> content for the stale outputs
+    template_locale, locales, keys, texts = build_messages(catalogs)
+    contents = {}
+    main_path = os.path.join(config['output-dir'], config['output-localization-file'])
+    if main_path in stale:
+        contents[main_path] = generate_main(config, template_locale, locales, keys, texts)
+    for locale in locales:
+        path = locale_file(config, locale)
+        if path in stale:
+            contents[path] = generate_locale(config, locale, keys, texts[locale])
+    return contents
+
+def update(config, manifest_path=MANIFEST_PATH, check=False, force=False):
+    # Writes the generated files that are out of date (with `check`, only
+    # finds them) and returns their paths, or None when no input changed.
+    # Raises ArbError.
+    catalogs = load_catalogs(config)
+    inputs = output_inputs(config, catalogs)
+    manifest = {} if force or check else load_manifest(manifest_path)
+    stale = stale_outputs(inputs, manifest)
+    if not stale:
+        return None
+    # Even an unchanged file is only rewritten when its content differs
+    contents = generate(config, catalogs, stale)
+    outdated = []
+    for path, content in contents.items():
+        data = content.encode('utf-8')
+        if current_digest(path) != file_digest(data):
+            outdated.append(path)
+            if not check:
+                write_file(path, content)
+                print(f"Generated {path}")
+        manifest[path] = {'inputs': inputs[path], 'output': file_digest(data)}
+    if not check:
+        save_manifest(manifest_path, manifest)
+    return outdated
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the Dart localizations from the ARB catalogs")
+    parser.add_argument('--config', default=CONFIG_PATH, help=f"gen-l10n config (default: {CONFIG_PATH})")
+    parser.add_argument('--manifest', default=MANIFEST_PATH, help=f"(default: {MANIFEST_PATH})")
+    parser.add_argument('--force', action='store_true', help="regenerate every file")
+    parser.add_argument('--check', action='store_true',
+                        help="don't write; exit 1 if a generated file is out of date")
+    args = parser.parse_args()
+
+    try:
+        outdated = update(load_config(args.config), args.manifest, args.check, args.force)
+    except ArbError as e:
+        sys.exit(f"error: {e}")
+    if outdated is None:
+        print("Localizations are up to date")
+        return
+    if args.check:
+        for path in outdated:
+            print(f"Out of date: {path}")
+        if outdated:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
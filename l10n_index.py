@@ -0,0 +1,234 @@
+import argparse
+import bisect
+import glob
+import json
+import os
+import re
+import sys
+
+from arb_index import ARB_DIR, TEMPLATE_LOCALE, is_ui_text, load_messages, snake_case
+from dart_lexer import CLOSE, IDENT, OPEN, PUNCT, STRING, token_text, tokenize
+from repair_cache import CACHE_DIR
+from repair_common import iter_dart_files, read_file
+
+# Persistent index of localization key usages across lib/.
+#
+# Every .dart file outside lib/l10n is tokenized once and two kinds of names
+# are recorded with their line and column:
+#   getter   a member read off AppLocalizations.of(context)! (or a variable
+#            holding it), e.g. `.addTrip`
+#   literal  a string literal spelled like an identifier, e.g. 'stat_delayed';
+#            `ui` is set when it sits in UI text (Text('...'), label: '...')
+# The index is kept inverted, name -> file -> occurrences, next to each
+# file's stat, so a refresh only re-reads the files that changed. Names are
+# matched against the ARB catalogs at query time, so editing a catalog needs
+# no rebuild.
+#
+#   python l10n_index.py where stat_delayed refundDetailsTitle
+#   python l10n_index.py unused
+#   python l10n_index.py missing
+
+INDEX_PATH = os.path.join(CACHE_DIR, 'l10n_index.json')
+INDEX_VERSION = 1
+
+GETTER = 'getter'
+LITERAL = 'literal'
+
+_KEY_LIKE = re.compile(r"[A-Za-z][A-Za-z0-9_]*\Z")
+# What a literal has to look like to be reported as a missing key
+_SNAKE_KEY = re.compile(r"[a-z][a-z0-9]*(?:_[a-z0-9]+)+\Z")
+
+def catalogs(arb_dir=ARB_DIR):
+    # locale -> set of message keys, for every app_<locale>.arb
+    result = {}
+    for path in sorted(glob.glob(os.path.join(arb_dir, 'app_*.arb'))):
+        locale = os.path.basename(path)[len('app_'):-len('.arb')]
+        result[locale] = set(load_messages(path))
+    return result
+
+def spellings(key, catalogs):
+    # A key is used as its getter or as a literal in either spelling, so
+    # 'stat_delayed' also finds `.statDelayed` when the catalogs have it
+    names = {key, snake_case(key)}
+    for keys in catalogs.values():
+        names.update(k for k in keys if snake_case(k) == key)
+    return sorted(names)
+
+def _skip_call(tokens, i):
+    # `i` is at an opening paren; returns the index just past its match
+    depth = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token.kind == OPEN:
+            depth += 1
+        elif token.kind == CLOSE:
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return i
+
+def _member_after(tokens, i, content):
+    # Index of the member name in `!.name` / `?.name` / `.name` at `i`, if any
+    if i < len(tokens) and tokens[i].kind == PUNCT and content[tokens[i].start] in '!?':
+        i += 1
+    if i + 1 < len(tokens) and tokens[i].kind == PUNCT and content[tokens[i].start] == '.' \
+            and tokens[i + 1].kind == IDENT:
+        return i + 1
+    return None
+
+def scan(content):
+    # Returns [(name, kind, offset, ui)] for one file
+    tokens = tokenize(content)
+    found = []
+    holders = set()
+    for i, token in enumerate(tokens):
+        text = content[token.start:token.end]
+        if token.kind == STRING:
+            body = text[1:-1]
+            if text[0] in '\'"' and _KEY_LIKE.match(body):
+                found.append((body, LITERAL, token.start, is_ui_text(content, tokens, i)))
+            continue
+        if token.kind != IDENT:
+            continue
+        if text == 'AppLocalizations' and i + 3 < len(tokens) \
+                and content[tokens[i + 2].start:tokens[i + 2].end] == 'of' \
+                and content[tokens[i + 3].start] == '(':
+            end = _skip_call(tokens, i + 3)
+            member = _member_after(tokens, end, content)
+            if member is not None:
+                found.append((token_text(content, tokens[member]), GETTER, tokens[member].start, False))
+            elif i >= 2 and content[tokens[i - 1].start] == '=' and tokens[i - 2].kind == IDENT:
+                # final l10n = AppLocalizations.of(context)!;
+                holders.add(token_text(content, tokens[i - 2]))
+        elif text in holders:
+            member = _member_after(tokens, i + 1, content)
+            if member is not None:
+                found.append((token_text(content, tokens[member]), GETTER, tokens[member].start, False))
+    return found
+
+class L10nIndex:
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        # filepath -> [mtime_ns, size, names in it]
+        self.files = {}
+        # name -> filepath -> [[line, col, kind, ui], ...]
+        self.names = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get('version') == INDEX_VERSION:
+                self.files = index['files']
+                self.names = index['names']
+
+    def _drop(self, filepath):
+        record = self.files.pop(filepath, None)
+        for name in record[2] if record else ():
+            occurrences = self.names.get(name, {})
+            occurrences.pop(filepath, None)
+            if not occurrences:
+                self.names.pop(name, None)
+
+    def _add(self, filepath, st, content):
+        line_starts = [0] + [m.end() for m in re.finditer('\n', content)]
+        names = set()
+        for name, kind, offset, ui in scan(content):
+            line = bisect.bisect_right(line_starts, offset)
+            col = offset - line_starts[line - 1] + 1
+            self.names.setdefault(name, {}).setdefault(filepath, []).append([line, col, kind, ui])
+            names.add(name)
+        self.files[filepath] = [st.st_mtime_ns, st.st_size, sorted(names)]
+
+    def refresh(self, root_dir='lib'):
+        # Re-reads only the files whose stat changed; returns how many
+        seen = set()
+        updated = 0
+        for filepath in iter_dart_files(root_dir):
+            if os.path.normpath(filepath).startswith(os.path.normpath(ARB_DIR) + os.sep):
+                continue  # generated from the catalogs themselves
+            seen.add(filepath)
+            st = os.stat(filepath)
+            record = self.files.get(filepath)
+            if record and record[:2] == [st.st_mtime_ns, st.st_size]:
+                continue
+            self._drop(filepath)
+            self._add(filepath, st, read_file(filepath))
+            updated += 1
+        for filepath in set(self.files) - seen:
+            self._drop(filepath)
+            updated += 1
+        return updated
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'files': self.files, 'names': self.names}, f)
+        os.replace(tmp, self.path)
+
+    def occurrences(self, name):
+        # [(filepath, line, col, kind, ui)] sorted by position
+        return sorted((filepath, *occurrence) for filepath, occurrences in self.names.get(name, {}).items()
+                      for occurrence in occurrences)
+
+    def where(self, spellings):
+        # [(filepath, line, col, kind, name)] for every spelling of a key
+        return sorted((filepath, line, col, kind, name) for name in spellings
+                      for filepath, line, col, kind, ui in self.occurrences(name))
+
+    def unused(self, keys):
+        return sorted(key for key in keys if key not in self.names and snake_case(key) not in self.names)
+
+    def missing(self, catalogs):
+        # name -> locales lacking it, for getters and key-like UI literals
+        # that match no catalog key in either spelling
+        known = {}
+        for locale, keys in catalogs.items():
+            for key in keys:
+                known.setdefault(key, set()).add(locale)
+                known.setdefault(snake_case(key), set()).add(locale)
+        result = {}
+        for name, occurrences in self.names.items():
+            used = [o for filepath in occurrences for o in occurrences[filepath]]
+            is_getter = any(o[2] == GETTER for o in used)
+            if not is_getter and not (_SNAKE_KEY.match(name) and any(o[3] for o in used)):
+                continue
+            lacking = sorted(set(catalogs) - known.get(name, set()))
+            if lacking:
+                result[name] = lacking
+        return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Look up localization key usages across lib/")
+    parser.add_argument('--index', default=INDEX_PATH, help=f"index file (default: {INDEX_PATH})")
+    parser.add_argument('--root', default='lib')
+    commands = parser.add_subparsers(dest='command', required=True)
+    where = commands.add_parser('where', help="where are these keys used")
+    where.add_argument('keys', nargs='+')
+    commands.add_parser('unused', help="ARB keys nothing in the tree uses")
+    commands.add_parser('missing', help="keys used in the tree that a catalog lacks")
+    commands.add_parser('refresh', help="only bring the index up to date")
+    args = parser.parse_args()
+
+    index = L10nIndex(args.index)
+    if index.refresh(args.root):
+        index.save()
+
+    if args.command == 'where':
+        known = catalogs()
+        for key in args.keys:
+            for filepath, line, col, kind, name in index.where(spellings(key, known)):
+                print(f"{filepath}:{line}:{col}: {name} ({kind})")
+    elif args.command == 'unused':
+        template = catalogs().get(TEMPLATE_LOCALE, set())
+        for key in index.unused(template):
+            print(key)
+    elif args.command == 'missing':
+        missing = index.missing(catalogs())
+        for name in sorted(missing):
+            print(f"{name}: missing from {', '.join(f'app_{locale}.arb' for locale in missing[name])}")
+        if missing:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+from call_index import MigrationRule, note_manual
+from repair_common import run_pass
+from repair_rules import edit_rules
+
+# Signature migrations, applied to every call site of the changed functions
+# and constructors from one index of the file's calls (see call_index).
+DEPENDS_ON = ['repair_final_syntax']
+
+# ConductorTripManagementScreen takes the whole EnrichedTrip as `trip`; it
+# used to take `tripId`, and some call sites were half-migrated to
+# `trip: t.trip`. Only that form is rewritten: `t` is the EnrichedTrip of
+# conductor_dashboard's trip list, and `t.tripId` / `t.trip` are its id and
+# inner Trip. Any other `tripId:` expression may not have an EnrichedTrip
+# to hand, so those calls are reported instead.
+CONDUCTOR_TRIP_SCREEN = MigrationRule(
+    'migrate_calls.conductor_trip_screen', 'ConductorTripManagementScreen',
+    rename={'tripId': 'trip'}, retype={'trip': (r"t\.trip(?:Id)?", "t")})
+
+MIGRATIONS = [CONDUCTOR_TRIP_SCREEN]
+
+# Analyzer codes these rules answer, for --diagnostics
+DIAGNOSTICS = {
+    # "The named parameter 'trip' is required" / "'tripId' isn't defined"
+    'missing_required_argument': [CONDUCTOR_TRIP_SCREEN],
+    'undefined_named_parameter': [CONDUCTOR_TRIP_SCREEN],
+    'undefined_getter': [CONDUCTOR_TRIP_SCREEN],
+    'argument_type_not_assignable': [CONDUCTOR_TRIP_SCREEN],
+}
+
+def fix_content(filepath, content):
+    note_manual(filepath, content, MIGRATIONS)
+    return edit_rules(MIGRATIONS, content, filepath)
+
+def main():
+    run_pass(fix_content, "Migrated {path}")
+
+if __name__ == "__main__":
+    main()
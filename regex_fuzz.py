@@ -0,0 +1,190 @@
+import argparse
+import json
+import math
+import random
+import sys
+import time
+
+import dart_lexer
+import repair_all
+from arb_index import CatalogRule, load_index
+from bench_repairs import BROKEN_SNIPPETS, KEYS
+from repair_budget import BudgetExceeded, file_budget
+from repair_rules import TableRule, module_rules
+
+# Backtracking fuzzer for the repair rules.
+#
+# Every rule the repair_all passes register is run on generated Dart-like
+# inputs made to make a regex backtrack, each grown through SIZES:
+#   open_starts            the rule's first anchor over and over, every
+#                          construct it opens left unfinished
+#   nested_brackets        the same, each one opening another `(`
+#   line_comments          the anchor commented out on every line
+#   unterminated_strings   the anchor in front of `'${` that never closes
+#   whitespace             the anchor followed by long runs of blanks
+#   repeated_anchors       all the anchors on every line
+#   mixed                  random Dart tokens, snippets and anchors
+# The rule's other anchors go first, so its prefilter lets the input
+# through, but they can't finish what a later anchor opens. The time taken
+# is fitted as time ~ size**k on a log-log scale; a rule with k above the
+# threshold for some shape, or that runs out of its budget, is flagged as
+# super-linear and the run exits 1.
+#
+#   python regex_fuzz.py
+#   python regex_fuzz.py --rules repair_compilation. --sizes 4000 8000 16000 32000 64000
+
+SIZES = [2000, 4000, 8000, 16000, 32000]
+THRESHOLD = 1.5
+BUDGET = 2.0
+# Times below this are mostly timer noise and are left out of the fit
+MIN_SECONDS = 1e-4
+
+FILLER = "        style: const TextStyle(fontSize: 14),\n"
+DART_TOKENS = ['Text(', ')', '(', '{', '}', '[', ']', ',', ';', '\n', ' ', '  ', '//', '/*', '*/', "'", '"',
+               '${', '$name', '?.', '??', '.translate(', 'context', 'final', 'return', 'child:', 'label:',
+               'Provider.of<LanguageProvider>(context)', "'search'", '"where_from"', '.toLowerCase()',
+               ".replaceAll(' ', '_')"]
+
+def seeds(rule):
+    # Literals that start or take part in the rule's matches
+    if isinstance(rule, TableRule):
+        return sorted(rule.replacer.table)[:3]
+    if isinstance(rule, CatalogRule):
+        return [f"Text({key}" for key in sorted(load_index())[:3]] or ['Text(']
+    return list(rule.anchors) or ['Text(']
+
+SHAPES = {
+    'open_starts': lambda seeds, rng: f"{seeds[0]} {FILLER}",
+    'nested_brackets': lambda seeds, rng: f"{seeds[0]}(\n",
+    'line_comments': lambda seeds, rng: f"// {seeds[0]}\n",
+    'unterminated_strings': lambda seeds, rng: f"{seeds[0]} '${{x\n",
+    'whitespace': lambda seeds, rng: seeds[0] + ' \t' * 20 + '\n\n',
+    'repeated_anchors': lambda seeds, rng: ' '.join(seeds) + '\n',
+    'mixed': lambda seeds, rng: rng.choice(seeds + DART_TOKENS + [s.replace('{key}', rng.choice(KEYS))
+                                                                  for s in BROKEN_SNIPPETS]),
+}
+
+def fuzz_input(rule_seeds, shape, size, seed=0):
+    rng = random.Random(seed)
+    parts = [' '.join(rule_seeds[1:]), '\n']
+    length = sum(map(len, parts))
+    while length < size:
+        unit = SHAPES[shape](rule_seeds, rng)
+        parts.append(unit)
+        length += len(unit)
+    return ''.join(parts)
+
+def time_rule(rule, content, repeat, budget):
+    # Best of `repeat` runs, each with a fresh token cache; raises
+    # BudgetExceeded if one takes longer than `budget`
+    best = None
+    for _ in range(repeat):
+        dart_lexer.clear_cache()
+        with file_budget(budget):
+            start = time.perf_counter()
+            rule.apply(content)
+            seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+def exponent(points):
+    # Least-squares slope of log(time) over log(size), or None when too few
+    # of the times are above the noise
+    points = [(math.log(size), math.log(seconds)) for size, seconds in points if seconds >= MIN_SECONDS]
+    if len(points) < 3:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / spread
+
+def fuzz_rule(rule, sizes, repeat, budget, seed=0):
+    rule_seeds = seeds(rule)
+    shapes = {}
+    for shape in SHAPES:
+        points = []
+        exceeded = error = None
+        for size in sizes:
+            try:
+                points.append((size, time_rule(rule, fuzz_input(rule_seeds, shape, size, seed), repeat, budget)))
+            except BudgetExceeded:
+                exceeded = size
+                break
+            except (RecursionError, ValueError) as e:
+                # A rule (or the tokenizer under it) that can't cope with the input
+                error = f"{type(e).__name__} at {size} chars"
+                break
+        shapes[shape] = {'seconds': dict(points), 'exponent': exponent(points), 'exceeded': exceeded,
+                         'error': error}
+    return shapes
+
+def registered_rules(passes):
+    # (pass, rule) for every rule of the passes, each once
+    found = []
+    seen = set()
+    for name, fix_content in passes:
+        for rule in module_rules(sys.modules[fix_content.__module__]) or ():
+            if rule.name not in seen:
+                seen.add(rule.name)
+                found.append((name, rule))
+    return found
+
+def verdict(shapes, threshold):
+    # (worst shape, its exponent, flagged)
+    def badness(shape):
+        entry = shapes[shape]
+        return entry['error'] is not None, entry['exceeded'] is not None, entry['exponent'] or 0
+
+    worst = max(shapes, key=badness)
+    entry = shapes[worst]
+    failed = entry['error'] is not None or entry['exceeded'] is not None
+    return worst, entry['exponent'], failed or (entry['exponent'] or 0) > threshold
+
+def main():
+    parser = argparse.ArgumentParser(description="Fuzz the repair rules for super-linear backtracking")
+    parser.add_argument('--rules', nargs='+', metavar='PREFIX',
+                        help="only the rules whose names start with one of these")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, metavar='CHARS')
+    parser.add_argument('--repeat', type=int, default=3, help="runs per input, the best one is kept")
+    parser.add_argument('--budget', type=float, default=BUDGET, metavar='SECONDS',
+                        help=f"a rule still running after this long on one input is flagged "
+                             f"(default: {BUDGET:g})")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help=f"flag rules whose time grows faster than size**THRESHOLD "
+                             f"(default: {THRESHOLD:g})")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', metavar='PATH', help="also write the full results as JSON")
+    args = parser.parse_args()
+
+    rules = registered_rules(repair_all.PASSES)
+    if args.rules:
+        rules = [(name, rule) for name, rule in rules if rule.name.startswith(tuple(args.rules))]
+    sizes = sorted(args.sizes)
+    results = {}
+    flagged = []
+    for name, rule in rules:
+        shapes = fuzz_rule(rule, sizes, args.repeat, args.budget, args.seed)
+        worst, k, bad = verdict(shapes, args.threshold)
+        results[rule.name] = {'pass': name, 'shapes': shapes, 'worst': worst, 'exponent': k, 'flagged': bad}
+        largest = max(shapes[worst]['seconds'].values(), default=0.0)
+        growth = f"k={k:.2f}" if k is not None else "too fast to fit"
+        if shapes[worst]['exceeded'] is not None:
+            growth = f"over {args.budget:g}s at {shapes[worst]['exceeded']} chars"
+        if shapes[worst]['error'] is not None:
+            growth = shapes[worst]['error']
+        status = 'ERROR' if shapes[worst]['error'] else 'SUPER-LINEAR' if bad else 'ok'
+        print(f"{status:<12} {rule.name:<56} {worst:<20} {growth:<24} "
+              f"{largest:8.4f}s")
+        if bad:
+            flagged.append(rule.name)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'sizes': sizes, 'threshold': args.threshold, 'rules': results}, f, indent=2)
+    if flagged:
+        print(f"\n{len(flagged)} of {len(rules)} rules grow faster than size**{args.threshold:g}: "
+              + ', '.join(flagged))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import sys
+
+import fix_translations
+import fix_user_pages_text
+import final_fix
+import migrate_calls
+import repair_bus_list
+import repair_comments
+import repair_compilation
+import repair_final_syntax
+import repair_translations
+import repair_translations_class
+import restore_ui_text
+from repair_common import run_passes
+from repair_schedule import converge_content, order_passes
+
+# Every repair pass. Each module lists the passes it builds on in DEPENDS_ON;
+# the chain runs in that order and is repeated on a file, for the passes
+# whose inputs changed, until the file stops changing. The tree is walked
+# once and each file is read once and written at most once.
+PASSES = order_passes([
+    ('repair_translations', repair_translations.fix_content),
+    ('repair_translations_class', repair_translations_class.fix_content),
+    ('fix_translations', fix_translations.fix_content),
+    ('repair_comments', repair_comments.fix_content),
+    ('repair_compilation', repair_compilation.fix_content),
+    ('repair_bus_list', repair_bus_list.fix_content),
+    ('repair_final_syntax', repair_final_syntax.fix_content),
+    ('migrate_calls', migrate_calls.fix_content),
+    ('final_fix', final_fix.fix_content),
+    ('restore_ui_text', restore_ui_text.fix_content),
+    ('fix_user_pages_text', fix_user_pages_text.fix_content),
+])
+
+# Data files any of the passes read, for --incremental
+CACHE_INPUTS = sorted({path for _, fix_content in PASSES
+                       for path in getattr(sys.modules[fix_content.__module__], 'CACHE_INPUTS', ())})
+
+def repair_content(filepath, content):
+    return converge_content(filepath, content, PASSES)
+
+def main():
+    run_passes([('repair_all', repair_content)], "Repaired {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import signal
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from repair_rules import Phase, Rule
+
+# Per-file time budget for the repair passes (--budget SECONDS).
+#
+# A rule with a lazy DOTALL wildcard can backtrack for minutes on one
+# unlucky file, and in a parallel run that stalls a worker (and with
+# --check, the whole run). Each file gets a wall-clock budget; when it runs
+# out, SIGALRM interrupts whatever is running (the regex engine checks for
+# signals while it backtracks) and the file is left as it was. The error
+# names the rule that was running, found on the interrupted stack, so
+# nothing is tracked while the rules run.
+#
+# Needs signal.setitimer and the main thread, which pool workers and the
+# serial loop both are; anywhere else files run without a budget.
+
+BUDGET = 20.0
+
+class BudgetExceeded(Exception):
+    def __init__(self, seconds, running):
+        running = running or 'the passes'
+        super().__init__(f"{running} still running after {seconds:.1f}s")
+        self.seconds = seconds
+        self.running = running
+
+def _running(frame):
+    # The innermost rule (or phase) and pass on the interrupted stack
+    rule = name = None
+    while frame is not None and name is None:
+        owner = frame.f_locals.get('self')
+        if rule is None and isinstance(owner, (Rule, Phase)):
+            rule = owner.name
+        if frame.f_code.co_name == 'guard':
+            name = frame.f_locals.get('name')
+        frame = frame.f_back
+    if rule and name:
+        return f"{name} rule {rule}"
+    return rule or name
+
+def available():
+    return hasattr(signal, 'setitimer') and threading.current_thread() is threading.main_thread()
+
+@contextmanager
+def file_budget(seconds):
+    # Raises BudgetExceeded in the body once `seconds` have passed; a
+    # budget of 0 (or None) is no budget
+    if not seconds or not available():
+        yield
+        return
+    start = time.perf_counter()
+
+    def expired(signum, frame):
+        raise BudgetExceeded(time.perf_counter() - start, _running(frame))
+
+    previous = signal.signal(signal.SIGALRM, expired)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+def report(filepath, e):
+    print(f"error: {filepath}: {e}; left unchanged", file=sys.stderr)
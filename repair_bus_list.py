@@ -1,26 +1,30 @@
-import os
-import re
+from repair_common import fix_path, run_pass
+from repair_rules import RegexRule
 
-def fix_file(filepath):
-    with open(filepath, 'r', encoding='utf-8') as f:
-        content = f.read()
+# Fixes what stripping .translate( left behind
+DEPENDS_ON = ['fix_translations']
+
+TO_LOWER_CASE_REPLACE_ALL = RegexRule(
+    'repair_bus_list.to_lower_case_replace_all',
+    r"\.toLowerCase\(\s*\.replaceAll", ".toLowerCase().replaceAll",
+    anchors=('.toLowerCase(', '.replaceAll'))
 
-    original_content = content
+# Analyzer codes these rules answer, for --diagnostics
+DIAGNOSTICS = {
+    'expected_token': [TO_LOWER_CASE_REPLACE_ALL],
+    'missing_identifier': [TO_LOWER_CASE_REPLACE_ALL],
+}
 
+def fix_content(filepath, content):
     # Fix toLowerCase(.replaceAll -> toLowerCase().replaceAll
-    content = re.sub(r"\.toLowerCase\(\s*\.replaceAll", ".toLowerCase().replaceAll", content)
+    content = TO_LOWER_CASE_REPLACE_ALL.apply(content, filepath)
+    return content
 
-    if content != original_content:
-        print(f"Repaired {filepath}")
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
+def fix_file(filepath):
+    fix_path(filepath, fix_content)
 
 def main():
-    root_dir = 'lib'
-    for root, dirs, files in os.walk(root_dir):
-        for file in files:
-            if file.endswith(".dart"):
-                fix_file(os.path.join(root, file))
+    run_pass(fix_content)
 
 if __name__ == "__main__":
     main()
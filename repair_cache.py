@@ -0,0 +1,217 @@
+import ast
+import hashlib
+import inspect
+import json
+import os
+import sys
+import tempfile
+import zlib
+
+import dart_validate
+from repair_budget import file_budget
+
+# Persistent cache for incremental repair runs (--incremental).
+#
+# Layout under the cache dir:
+#   index.json        which files are known clean, and per-pass results
+#   objects/ab/cd...  zlib-compressed rewritten outputs, keyed by sha256
+#
+# Each pass is fingerprinted from its own source and every repo module it
+# imports, directly or not. Its results map an input hash to an output hash,
+# so editing one pass only drops that pass's results; passes before it are
+# still served from the cache. A file whose stat and pipeline are unchanged
+# since it was last seen clean is skipped without being read.
+
+CACHE_DIR = '.repair_cache'
+CACHE_VERSION = 1
+
+def content_hash(content):
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def _imported_names(path):
+    # The top-level module names a source file imports, anywhere in it
+    with open(path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read(), path)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                yield alias.name.split('.')[0]
+        elif isinstance(node, ast.ImportFrom) and not node.level and node.module:
+            yield node.module.split('.')[0]
+
+def _local_sources(module):
+    # The pass module plus every module from this directory it reaches,
+    # directly or through the modules it imports (the rule engine, the
+    # lexer, the validator), so editing any of them invalidates the pass
+    here = os.path.dirname(os.path.abspath(module.__file__))
+    pending = [os.path.abspath(module.__file__)]
+    for value in vars(module).values():
+        owner = value if inspect.ismodule(value) else sys.modules.get(getattr(value, '__module__', None) or '')
+        owner_file = getattr(owner, '__file__', None)
+        if owner_file and os.path.dirname(os.path.abspath(owner_file)) == here:
+            pending.append(os.path.abspath(owner_file))
+    sources = set()
+    while pending:
+        source = pending.pop()
+        if source in sources or not source.endswith('.py'):
+            continue
+        sources.add(source)
+        for name in _imported_names(source):
+            path = os.path.join(here, name + '.py')
+            if os.path.exists(path):
+                pending.append(path)
+    return sorted(sources)
+
+def pass_fingerprint(name, fix_content):
+    # A pass module can list data files it reads (CACHE_INPUTS) so that
+    # editing them invalidates its results just like editing its code
+    module = sys.modules[fix_content.__module__]
+    h = hashlib.sha256(f"{CACHE_VERSION}:{name}".encode('utf-8'))
+    for source in _local_sources(module) + list(getattr(module, 'CACHE_INPUTS', ())):
+        if os.path.exists(source):
+            with open(source, 'rb') as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+def pipeline_fingerprint(fingerprints):
+    return hashlib.sha256(':'.join(fingerprints).encode('utf-8')).hexdigest()
+
+class ObjectStore:
+    # Content-addressed, compressed blobs. Writes go through a temp file and
+    # a rename so parallel workers can add the same object safely.
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:])
+
+    def __contains__(self, digest):
+        return os.path.exists(self._path(digest))
+
+    def put(self, data, digest=None):
+        digest = digest or hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, 'wb') as f:
+                f.write(zlib.compress(data))
+            os.replace(tmp, path)
+        return digest
+
+    def get(self, digest):
+        with open(self._path(digest), 'rb') as f:
+            return zlib.decompress(f.read())
+
+    def digests(self):
+        if not os.path.isdir(self.root):
+            return
+        for prefix in os.listdir(self.root):
+            for rest in os.listdir(os.path.join(self.root, prefix)):
+                yield prefix + rest
+
+    def remove(self, digest):
+        os.remove(self._path(digest))
+
+class RepairCache:
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.index_path = os.path.join(cache_dir, 'index.json')
+        self.objects = ObjectStore(os.path.join(cache_dir, 'objects'))
+        self.files = {}
+        self.passes = {}
+        self.dropped = False
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get('version') == CACHE_VERSION:
+                self.files = index['files']
+                self.passes = index['passes']
+
+    def is_clean(self, pipeline, filepath, st):
+        record = self.files.get(pipeline, {}).get(filepath)
+        return record is not None and record[:2] == [st.st_mtime_ns, st.st_size]
+
+    def clean_hash(self, pipeline, filepath):
+        record = self.files.get(pipeline, {}).get(filepath)
+        return record[2] if record else None
+
+    def merge(self, new_results):
+        for name, fingerprint, digest, out_digest in new_results:
+            self.results(name, fingerprint)[digest] = out_digest
+
+    def mark_clean(self, pipeline, filepath, st, digest):
+        self.files.setdefault(pipeline, {})[filepath] = [st.st_mtime_ns, st.st_size, digest]
+
+    def forget(self, pipeline, filepath):
+        self.files.get(pipeline, {}).pop(filepath, None)
+
+    def results(self, name, fingerprint):
+        # Results of a pass; a new fingerprint means its rules changed, so
+        # only this pass starts over
+        entry = self.passes.get(name)
+        if entry is None or entry['fingerprint'] != fingerprint:
+            self.dropped = self.dropped or entry is not None
+            entry = self.passes[name] = {'fingerprint': fingerprint, 'results': {}}
+        return entry['results']
+
+    def load_output(self, digest):
+        return self.objects.get(digest).decode('utf-8')
+
+    def store_output(self, content):
+        return self.objects.put(content.encode('utf-8'), content_hash(content))
+
+    def save(self):
+        if self.dropped:
+            # A rule edit reset some pass; drop outputs nothing points at now
+            live = set()
+            for entry in self.passes.values():
+                live.update(entry['results'].values())
+            for digest in list(self.objects.digests()):
+                if digest not in live:
+                    self.objects.remove(digest)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = self.index_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': CACHE_VERSION, 'files': self.files, 'passes': self.passes}, f)
+        os.replace(tmp, self.index_path)
+
+_shared = {}
+
+def shared_cache(cache_dir):
+    # One cache per process: workers load it once and only read from it,
+    # sending their new results back to the parent to merge
+    if cache_dir not in _shared:
+        _shared[cache_dir] = RepairCache(cache_dir)
+    return _shared[cache_dir]
+
+def apply_passes_cached(filepath, content, passes, cache, budget=None):
+    # Runs each (name, fingerprint, fix_content) pass, serving results from
+    # the cache when that pass already saw this exact input. Returns the
+    # output, its hash and the new (name, fingerprint, input hash, output
+    # hash) results. Only the passes count against the file's time budget
+    # (repair_budget): the outputs are stored once they are all done, so
+    # running out of time (BudgetExceeded) never interrupts a write.
+    new_results = []
+    outputs = {}
+    digest = content_hash(content)
+    with file_budget(budget):
+        for name, fingerprint, fix_content in passes:
+            out_digest = cache.results(name, fingerprint).get(digest)
+            if out_digest is not None and (out_digest == digest or out_digest in cache.objects):
+                if out_digest != digest:
+                    content = cache.load_output(out_digest)
+            else:
+                new_content = dart_validate.guard(name, fix_content, filepath, content)
+                out_digest = digest
+                if new_content != content:
+                    content = new_content
+                    out_digest = content_hash(content)
+                    outputs[out_digest] = content
+                new_results.append((name, fingerprint, digest, out_digest))
+            digest = out_digest
+    for output in outputs.values():
+        cache.store_output(output)
+    cache.merge(new_results)
+    return content, digest, new_results
@@ -1,59 +1,84 @@
-import os
 import re
 
-def fix_file(filepath):
-    with open(filepath, 'r', encoding='utf-8') as f:
-        content = f.read()
+from dart_lexer import IDENT, LINE_COMMENT
+from repair_common import fix_path, run_pass
+from repair_rules import TokenRule, edit_rules
+
+# Assumes the .translate( calls are already gone
+DEPENDS_ON = ['repair_translations']
+
+# Rules only fire on real tokens: the `//` patterns on line comments (never on
+# a `//` inside a string such as a URL), and the Text( pattern on a `Text`
+# identifier, bounded to the next couple of lines instead of the whole file.
+CHILD_TEXT = TokenRule('repair_comments.child_text', r"//\s*(child:\s*Text\()", r"\1", LINE_COMMENT,
+                       anchors=('//', 'child:'))
+HINT_TEXT = TokenRule('repair_comments.hint_text', r"//\s*(hint:\s*Text\()", r"\1", LINE_COMMENT,
+                      anchors=('//', 'hint:'))
+LABEL_TEXT = TokenRule('repair_comments.label_text', r"//\s*(label:\s*Text\()", r"\1", LINE_COMMENT,
+                       anchors=('//', 'label:'))
+TEXT_COMMENTED_STRING = TokenRule(
+    'repair_comments.text_commented_string',
+    r"Text\(\s*//\s*(['\"].*?['\"])\s*(\.[a-zA-Z]+\(\),?)", r"Text(\1\2",
+    IDENT, text='Text', lines=2, flags=re.DOTALL, anchors=('//',))
+TERNARY_ELSE = TokenRule('repair_comments.ternary_else', r"//\s*(:\s*['\"].*?['\"],?)", r"\1", LINE_COMMENT,
+                         anchors=('//',))
 
-    original_content = content
+# Analyzer codes these rules answer, for --diagnostics: what a commented-out
+# argument leaves behind
+DIAGNOSTICS = {
+    'expected_token': [CHILD_TEXT, HINT_TEXT, LABEL_TEXT, TEXT_COMMENTED_STRING, TERNARY_ELSE],
+    'missing_identifier': [TEXT_COMMENTED_STRING, TERNARY_ELSE],
+}
 
+# The rules of a round are matched against the same text and their edits
+# applied together; each one uncomments something different
+FIRST_ROUND = [
     # 1. Uncomment `// child: Text(...)`
     # Pattern: // whitespace child: Text(
-    content = re.sub(r"//\s*(child:\s*Text\()", r"\1", content)
-    
+    CHILD_TEXT,
+
     # 2. Uncomment `// hint: Text(...)`
-    content = re.sub(r"//\s*(hint:\s*Text\()", r"\1", content)
+    HINT_TEXT,
 
     # 3. Uncomment `// label: Text(...)`
-    content = re.sub(r"//\s*(label:\s*Text\()", r"\1", content)
-
-    # 4. Uncomment `// 'string'` inside Text( or similar
-    # This specifically addresses the broken Text widget in admin_booking_list.dart
-    # Pattern: child: Text( \n // 'status_$s' \n .toUpperCase()
-    # matches: Text\(\s*//\s*(['"].*?['"])\s*(\.[a-zA-Z]+\(\))?
-    # Replace with: Text(\1\2
-    content = re.sub(r"Text\(\s*//\s*(['\"].*?['\"])\s*(\.[a-zA-Z]+\(\),?)", r"Text(\1\2", content, flags=re.DOTALL)
-
-    # 5. Generic uncomment of `// child: Text(...)` spanning multiple lines if any
-    # (Regex #1 parses line by line if defaults used, but we want to be safe)
-    
-    # 6. Check for `// : 'travel_date_hint',`
+    LABEL_TEXT,
+
+    # 4. Check for `// : 'travel_date_hint',`
     # In admin_booking_list.dart:
     # 191:                                           .format(_selectedDate!)
     # 192: //                                       : 'travel_date_hint',
     # This is part of ternary operator: condition ? val : val
     # We need to uncomment this too.
     # Pattern: // : '...'
-    content = re.sub(r"//\s*(:\s*['\"].*?['\"],?)", r"\1", content)
-
-    # 7. Check for `// .translate(...)` that might still exist?
-    # No, hopefully previous script fixed that.
-    
-    # 8. Late Departures Screen: `Text('some_string'.translate(...))`
-    # If regex #3 in repair_translations didn't catch it.
-    # But let's assume repair_translations did its job on .translate replacement.
-    
-    if content != original_content:
-        print(f"Repaired comments in {filepath}")
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
+    TERNARY_ELSE,
+]
+
+# 5. Uncomment `// 'string'` inside Text( or similar
+# This specifically addresses the broken Text widget in admin_booking_list.dart
+# Pattern: child: Text( \n // 'status_$s' \n .toUpperCase()
+# matches: Text\(\s*//\s*(['"].*?['"])\s*(\.[a-zA-Z]+\(\))?
+# Replace with: Text(\1\2
+# Its own round: the `Text(` it starts on is often the one CHILD_TEXT has
+# just uncommented, and it only matches on a real `Text` token.
+ROUNDS = [FIRST_ROUND, [TEXT_COMMENTED_STRING]]
+
+# 6. Check for `// .translate(...)` that might still exist?
+# No, hopefully previous script fixed that.
+
+# 7. Late Departures Screen: `Text('some_string'.translate(...))`
+# If regex #3 in repair_translations didn't catch it.
+# But let's assume repair_translations did its job on .translate replacement.
+
+def fix_content(filepath, content):
+    for rules in ROUNDS:
+        content = edit_rules(rules, content, filepath)
+    return content
+
+def fix_file(filepath):
+    fix_path(filepath, fix_content, "Repaired comments in {path}")
 
 def main():
-    root_dir = 'lib'
-    for root, dirs, files in os.walk(root_dir):
-        for file in files:
-            if file.endswith(".dart"):
-                fix_file(os.path.join(root, file))
+    run_pass(fix_content, "Repaired comments in {path}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,479 @@
+import argparse
+import difflib
+import functools
+import json
+import mmap
+import os
+import sys
+
+import dart_validate
+from repair_budget import BUDGET, BudgetExceeded, file_budget, report as report_budget
+from repair_cache import (CACHE_DIR, apply_passes_cached, content_hash,
+                          pass_fingerprint, pipeline_fingerprint, shared_cache)
+from repair_diagnostics import WINDOW, diagnostic_rules, fix_diagnostics, load_diagnostics, unanswered
+from repair_git import BlobReader, changed_files, index_entries, stage_blobs, write_blobs
+from repair_rules import NOTICES, STATS, module_rules
+from repair_snapshots import file_digest, list_runs, new_run_id, record_run, rollback_run, snapshot_file
+from repair_watch import watch_batches
+
+# Shared helpers for the repair_*.py / fix_*.py scripts so every pass walks,
+# reads and writes the tree the same way.
+
+def iter_dart_files(root_dir='lib'):
+    # Sorted so every run (and every pass) visits files in the same order
+    for root, dirs, files in os.walk(root_dir):
+        dirs.sort()
+        for file in sorted(files):
+            if file.endswith(".dart"):
+                yield os.path.join(root, file)
+
+def read_file(filepath):
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def write_file(filepath, content):
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+# What a run does with a file that needs changes
+WRITE = 'write'
+CHECK = 'check'
+DIFF = 'diff'
+
+def unified_diff(filepath, old, new):
+    lines = []
+    for line in difflib.unified_diff(old.splitlines(True), new.splitlines(True),
+                                     'a/' + filepath, 'b/' + filepath):
+        lines.append(line)
+        if not line.endswith('\n'):
+            lines.append('\n\\ No newline at end of file\n')
+    return ''.join(lines)
+
+def finish_file(filepath, content, new_content, mode=WRITE, snapshots=None):
+    # Returns something truthy when the file needs changes: the unified diff
+    # in DIFF mode, True otherwise. Only WRITE mode touches the file; with a
+    # snapshot dir it first keeps the file's pre-image there and returns the
+    # digests of the file [before, after].
+    if new_content == content:
+        return False
+    if mode == DIFF:
+        return unified_diff(filepath, content, new_content)
+    if mode == WRITE:
+        before = snapshot_file(snapshots, filepath) if snapshots else None
+        write_file(filepath, new_content)
+        if before:
+            return [before, file_digest(filepath)]
+    return True
+
+def update_file(filepath, fix_content, mode=WRITE, snapshots=None):
+    # Run a single content -> content pass over one file, writing only on change
+    content = read_file(filepath)
+    return finish_file(filepath, content, fix_content(filepath, content), mode, snapshots)
+
+def apply_passes(filepath, content, passes, budget=None):
+    # Each pass sees the output of the one before it; a rewrite that breaks
+    # the file's structure is dropped (dart_validate). A file that runs out
+    # of its time budget (repair_budget) comes back as it was; only the
+    # passes are timed, never the reads and writes around them.
+    new_content = content
+    try:
+        with file_budget(budget):
+            for name, fix_content in passes:
+                new_content = dart_validate.guard(name, fix_content, filepath, new_content)
+    except BudgetExceeded as e:
+        report_budget(filepath, e)
+        return content
+    return new_content
+
+def update_file_cached(filepath, passes, pipeline, cache_dir, mode=WRITE, snapshots=None, budget=None):
+    # Like update_file, but served from the incremental cache where possible.
+    # Returns (changed, stat after the run, content hash if the file is
+    # clean, new pass results for the parent to merge). A file this run
+    # rewrote is clean as written, so the next run doesn't open it again.
+    cache = shared_cache(cache_dir)
+    content = read_file(filepath)
+    digest = content_hash(content)
+    new_results = []
+    new_content = content
+    if cache.clean_hash(pipeline, filepath) != digest:
+        try:
+            new_content, new_digest, new_results = apply_passes_cached(filepath, content, passes, cache, budget)
+        except BudgetExceeded as e:
+            # Left as it was and, without a hash, not recorded as clean
+            report_budget(filepath, e)
+            return False, os.stat(filepath), None, []
+    changed = finish_file(filepath, content, new_content, mode, snapshots)
+    if changed and mode == WRITE:
+        digest = new_digest
+    elif changed:
+        digest = None
+    return changed, os.stat(filepath), digest, new_results
+
+def pass_rules(passes):
+    # Every rule the passes may apply, or None if some pass can't tell
+    rules = []
+    for name, fix_content in passes:
+        module = sys.modules[fix_content.__module__]
+        # A module that chains other passes (PASSES) may apply any of theirs
+        chained = getattr(module, 'PASSES', None)
+        found = pass_rules(chained) if chained is not None else module_rules(module)
+        if found is None:
+            return None
+        rules.extend(found)
+    return rules
+
+def may_need_changes(filepath, rules):
+    # Discovery without decoding: the file is memory-mapped and searched for
+    # the rules' anchors as bytes. A file no rule could fire on is never
+    # read into a str; the first rule to change a file must have had all of
+    # its anchors in the original bytes.
+    rules = [rule for rule in rules if rule.applies_to(filepath)]
+    if not rules:
+        return False
+    with open(filepath, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return any(rule.may_match_bytes(b'') for rule in rules)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return any(rule.may_match_bytes(data) for rule in rules)
+
+def fix_path(filepath, fix_content, message="Repaired {path}"):
+    changed = update_file(filepath, fix_content)
+    print_notices(NOTICES.take(), set())
+    if changed:
+        print(message.format(path=filepath, name=os.path.basename(filepath)))
+        return True
+    return False
+
+def map_files(func, filepaths, jobs=1):
+    # Yields (filepath, func(filepath)) in the order of `filepaths`, whether
+    # the work runs inline or is spread over a pool of `jobs` processes.
+    # Files are independent, so the result is the same either way.
+    filepaths = list(filepaths)
+    if jobs <= 1 or len(filepaths) < 2:
+        for filepath in filepaths:
+            yield filepath, func(filepath)
+        return
+    # Imported here: it pulls in multiprocessing, a good part of the start-up
+    # time of a run that doesn't use it
+    from concurrent.futures import ProcessPoolExecutor
+    chunksize = max(1, len(filepaths) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        try:
+            yield from zip(filepaths, pool.map(func, filepaths, chunksize=chunksize))
+        finally:
+            # The caller may stop early (--check); don't start queued work
+            pool.shutdown(cancel_futures=True)
+
+def parse_args(argv=None, description=None):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--jobs', '-j', type=int, default=1, metavar='N',
+                        help="process files over N worker processes (0 = one per CPU)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="skip files that are unchanged since they were last clean and "
+                             "reuse cached pass results")
+    parser.add_argument('--cache-dir', default=CACHE_DIR,
+                        help=f"where --incremental keeps its cache (default: {CACHE_DIR})")
+    parser.add_argument('--check', action='store_true',
+                        help="don't write; exit 1 at the first file that needs a change")
+    parser.add_argument('--diff', action='store_true',
+                        help="don't write; stream unified diffs of the changes to stdout")
+    parser.add_argument('--since', metavar='REV',
+                        help="only files added or modified against REV (plus untracked files)")
+    parser.add_argument('--staged', action='store_true',
+                        help="repair the staged version of the staged files in the git index, "
+                             "leaving the working tree alone")
+    parser.add_argument('--diagnostics', metavar='FILE',
+                        help="only fix what saved `dart analyze --format=machine` or `flutter "
+                             "analyze` output in FILE reports, with the rules mapped to each code")
+    parser.add_argument('--window', type=int, default=WINDOW, metavar='LINES',
+                        help=f"with --diagnostics, lines around each location the rules see "
+                             f"(default: {WINDOW})")
+    parser.add_argument('--watch', action='store_true',
+                        help="after the first run, keep running the passes on files as they "
+                             "are saved (Ctrl+C to stop)")
+    parser.add_argument('--debounce', type=float, default=0.2, metavar='SECONDS',
+                        help="with --watch, wait for this much quiet after a save (default: 0.2)")
+    parser.add_argument('--no-prefilter', action='store_true',
+                        help="decode and run the passes on every file, even those none of "
+                             "their anchors occur in")
+    parser.add_argument('--no-snapshot', action='store_true',
+                        help="don't keep pre-images of the files this run rewrites")
+    parser.add_argument('--rollback', metavar='RUN',
+                        help="put back the files an earlier run rewrote (RUN is a run id from "
+                             "--list-runs, or 'last'); with --check only list them")
+    parser.add_argument('--list-runs', action='store_true',
+                        help="list the runs that can be rolled back")
+    parser.add_argument('--no-validate', action='store_true',
+                        help="keep rewrites even when they leave brackets, strings or comments "
+                             "unbalanced")
+    parser.add_argument('--budget', type=float, default=BUDGET, metavar='SECONDS',
+                        help=f"leave a file unchanged when the passes spend longer than this on "
+                             f"it (default: {BUDGET:g}, 0 = no limit)")
+    parser.add_argument('--report', action='store_true',
+                        help="print per-rule matches, time and byte deltas to stderr")
+    parser.add_argument('--report-json', metavar='PATH',
+                        help="write the per-rule report, broken down by file, to PATH")
+    args = parser.parse_args(argv)
+    if args.watch and args.check:
+        parser.error("--watch can't be combined with --check")
+    if args.staged and (args.watch or args.incremental):
+        parser.error("--staged can't be combined with --watch or --incremental")
+    if args.diagnostics and (args.watch or args.incremental):
+        parser.error("--diagnostics can't be combined with --watch or --incremental")
+    args.mode = DIFF if args.diff else CHECK if args.check else WRITE
+    if args.jobs == 0:
+        args.jobs = os.cpu_count() or 1
+    return args
+
+def without_validation(filepath, worker):
+    dart_validate.ENABLED = False
+    return worker(filepath)
+
+def with_rule_stats(filepath, worker):
+    # Runs worker(filepath) with rule stats on and hands back the stats it
+    # collected alongside the result, so pool workers can report them too
+    STATS.enabled = True
+    STATS.filepath = filepath
+    return worker(filepath), STATS.take()
+
+def with_notices(filepath, worker):
+    # Runs worker(filepath) and hands back the notices the passes raised on
+    # the file (repair_rules.NOTICES) alongside the result
+    return worker(filepath), NOTICES.take()
+
+def print_notices(messages, reported):
+    # Warns about each notice the first time it comes up, however many
+    # workers, reruns or --watch rounds raise it again
+    for message in messages:
+        if message not in reported:
+            reported.add(message)
+            print(f"warning: {message}", file=sys.stderr)
+
+def write_report(stats, report=True, report_json=None):
+    if report:
+        print(stats.table(), file=sys.stderr)
+    if report_json:
+        with open(report_json, 'w', encoding='utf-8') as f:
+            json.dump({'rules': stats.by_rule()}, f, indent=2, sort_keys=True)
+
+def pass_name(fix_content):
+    # Scripts run as __main__, so name a pass after the file it lives in
+    module = sys.modules[fix_content.__module__]
+    return os.path.splitext(os.path.basename(module.__file__))[0]
+
+def run_pass(fix_content, message="Repaired {path}", root_dir='lib', argv=None, filepaths=None):
+    run_passes([(pass_name(fix_content), fix_content)], message, root_dir, argv, filepaths)
+
+def run_passes(passes, message="Repaired {path}", root_dir='lib', argv=None, filepaths=None):
+    # Runs the passes over every .dart file under root_dir, or over the given
+    # filepaths that exist. With --check/--diff nothing is written; --check
+    # exits 1 at the first file needing a change (after all the diffs when
+    # combined with --diff). With --watch, files are run again as they are
+    # saved until interrupted.
+    args = parse_args(argv)
+    snapshot_dir = os.path.join(args.cache_dir, 'snapshots')
+    if args.list_runs:
+        list_runs(snapshot_dir)
+        return
+    if args.rollback:
+        rollback_run(snapshot_dir, args.rollback, check=args.check)
+        return
+    watched = filepaths
+    diagnostics = load_diagnostics(args.diagnostics) if args.diagnostics else None
+    if args.since or args.staged:
+        # Only what git says changed; the tree itself is never walked
+        filepaths = in_scope(changed_files(args.since, args.staged), root_dir, filepaths)
+        if not args.staged:
+            filepaths = [p for p in filepaths if os.path.exists(p)]
+    elif diagnostics is not None:
+        # Only the files the analyzer reported on
+        filepaths = [p for p in in_scope(sorted(diagnostics), root_dir, filepaths) if os.path.exists(p)]
+    elif filepaths is None:
+        filepaths = iter_dart_files(root_dir)
+    else:
+        filepaths = [p for p in filepaths if os.path.exists(p)]
+    rules = None if args.no_prefilter else pass_rules(passes)
+    if diagnostics is not None:
+        # The passes give way to the rules mapped to the reported codes, run
+        # only around the reported lines
+        filepaths = [p for p in filepaths if os.path.normpath(p) in diagnostics]
+        registry = diagnostic_rules(passes)
+        for code, count in sorted(unanswered(diagnostics, registry).items()):
+            print(f"No rule for {code} ({count} reported)", file=sys.stderr)
+        rules = None if args.no_prefilter else [rule for rule, _ in registry]
+        passes = [('diagnostics', functools.partial(fix_diagnostics, diagnostics=diagnostics,
+                                                    registry=registry, radius=args.window))]
+    dart_validate.ENABLED = not args.no_validate
+    if args.staged:
+        needs_changes = run_staged(passes, rules, filepaths, message, args)
+        if reporting_requested(args):
+            write_report(STATS, args.report, args.report_json)
+        if args.check and needs_changes:
+            sys.exit(1)
+        return
+    # Every file a run rewrites is snapshotted first, for --rollback
+    snapshots = snapshot_dir if args.mode == WRITE and not args.no_snapshot else None
+    run_id = new_run_id()
+    touched = {}
+    if args.incremental:
+        cache = shared_cache(args.cache_dir)
+        # Unvalidated results are kept apart from validated ones
+        suffix = ':unvalidated' if args.no_validate else ''
+        passes = [(name, pass_fingerprint(name, fix_content) + suffix, fix_content) for name, fix_content in passes]
+        pipeline = pipeline_fingerprint([fingerprint for _, fingerprint, _ in passes])
+        worker = functools.partial(update_file_cached, passes=passes, pipeline=pipeline,
+                                   cache_dir=args.cache_dir, mode=args.mode, snapshots=snapshots,
+                                   budget=args.budget)
+    else:
+        # A file that runs out of time is left alone
+        worker = functools.partial(update_file, mode=args.mode, snapshots=snapshots,
+                                   fix_content=functools.partial(apply_passes, passes=passes, budget=args.budget))
+    if args.no_validate:
+        # Pool workers don't share our module state
+        worker = functools.partial(without_validation, worker=worker)
+    reporting = reporting_requested(args)
+    if reporting:
+        # Files served from the incremental cache run no rules, so they
+        # don't show up in the report
+        worker = functools.partial(with_rule_stats, worker=worker)
+    worker = functools.partial(with_notices, worker=worker)
+    reported = set()
+
+    def run_files(filepaths):
+        # Returns the files that needed changes
+        if args.incremental:
+            # Files last seen clean with the same stat are not even opened
+            filepaths = [p for p in filepaths if not cache.is_clean(pipeline, p, os.stat(p))]
+        if rules is not None:
+            # Files none of the rules' anchors occur in are never decoded
+            filepaths = [p for p in filepaths if may_need_changes(p, rules)]
+
+        # Workers only return what they did; reporting stays here so the
+        # log comes out in the same order as a serial run
+        needed = []
+        for filepath, result in map_files(worker, filepaths, args.jobs):
+            result, notices = result
+            print_notices(notices, reported)
+            if reporting:
+                result, entries = result
+                STATS.merge(entries)
+            if args.incremental:
+                changed, st, digest, new_results = result
+                cache.merge(new_results)
+                if digest is None:
+                    cache.forget(pipeline, filepath)
+                else:
+                    cache.mark_clean(pipeline, filepath, st, digest)
+            else:
+                changed = result
+            if not changed:
+                continue
+            needed.append(filepath)
+            if snapshots:
+                # A file rewritten again in --watch keeps its first pre-image
+                touched[filepath] = [touched.get(filepath, changed)[0], changed[1]]
+            if args.mode == DIFF:
+                sys.stdout.write(changed)
+                sys.stdout.flush()
+            elif args.mode == CHECK:
+                print(f"Would repair {filepath}")
+                break
+            else:
+                print(message.format(path=filepath, name=os.path.basename(filepath)))
+        if args.incremental:
+            cache.save()
+        if snapshots and needed:
+            if not os.path.exists(os.path.join(snapshot_dir, 'runs', run_id + '.json')):
+                print(f"Run {run_id} (undo with --rollback {run_id})", file=sys.stderr)
+            record_run(snapshot_dir, run_id, touched)
+        return needed
+
+    needs_changes = bool(run_files(filepaths))
+    if args.watch:
+        watch(run_files, root_dir, watched, args.debounce, args.mode == WRITE)
+    if reporting:
+        write_report(STATS, args.report, args.report_json)
+    if args.check and needs_changes:
+        sys.exit(1)
+
+def reporting_requested(args):
+    return bool(args.report or args.report_json)
+
+def in_scope(paths, root_dir, filepaths=None):
+    # The .dart files among `paths` a run over root_dir (or over the fixed
+    # `filepaths`) would have visited
+    if filepaths is not None:
+        wanted = {os.path.normpath(p) for p in filepaths}
+        return [p for p in paths if p in wanted]
+    prefix = os.path.normpath(root_dir) + os.sep
+    return [p for p in paths if p.endswith('.dart') and p.startswith(prefix)]
+
+def run_staged(passes, rules, filepaths, message, args):
+    # --staged: the passes run on the index version of each file, read with
+    # one cat-file process; WRITE mode stages the results as new blobs,
+    # written together at the end, and leaves the working tree as it is.
+    # Returns whether anything changed.
+    if reporting_requested(args):
+        STATS.enabled = True
+    entries = index_entries(filepaths)
+    reader = BlobReader()
+    staged = []
+    reported = set()
+    needs_changes = False
+    try:
+        for filepath in filepaths:
+            if filepath not in entries:
+                continue
+            mode, blob = entries[filepath]
+            data = reader.read(blob)
+            if rules is not None and not any(rule.applies_to(filepath) and rule.may_match_bytes(data)
+                                             for rule in rules):
+                continue
+            try:
+                content = data.decode('utf-8')
+            except UnicodeDecodeError:
+                continue
+            STATS.filepath = filepath
+            new_content = apply_passes(filepath, content, passes, args.budget)
+            print_notices(NOTICES.take(), reported)
+            if new_content == content:
+                continue
+            needs_changes = True
+            if args.mode == DIFF:
+                sys.stdout.write(unified_diff(filepath, content, new_content))
+                sys.stdout.flush()
+            elif args.mode == CHECK:
+                print(f"Would repair {filepath}")
+                break
+            else:
+                staged.append((mode, new_content.encode('utf-8'), filepath))
+                print(message.format(path=filepath, name=os.path.basename(filepath)))
+    finally:
+        reader.close()
+    blobs = write_blobs([data for _, data, _ in staged])
+    stage_blobs([(mode, blob, filepath) for (mode, _, filepath), blob in zip(staged, blobs)])
+    return needs_changes
+
+def watch(run_files, root_dir, filepaths, debounce, writes):
+    # Runs run_files on each burst of saved files until Ctrl+C. Our own
+    # writes come back as events too; a file whose stat is still the one
+    # we left it with is skipped.
+    print(f"Watching {root_dir if filepaths is None else 'files'} for changes (Ctrl+C to stop)",
+          file=sys.stderr)
+    written = {}
+    try:
+        for batch in watch_batches(root_dir, filepaths, debounce):
+            batch = [p for p in batch if written.pop(p, None) != _stamp(p)]
+            needed = run_files(batch)
+            if writes:
+                for filepath in needed:
+                    written[filepath] = _stamp(filepath)
+    except KeyboardInterrupt:
+        pass
+
+def _stamp(filepath):
+    try:
+        st = os.stat(filepath)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
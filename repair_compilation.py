@@ -1,25 +1,72 @@
-import os
 import re
 
-def fix_file(filepath):
-    with open(filepath, 'r', encoding='utf-8') as f:
-        content = f.read()
+from repair_common import fix_path, run_pass
+from repair_rules import AnchoredRule, Phase, RegexRule
+
+# Its fallback regexes cover text the earlier passes already touched
+DEPENDS_ON = ['repair_translations', 'repair_comments']
+
+HOME_SCREEN = '*home_screen.dart'
+
+TEXT_COMMENTED_STRING = RegexRule(
+    'repair_compilation.text_commented_string',
+    r"Text\(\s*//\s*(['\"].*?['\"])(,)?", r"Text(\1\2", re.IGNORECASE, anchors=('Text(', '//'))
+KPI_CARD_COMMENTED_STRING = RegexRule(
+    'repair_compilation.kpi_card_commented_string',
+    r"_kpiCard\(\s*//\s*(['\"].*?['\"])(,)?", r"_kpiCard(\1\2", re.IGNORECASE,
+    anchors=('_kpiCard(', '//'))
+LABEL_TEXT_COMMENTED_STRING = RegexRule(
+    'repair_compilation.label_text_commented_string',
+    r"label:\s*Text\(\s*//\s*(['\"].*?['\"])(,)?", r"label: Text(\1\2", re.IGNORECASE,
+    anchors=('label:', 'Text(', '//'))
+HINT_TEXT_COMMENTED_STRING = RegexRule(
+    'repair_compilation.hint_text_commented_string',
+    r"hint:\s*Text\(\s*//\s*(['\"].*?['\"])(,)?", r"hint: Text(\1\2", re.IGNORECASE,
+    anchors=('hint:', 'Text(', '//'))
+# One scan for each pair. Once TEXT_COMMENTED_STRING has run, the label:
+# and hint: rules only see what it left, so they get a scan of their own.
+COMMENTED_CALL_STRINGS = Phase('repair_compilation.commented_call_strings',
+                               [TEXT_COMMENTED_STRING, KPI_CARD_COMMENTED_STRING])
+COMMENTED_ARGUMENT_STRINGS = Phase('repair_compilation.commented_argument_strings',
+                                   [LABEL_TEXT_COMMENTED_STRING, HINT_TEXT_COMMENTED_STRING])
+# The DOTALL rules below are anchored: each is only tried where its literal
+# start occurs, and only up to the end of that statement or call
+TRANSLATED_OPTION = AnchoredRule(
+    'repair_compilation.translated_option', 'final translatedOption =',
+    r"final translatedOption =\s*//\s*Provider\.of<LanguageProvider>.*?\)\s*\.translate\(cityKey\);", r"final translatedOption = cityKey;", re.DOTALL,
+    paths=[HOME_SCREEN], anchors=('Provider.of<LanguageProvider>', '.translate(cityKey);'))
+TRANSLATED_OPTION_FALLBACK = AnchoredRule(
+    'repair_compilation.translated_option_fallback', 'final translatedOption =',
+    r"final translatedOption =\s*[\r\n]+//\s*Provider\.of.*?\)\s*[\r\n]+\s*\.translate\(cityKey\);", r"final translatedOption = cityKey;", re.DOTALL,
+    paths=[HOME_SCREEN], anchors=('Provider.of', '.translate(cityKey);'))
+LP_ASSIGNMENT = AnchoredRule(
+    'repair_compilation.lp_assignment', 'final lp =',
+    r"final lp =\s*//\s*Provider\.of<LanguageProvider>.*?;", r"// final lp removed", re.DOTALL,
+    paths=[HOME_SCREEN], anchors=('Provider.of<LanguageProvider>',))
+TEXT_COMMENTED_STRING_METHOD = AnchoredRule(
+    'repair_compilation.text_commented_string_method', 'Text(',
+    r"Text\(\s*//\s*(['\"].*?['\"])\s*(\.[a-zA-Z0-9_]+\(\))", r"Text(\1\2", re.DOTALL,
+    anchors=('//',))
 
-    original_content = content
+# Analyzer codes these rules answer, for --diagnostics
+DIAGNOSTICS = {
+    'expected_token': [TEXT_COMMENTED_STRING, KPI_CARD_COMMENTED_STRING, LABEL_TEXT_COMMENTED_STRING,
+                       HINT_TEXT_COMMENTED_STRING, TEXT_COMMENTED_STRING_METHOD],
+    'missing_identifier': [TEXT_COMMENTED_STRING, KPI_CARD_COMMENTED_STRING, LABEL_TEXT_COMMENTED_STRING,
+                           HINT_TEXT_COMMENTED_STRING, TEXT_COMMENTED_STRING_METHOD,
+                           TRANSLATED_OPTION, TRANSLATED_OPTION_FALLBACK, LP_ASSIGNMENT],
+}
 
+def fix_content(filepath, content):
     # 1. Fix Text( // 'string' pattern (and variants like "string")
     # Matches: Text( \n // 'string',
     # Replacement: Text('string',
-    content = re.sub(r"Text\(\s*//\s*(['\"].*?['\"])(,)?", r"Text(\1\2", content, flags=re.IGNORECASE)
-
     # 2. Fix _kpiCard( // 'string',
-    content = re.sub(r"_kpiCard\(\s*//\s*(['\"].*?['\"])(,)?", r"_kpiCard(\1\2", content, flags=re.IGNORECASE)
+    content = COMMENTED_CALL_STRINGS.apply(content, filepath)
 
     # 3. Fix label: Text( // "string"),
-    content = re.sub(r"label:\s*Text\(\s*//\s*(['\"].*?['\"])(,)?", r"label: Text(\1\2", content, flags=re.IGNORECASE)
-
     # 4. Fix hint: Text( // "string") - rare but possible
-    content = re.sub(r"hint:\s*Text\(\s*//\s*(['\"].*?['\"])(,)?", r"hint: Text(\1\2", content, flags=re.IGNORECASE)
+    content = COMMENTED_ARGUMENT_STRINGS.apply(content, filepath)
     
     # 5. Fix home_screen.dart specific broken assignments
     # final translatedOption =
@@ -29,51 +76,27 @@ def fix_file(filepath):
     # This is hard to regex perfectly, but let's try to detect the broken block.
     # We want: final translatedOption = cityKey;
     
-    if 'home_screen.dart' in filepath:
-        # Fix translatedOption assignment
-        content = re.sub(
-            r"final translatedOption =\s*//\s*Provider\.of<LanguageProvider>.*?\)\s*\.translate\(cityKey\);",
-            r"final translatedOption = cityKey;",
-            content,
-            flags=re.DOTALL
-        )
-        # Fallback for slightly different formatting or if previous regex touched it
-        content = re.sub(
-            r"final translatedOption =\s*[\r\n]+//\s*Provider\.of.*?\)\s*[\r\n]+\s*\.translate\(cityKey\);",
-            r"final translatedOption = cityKey;",
-            content,
-            flags=re.DOTALL
-        )
+    # These three only apply to home_screen.dart (see their paths)
+    # Fix translatedOption assignment
+    content = TRANSLATED_OPTION.apply(content, filepath)
+    # Fallback for slightly different formatting or if previous regex touched it
+    content = TRANSLATED_OPTION_FALLBACK.apply(content, filepath)
 
-        # Fix `final lp = // ...;`
-        content = re.sub(
-            r"final lp =\s*//\s*Provider\.of<LanguageProvider>.*?;",
-            r"// final lp removed",
-            content,
-            flags=re.DOTALL
-        )
+    # Fix `final lp = // ...;`
+    content = LP_ASSIGNMENT.apply(content, filepath)
 
     # 6. Fix `admin_refund_list.dart` etc.
     # Text( // 'status_$s' .toUpperCase()
     # matches: Text( \n // 'str' \n .upper()
-    content = re.sub(
-        r"Text\(\s*//\s*(['\"].*?['\"])\s*(\.[a-zA-Z0-9_]+\(\))",
-        r"Text(\1\2",
-        content,
-        flags=re.DOTALL
-    )
+    content = TEXT_COMMENTED_STRING_METHOD.apply(content, filepath)
 
-    if content != original_content:
-        print(f"Repaired {filepath}")
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
+    return content
+
+def fix_file(filepath):
+    fix_path(filepath, fix_content)
 
 def main():
-    root_dir = 'lib'
-    for root, dirs, files in os.walk(root_dir):
-        for file in files:
-            if file.endswith(".dart"):
-                fix_file(os.path.join(root, file))
+    run_pass(fix_content)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,131 @@
+import os
+import re
+import sys
+from collections import namedtuple
+
+from repair_rules import module_rules
+
+# Diagnostics-targeted repair (--diagnostics FILE).
+#
+# Reads saved analyzer output, either `dart analyze --format=machine`:
+#   ERROR|COMPILE_TIME_ERROR|MISSING_REQUIRED_ARGUMENT|/abs/lib/x.dart|12|5|3|The named ...
+# or `flutter analyze` / plain `dart analyze`:
+#   error • The named ... • lib/x.dart:12:5 • missing_required_argument
+#   error - The named ... - lib/x.dart:12:5 - missing_required_argument
+# Pass modules map analyzer codes to the rules that answer them
+# (DIAGNOSTICS); only the files named in the output are opened, and only
+# those rules run, each on a window of lines around every reported location
+# instead of over the whole file.
+
+Diagnostic = namedtuple('Diagnostic', 'path line col code message')
+
+WINDOW = 3
+
+_FLUTTER = re.compile(r"^\s*(?:error|warning|info|lint)\s+[•-]\s+(?P<message>.*?)\s+[•-]\s+"
+                      r"(?P<path>[^\s:]+):(?P<line>\d+):(?P<col>\d+)\s+[•-]\s+(?P<code>\w+)\s*$")
+
+def _relative(path):
+    path = os.path.normpath(path)
+    if os.path.isabs(path):
+        path = os.path.relpath(path)
+    return path
+
+def parse_line(line):
+    line = line.rstrip('\r\n')
+    fields = line.split('|', 7)
+    if len(fields) == 8 and fields[4].isdigit() and fields[5].isdigit():
+        return Diagnostic(_relative(fields[3]), int(fields[4]), int(fields[5]), fields[2].lower(),
+                          fields[7].replace('\\|', '|'))
+    m = _FLUTTER.match(line)
+    if m:
+        return Diagnostic(_relative(m.group('path')), int(m.group('line')), int(m.group('col')),
+                          m.group('code').lower(), m.group('message'))
+    return None
+
+def load_diagnostics(path):
+    # path -> [Diagnostic] for every diagnostic line in the file; anything
+    # else the analyzer printed is skipped
+    found = {}
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            diagnostic = parse_line(line)
+            if diagnostic is not None:
+                found.setdefault(diagnostic.path, []).append(diagnostic)
+    return found
+
+def diagnostic_rules(passes):
+    # [(rule, codes it answers)] for every rule some code maps to, in the
+    # order the pipeline runs them
+    registry = []
+    for name, fix_content in passes:
+        module = sys.modules[fix_content.__module__]
+        chained = getattr(module, 'PASSES', None)
+        if chained is not None:
+            registry.extend(diagnostic_rules(chained))
+            continue
+        codes = {}
+        for code, rules in getattr(module, 'DIAGNOSTICS', {}).items():
+            for rule in rules:
+                codes.setdefault(rule.name, set()).add(code.lower())
+        registry.extend((rule, codes[rule.name]) for rule in module_rules(module) or () if rule.name in codes)
+    return registry
+
+def windows(content, lines, radius=WINDOW):
+    # Merged (start, end) offsets of the lines within `radius` of each line
+    starts = [0]
+    pos = content.find('\n')
+    while pos != -1:
+        starts.append(pos + 1)
+        pos = content.find('\n', pos + 1)
+    count = len(starts)
+    starts.append(len(content))
+    spans = []
+    for line in sorted(lines):
+        if line > count:
+            continue
+        start = starts[max(1, line - radius) - 1]
+        end = starts[min(count, line + radius)]
+        if spans and start <= spans[-1][1]:
+            spans[-1] = (spans[-1][0], max(spans[-1][1], end))
+        else:
+            spans.append((start, end))
+    return spans
+
+def rules_for(diagnostics, registry):
+    # The rules the file's diagnostics call for, in pipeline order
+    codes = {diagnostic.code for diagnostic in diagnostics}
+    return [rule for rule, answers in registry if answers & codes]
+
+def apply_windowed(rules, content, filepath, spans):
+    # Each rule runs on every window, last window first so the earlier
+    # offsets stay put. Token rules see only the window, which always
+    # starts at a line start.
+    for rule in rules:
+        for start, end in reversed(spans):
+            window = content[start:end]
+            new_window = rule.apply(window, filepath)
+            if new_window != window:
+                delta = len(new_window) - len(window)
+                content = content[:start] + new_window + content[end:]
+                spans = [(s, e + delta) if s == start else (s, e) if s < start else (s + delta, e + delta)
+                         for s, e in spans]
+    return content
+
+def fix_diagnostics(filepath, content, diagnostics, registry, radius=WINDOW):
+    # A content -> content pass that only does what the analyzer asked for
+    found = diagnostics.get(os.path.normpath(filepath), ())
+    rules = rules_for(found, registry)
+    if not rules:
+        return content
+    # Guarded as a whole by the runner, like any pass
+    return apply_windowed(rules, content, filepath, windows(content, {d.line for d in found}, radius))
+
+def unanswered(diagnostics, registry):
+    # Codes in the analyzer output no rule answers, with how often they occur
+    known = set().union(*(answers for _, answers in registry))
+    counts = {}
+    for found in diagnostics.values():
+        for diagnostic in found:
+            if diagnostic.code not in known:
+                counts[diagnostic.code] = counts.get(diagnostic.code, 0) + 1
+    return counts
@@ -1,129 +1,145 @@
-import os
 import re
 
-def fix_admin_analytics(content):
-    # Fix Tab( // text: 'tab_revenue'),
-    content = re.sub(r"Tab\(\s*//\s*text:\s*(['\"].*?['\"])\),", r"Tab(text: \1),", content)
-    return content
+from dart_lexer import IDENT, LINE_COMMENT
+from repair_common import fix_path, run_pass
+from repair_rules import LiteralRule, TokenRule, edit_rules
 
-def fix_booking_details(content):
-    # Fix Text( // Provider... .translate(label...) -> Text(label...
-    # Pattern: Text(\n // Provider... \n .translate(label.toLowerCase().replaceAll(' ', '_')),
-    # We want: Text(label.toLowerCase().replaceAll(' ', '_'),
-    
-    # Regex to capture the label expression
-    # Matches: .translate( (label... ) )
-    content = re.sub(
-        r"//\s*Provider\.of<LanguageProvider>.*?\.translate\((.*?)\),",
-        r"\1,",
-        content,
-        flags=re.DOTALL
-    )
-    return content
+# The last per-screen fixes, after the generic ones
+DEPENDS_ON = ['repair_comments', 'repair_compilation', 'repair_bus_list']
 
-def fix_refund_details(content):
-    # 1. Fix AppBar( // title: Text(...)),
-    # Matches: appBar: AppBar( \n // title: Text(...)
-    # We need to ensure the closing paren '),' which was inside the comment is restored.
-    # Actually, if the line is `// title: Text('...')),` then the `),` is commented out.
-    # So we simply uncomment the whole line.
-    content = re.sub(r"appBar: AppBar\(\s*//\s*(title: Text\(.*?\)\),)", r"appBar: AppBar(\1", content, flags=re.DOTALL)
-    
-    # 2. Fix // content: Text(...)
-    content = re.sub(r"//\s*(content: Text\(.*?\),?)", r"\1", content)
-    
-    # 3. Fix _row( // 'key',
-    content = re.sub(r"_row\(\s*//\s*(['\"].*?['\"],?)", r"_row(\1", content)
-    
-    return content
+# Each rule names the screen it was written for, so a file only runs the
+# rules whose paths match it.
 
-def fix_refund_list(content):
-    # Fix _buildFilterItem...(..., // 'key')
-    content = re.sub(r"//\s*(['\"]status_.*?['\"]\)),", r"\1,", content)
-    # Also handle if paren is on next line?
-    # Pattern: // 'string')
-    content = re.sub(r"//\s*(['\"].*?['\"]\))", r"\1", content)
-    
-    # Fix Text('no_refunds_status') if it was commented?
-    # View showed: child: Text('no_refunds_status')); which looks valid if child: isn't commented.
-    # But let's check for // child: Text
-    content = re.sub(r"//\s*(child:\s*Text\(.*?\))", r"\1", content)
-    
-    return content
+# admin_analytics_dashboard.dart
+# Fix Tab( // text: 'tab_revenue'),
+TAB_TEXT = TokenRule(
+    'repair_final_syntax.tab_text',
+    r"Tab\(\s*//\s*text:\s*(['\"].*?['\"])\),", r"Tab(text: \1),",
+    IDENT, text='Tab', lines=1,
+    paths=['admin_analytics_dashboard.dart'], anchors=('text:',))
 
-def fix_stats_widget(content):
-    # Fix _buildBox(..., // 'key',
-    content = re.sub(r"//\s*(['\"]stat_.*?['\"],?)", r"\1", content)
-    return content
+# booking_details_screen.dart
+# Fix Text( // Provider... .translate(label...) -> Text(label...
+# Pattern: Text(\n // Provider... \n .translate(label.toLowerCase().replaceAll(' ', '_')),
+# We want: Text(label.toLowerCase().replaceAll(' ', '_'),
+# Only starts on a real line comment and stops two lines below it, rather
+# than letting the lazy DOTALL wildcards roam the whole file
+PROVIDER_TRANSLATE_COMMENT = TokenRule(
+    'repair_final_syntax.provider_translate_comment',
+    r"//\s*Provider\.of<LanguageProvider>.*?\.translate\((.*?)\),", r"\1,",
+    LINE_COMMENT, lines=2, flags=re.DOTALL,
+    paths=['booking_details_screen.dart'], anchors=('Provider.of<LanguageProvider>', '.translate('))
 
-def fix_simulated_conductor(content):
-    # Fix ConductorTripManagementScreen( tripId: t.tripId) -> trip: t.trip
-    # The error said 'trip' is required. And 'EnrichedTrip' t has no tripId.
-    # t.trip gives the Trip object.
-    content = re.sub(r"ConductorTripManagementScreen\(\s*tripId:\s*t\.tripId\)", r"ConductorTripManagementScreen(trip: t.trip)", content)
-    return content
+# admin_refund_details.dart
+# 1. Fix AppBar( // title: Text(...)),
+# If the line is `// title: Text('...')),` then the `),` is commented out,
+# so we simply uncomment the whole line.
+APP_BAR_TITLE = TokenRule(
+    'repair_final_syntax.app_bar_title',
+    r"appBar: AppBar\(\s*//\s*(title: Text\(.*?\)\),)", r"appBar: AppBar(\1",
+    IDENT, text='appBar', lines=1, flags=re.DOTALL,
+    paths=['admin_refund_details.dart'], anchors=('appBar: AppBar(', 'title: Text('))
+# 2. Fix // content: Text(...)
+CONTENT_TEXT = TokenRule(
+    'repair_final_syntax.content_text', r"//\s*(content: Text\(.*?\),?)", r"\1", LINE_COMMENT,
+    paths=['admin_refund_details.dart'], anchors=('content: Text(',))
+# 3. Fix _row( // 'key',
+ROW_KEY = TokenRule(
+    'repair_final_syntax.row_key',
+    r"_row\(\s*//\s*(['\"].*?['\"],?)", r"_row(\1",
+    IDENT, text='_row', lines=1,
+    paths=['admin_refund_details.dart'], anchors=('//',))
+
+# admin_refund_list.dart
+# Fix _buildFilterItem...(..., // 'key')
+FILTER_ITEM_STATUS = TokenRule(
+    'repair_final_syntax.filter_item_status', r"//\s*(['\"]status_.*?['\"]\)),", r"\1,", LINE_COMMENT,
+    paths=['admin_refund_list.dart'], anchors=('status_',))
+# Also handle if paren is on next line: // 'string')
+COMMENTED_STRING_PAREN = TokenRule(
+    'repair_final_syntax.commented_string_paren', r"//\s*(['\"].*?['\"]\))", r"\1", LINE_COMMENT,
+    paths=['admin_refund_list.dart'], anchors=('//',))
+# child: Text('no_refunds_status')); is valid unless child: is commented
+CHILD_TEXT = TokenRule(
+    'repair_final_syntax.child_text', r"//\s*(child:\s*Text\(.*?\))", r"\1", LINE_COMMENT,
+    paths=['admin_refund_list.dart'], anchors=('child:', 'Text('))
+
+# my_trips_stats_widget.dart
+# Fix _buildBox(..., // 'key',
+STAT_KEY = TokenRule(
+    'repair_final_syntax.stat_key', r"//\s*(['\"]stat_.*?['\"],?)", r"\1", LINE_COMMENT,
+    paths=['my_trips_stats_widget.dart'], anchors=('stat_',))
+
+# bus_list_screen.dart
+# Replace .fromCity?.toLowerCase() with (.fromCity ?? '').toLowerCase()
+FROM_CITY_NULL_AWARE = LiteralRule(
+    'repair_final_syntax.from_city_null_aware',
+    "controller.fromCity?.toLowerCase()", "(controller.fromCity ?? '').toLowerCase()",
+    paths=['bus_list_screen.dart'])
+TO_CITY_NULL_AWARE = LiteralRule(
+    'repair_final_syntax.to_city_null_aware',
+    "controller.toCity?.toLowerCase()", "(controller.toCity ?? '').toLowerCase()",
+    paths=['bus_list_screen.dart'])
+# Also fix the explicit `?? "")}` parenthesis mess on the known bad lines:
+# ${controller.fromCity?.toLowerCase().replaceAll(' ', '_') ?? "")}
+# -> ${(controller.fromCity ?? '').toLowerCase().replaceAll(' ', '_')}
+FROM_CITY_FALLBACK = LiteralRule(
+    'repair_final_syntax.from_city_fallback',
+    "controller.fromCity?.toLowerCase().replaceAll(' ', '_') ?? \"\")}",
+    "(controller.fromCity ?? '').toLowerCase().replaceAll(' ', '_')}",
+    paths=['bus_list_screen.dart'])
+TO_CITY_FALLBACK = LiteralRule(
+    'repair_final_syntax.to_city_fallback',
+    "controller.toCity?.toLowerCase().replaceAll(' ', '_') ?? \"\")}",
+    "(controller.toCity ?? '').toLowerCase().replaceAll(' ', '_')}",
+    paths=['bus_list_screen.dart'])
+
+RULES = [
+    TAB_TEXT,
+    PROVIDER_TRANSLATE_COMMENT,
+    APP_BAR_TITLE,
+    CONTENT_TEXT,
+    ROW_KEY,
+    FILTER_ITEM_STATUS,
+    COMMENTED_STRING_PAREN,
+    CHILD_TEXT,
+    STAT_KEY,
+    FROM_CITY_NULL_AWARE,
+    TO_CITY_NULL_AWARE,
+    FROM_CITY_FALLBACK,
+    TO_CITY_FALLBACK,
+]
+
+# The rules of a round are matched against the same text and their edits
+# applied together. A generic rule waits for a second round where a more
+# specific one covers the same text: COMMENTED_STRING_PAREN for what
+# FILTER_ITEM_STATUS leaves, and the null-aware rules for what the
+# fallbacks leave, which need the whole `?? "")}` expression and would
+# never match once the null-aware rules had rewritten half of it.
+GENERIC = [COMMENTED_STRING_PAREN, FROM_CITY_NULL_AWARE, TO_CITY_NULL_AWARE]
+ROUNDS = [[rule for rule in RULES if rule not in GENERIC], GENERIC]
 
-def fix_bus_list(content):
-    # Fix ${controller.fromCity?.toLowerCase().replaceAll...}
-    # Replace .fromCity?.toLowerCase() with (.fromCity ?? '').toLowerCase()
-    
-    # Pattern: controller.fromCity?.toLowerCase()
-    content = content.replace("controller.fromCity?.toLowerCase()", "(controller.fromCity ?? '').toLowerCase()")
-    content = content.replace("controller.toCity?.toLowerCase()", "(controller.toCity ?? '').toLowerCase()")
-    
-    # Also fix explicit `?? "")}` parenthesis mess explicitly
-    # View: ?? "")}
-    # We want to remove the `?? "")` if we already handle null via (.. ?? '')
-    # But let's just make the regex specific for the bad line
-    
-    # Target: ${controller.fromCity?.toLowerCase().replaceAll(' ', '_') ?? "")}
-    # Replace with: ${(controller.fromCity ?? '').toLowerCase().replaceAll(' ', '_')}
-    
-    # Be careful with the closing brace/paren complexity.
-    # Simplest manual replacement for the specific known string:
-    bad_str = "controller.fromCity?.toLowerCase().replaceAll(' ', '_') ?? \"\")}"
-    good_str = "(controller.fromCity ?? '').toLowerCase().replaceAll(' ', '_')}"
-    content = content.replace(bad_str, good_str)
-    
-    bad_str2 = "controller.toCity?.toLowerCase().replaceAll(' ', '_') ?? \"\")}"
-    good_str2 = "(controller.toCity ?? '').toLowerCase().replaceAll(' ', '_')}"
-    content = content.replace(bad_str2, good_str2)
+# Analyzer codes these rules answer, for --diagnostics
+DIAGNOSTICS = {
+    'expected_token': [TAB_TEXT, PROVIDER_TRANSLATE_COMMENT, APP_BAR_TITLE, CONTENT_TEXT, ROW_KEY,
+                       FILTER_ITEM_STATUS, COMMENTED_STRING_PAREN, CHILD_TEXT, STAT_KEY],
+    'missing_identifier': [PROVIDER_TRANSLATE_COMMENT, ROW_KEY, STAT_KEY],
+    'unchecked_use_of_nullable_value': [FROM_CITY_NULL_AWARE, TO_CITY_NULL_AWARE,
+                                        FROM_CITY_FALLBACK, TO_CITY_FALLBACK],
+    'argument_type_not_assignable': [FROM_CITY_NULL_AWARE, TO_CITY_NULL_AWARE],
+    'dead_null_aware_expression': [FROM_CITY_FALLBACK, TO_CITY_FALLBACK],
+}
 
+def fix_content(filepath, content):
+    for rules in ROUNDS:
+        content = edit_rules(rules, content, filepath)
     return content
 
 def process_file(filepath):
-    with open(filepath, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    original = content
-    fname = os.path.basename(filepath)
-    
-    if fname == 'admin_analytics_dashboard.dart':
-        content = fix_admin_analytics(content)
-    elif fname == 'booking_details_screen.dart':
-        content = fix_booking_details(content)
-    elif fname == 'admin_refund_details.dart':
-        content = fix_refund_details(content)
-    elif fname == 'admin_refund_list.dart':
-        content = fix_refund_list(content)
-    elif fname == 'my_trips_stats_widget.dart':
-        content = fix_stats_widget(content)
-    elif fname == 'conductor_dashboard.dart':
-        content = fix_simulated_conductor(content)
-    elif fname == 'bus_list_screen.dart':
-        content = fix_bus_list(content)
-
-    if content != original:
-        print(f"Fixed {fname}")
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
+    fix_path(filepath, fix_content, "Fixed {name}")
 
 def main():
-    root_dir = 'lib'
-    for root, dirs, files in os.walk(root_dir):
-        for file in files:
-            if file.endswith(".dart"):
-                process_file(os.path.join(root, file))
+    run_pass(fix_content, "Fixed {name}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,93 @@
+import os
+import subprocess
+import sys
+import tempfile
+
+# Git scoping for --since / --staged.
+#
+# --since REV lists the .dart files added or modified against REV (in the
+# working tree, plus untracked files) so a run only opens those. --staged
+# works on the index instead: blobs are read through one long-lived
+# `git cat-file --batch` process, and repaired content is written back as
+# new blobs by a single `git hash-object` and staged with a single
+# `git update-index --index-info`, leaving the working tree alone.
+
+def git(*args, input=None):
+    try:
+        return subprocess.run(('git',) + args, input=input, check=True,
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE).stdout
+    except FileNotFoundError:
+        sys.exit("git is not installed")
+    except subprocess.CalledProcessError as e:
+        sys.exit(f"git {args[0]} failed: {e.stderr.decode('utf-8', 'replace').strip()}")
+
+def _paths(output):
+    return [os.path.normpath(os.fsdecode(p)) for p in output.split(b'\0') if p]
+
+def changed_files(rev=None, staged=False):
+    # Added or modified files relative to the current directory. With
+    # `staged`, what the index changes against REV (default HEAD).
+    if staged:
+        return sorted(set(_paths(git('diff', '--cached', '--name-only', '--diff-filter=AM', '--relative', '-z',
+                                     *([rev] if rev else [])))))
+    paths = set(_paths(git('diff', '--name-only', '--diff-filter=AM', '--relative', '-z', rev)))
+    paths.update(_paths(git('ls-files', '--others', '--exclude-standard', '-z')))
+    return sorted(paths)
+
+def index_entries(paths):
+    # path -> (mode, blob id) for stage 0 entries of the index
+    entries = {}
+    if not paths:
+        return entries
+    for line in git('ls-files', '-s', '-z', '--', *paths).split(b'\0'):
+        if not line:
+            continue
+        info, path = line.split(b'\t', 1)
+        mode, blob, stage = info.split()
+        if stage == b'0':
+            entries[os.path.normpath(os.fsdecode(path))] = (mode.decode(), blob.decode())
+    return entries
+
+class BlobReader:
+    # One `git cat-file --batch` for every blob a run reads
+    def __init__(self):
+        self.proc = subprocess.Popen(['git', 'cat-file', '--batch'],
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def read(self, blob):
+        self.proc.stdin.write(blob.encode() + b'\n')
+        self.proc.stdin.flush()
+        header = self.proc.stdout.readline().split()
+        if len(header) != 3 or header[1] != b'blob':
+            raise KeyError(blob)
+        data = self.proc.stdout.read(int(header[2]))
+        self.proc.stdout.read(1)  # trailing newline
+        return data
+
+    def close(self):
+        self.proc.stdin.close()
+        self.proc.wait()
+
+def write_blobs(contents):
+    # Blob ids of `contents` (bytes), written with one `git hash-object`:
+    # --stdin takes a single object, so each goes through a temporary file
+    # and the lot through --stdin-paths. --no-filters hashes them as they
+    # are, as --stdin does, whatever the attributes say.
+    if not contents:
+        return []
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i, data in enumerate(contents):
+            path = os.path.join(tmp, str(i))
+            with open(path, 'wb') as f:
+                f.write(data)
+            paths.append(path)
+        output = git('hash-object', '-w', '--no-filters', '--stdin-paths',
+                     input=''.join(path + '\n' for path in paths).encode())
+    return output.decode().split()
+
+def stage_blobs(entries):
+    # entries: [(mode, blob id, path)], staged in one update-index call
+    if entries:
+        info = b''.join(f"{mode} {blob}\t{path}".encode() + b'\0' for mode, blob, path in entries)
+        git('update-index', '-z', '--index-info', input=info)
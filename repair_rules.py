@@ -0,0 +1,652 @@
+import fnmatch
+import heapq
+import os
+import re
+import time
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from functools import lru_cache
+
+from dart_lexer import construct_end, match_tokens, subn_tokens
+from replace_engine import Replacer
+
+# Named rewrite rules for the repair passes.
+#
+# Every rewrite a pass makes goes through a Rule, so a run can say which rule
+# matched where, how long it spent in the regex engine and how many bytes it
+# added or removed (--report / --report-json). Collection is off unless a
+# report was asked for.
+#
+# A rule can also say where it applies, so the cheap checks run before any
+# regex or tokenizer work:
+#   paths    globs the file must match; a glob without a '/' is matched
+#            against the file name, e.g. 'home_screen.dart' or 'lib/views/*'
+#   anchors  literals that every match contains; a file missing any of them
+#            is skipped with a plain substring test
+# The same anchors let the runner skip a file before decoding it at all
+# (may_match_bytes on the raw, memory-mapped bytes). A rule without anchors
+# always passes that check, so leaving them out is only slower, never wrong.
+#
+# A rule's rewrite is a list of edits, (start, end, replacement) spans over
+# the text it was given. apply_rules chains rules, each seeing the last
+# one's output; edit_rules matches every rule against the same text and
+# applies all their edits in one join, refusing edits that overlap
+# (EditConflict) instead of letting one rule rewrite another's output.
+
+Edit = namedtuple('Edit', 'start end text rule')
+
+class EditConflict(ValueError):
+    def __init__(self, first, second):
+        super().__init__(f"{second.rule} and {first.rule} both rewrite the text at offset {second.start}")
+        self.first = first
+        self.second = second
+
+def check_edits(edits):
+    # The edits in order, or EditConflict for the first two that overlap
+    # (two insertions at the same offset overlap too: their order is
+    # undefined)
+    edits = sorted(edits, key=lambda edit: (edit.start, edit.end))
+    for first, second in zip(edits, edits[1:]):
+        if second.start < first.end or second.start == first.start:
+            raise EditConflict(first, second)
+    return edits
+
+def join_edits(content, edits):
+    # `content` with ordered, non-overlapping edits applied, in one join
+    if not edits:
+        return content
+    parts = []
+    last = 0
+    for edit in edits:
+        parts.append(content[last:edit.start])
+        parts.append(edit.text)
+        last = edit.end
+    parts.append(content[last:])
+    return ''.join(parts)
+
+def apply_edits(content, edits):
+    return join_edits(content, check_edits(edits))
+
+class RuleStats:
+    def __init__(self):
+        self.enabled = False
+        self.filepath = None
+        # (rule, filepath) -> [matches, seconds, bytes delta]
+        self.entries = {}
+
+    def record(self, rule, matches, seconds, delta):
+        entry = self.entries.setdefault((rule, self.filepath), [0, 0.0, 0])
+        entry[0] += matches
+        entry[1] += seconds
+        entry[2] += delta
+
+    def take(self):
+        entries = [(rule, filepath, *values) for (rule, filepath), values in self.entries.items()]
+        self.entries = {}
+        return entries
+
+    def merge(self, entries):
+        for rule, filepath, matches, seconds, delta in entries:
+            entry = self.entries.setdefault((rule, filepath), [0, 0.0, 0])
+            entry[0] += matches
+            entry[1] += seconds
+            entry[2] += delta
+
+    def by_rule(self):
+        rules = {}
+        for (rule, filepath), (matches, seconds, delta) in self.entries.items():
+            entry = rules.setdefault(rule, {'matches': 0, 'seconds': 0.0, 'bytes_delta': 0, 'files': {}})
+            entry['matches'] += matches
+            entry['seconds'] += seconds
+            entry['bytes_delta'] += delta
+            if matches:
+                entry['files'][filepath] = {'matches': matches, 'seconds': seconds, 'bytes_delta': delta}
+        return rules
+
+    def table(self):
+        rows = sorted(self.by_rule().items(), key=lambda item: item[1]['seconds'], reverse=True)
+        width = max([len('rule')] + [len(name) for name, _ in rows])
+        lines = [f"{'rule':<{width}} {'files':>6} {'matches':>8} {'seconds':>9} {'bytes':>8}"]
+        for name, entry in rows:
+            lines.append(f"{name:<{width}} {len(entry['files']):>6} {entry['matches']:>8} "
+                         f"{entry['seconds']:>9.4f} {entry['bytes_delta']:>+8}")
+        return '\n'.join(lines)
+
+STATS = RuleStats()
+
+class Notices:
+    # Warnings a pass raises about a file (a call site to migrate by hand).
+    # Passes add them where they run, in a pool worker or again on a rerun;
+    # the runner collects them and prints each one once.
+    def __init__(self):
+        self.messages = {}
+
+    def add(self, message):
+        self.messages[message] = None
+
+    def take(self):
+        messages = list(self.messages)
+        self.messages = {}
+        return messages
+
+NOTICES = Notices()
+
+def _byte_delta(old, new):
+    if old is new:
+        return 0
+    return len(new.encode('utf-8')) - len(old.encode('utf-8'))
+
+@lru_cache(maxsize=4)
+def _lowered(content):
+    return content.lower()
+
+class Rule(ABC):
+    # Subclasses say how the rule finds its edits; one that doesn't fails
+    # when it is instantiated, at import, rather than on the first file
+    def __init__(self, name, paths=None, anchors=()):
+        self.name = name
+        self.paths = tuple(paths) if paths else None
+        self.anchors = tuple(anchors)
+        self.byte_anchors = tuple(anchor.encode('utf-8') for anchor in self.anchors)
+        self._path_matches = {}
+
+    def applies_to(self, filepath):
+        if self.paths is None or filepath is None:
+            return True
+        matches = self._path_matches.get(filepath)
+        if matches is None:
+            path = os.path.normpath(filepath).replace(os.sep, '/')
+            name = os.path.basename(path)
+            matches = any(fnmatch.fnmatchcase(path if '/' in glob else name, glob) for glob in self.paths)
+            self._path_matches[filepath] = matches
+        return matches
+
+    def may_match(self, content):
+        for anchor in self.anchors:
+            if anchor not in content:
+                return False
+        return True
+
+    def may_match_bytes(self, data):
+        # `data` is the undecoded file (bytes or an mmap)
+        for anchor in self.byte_anchors:
+            if data.find(anchor) == -1:
+                return False
+        return True
+
+    @abstractmethod
+    def edits(self, content):
+        # The rule's Edits over `content`, in order and non-overlapping
+        pass
+
+    def subn(self, content):
+        # Returns (new content, number of matches)
+        edits = list(self.edits(content))
+        return join_edits(content, edits), len(edits)
+
+    def apply(self, content, filepath=None):
+        if not self.applies_to(filepath) or not self.may_match(content):
+            return content
+        if not STATS.enabled:
+            return self.subn(content)[0]
+        start = time.perf_counter()
+        new_content, matches = self.subn(content)
+        seconds = time.perf_counter() - start
+        STATS.record(self.name, matches, seconds, _byte_delta(content, new_content) if matches else 0)
+        return new_content
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name!r})"
+
+class RegexRule(Rule):
+    # re.sub over the whole file
+    def __init__(self, name, pattern, repl, flags=0, paths=None, anchors=()):
+        super().__init__(name, paths, anchors)
+        self.pattern = re.compile(pattern, flags)
+        self.repl = repl
+        self._expand = None
+        if flags & re.IGNORECASE:
+            self.anchors = tuple(anchor.lower() for anchor in self.anchors)
+            self.byte_patterns = [re.compile(re.escape(anchor), re.IGNORECASE) for anchor in self.byte_anchors]
+
+    def may_match(self, content):
+        if self.pattern.flags & re.IGNORECASE:
+            content = _lowered(content)
+        return super().may_match(content)
+
+    def may_match_bytes(self, data):
+        if self.pattern.flags & re.IGNORECASE:
+            return all(pattern.search(data) for pattern in self.byte_patterns)
+        return super().may_match_bytes(data)
+
+    def matches(self, content):
+        # The non-overlapping matches the rule rewrites
+        return self.pattern.finditer(content)
+
+    def edits(self, content):
+        if self._expand is None:
+            self._expand = self.repl if callable(self.repl) else _template_expander(self.repl, 0, '')
+        for m in self.matches(content):
+            yield Edit(m.start(), m.end(), self._expand(m), self.name)
+
+    def subn(self, content):
+        return self.pattern.subn(self.repl, content)
+
+class TokenRule(RegexRule):
+    # The pattern is only tried where a `kind` token starts (see
+    # dart_lexer.sub_tokens)
+    def __init__(self, name, pattern, repl, kind, text=None, lines=None, flags=0, paths=None, anchors=()):
+        if text is not None:
+            anchors = tuple(anchors) + (text,)
+        super().__init__(name, pattern, repl, flags, paths, anchors)
+        self.kind = kind
+        self.text = text
+        self.lines = lines
+
+    def matches(self, content):
+        return match_tokens(self.pattern, content, self.kind, self.text, self.lines)
+
+    def subn(self, content):
+        return subn_tokens(self.pattern, self.repl, content, self.kind, self.text, self.lines)
+
+class AnchoredRule(RegexRule):
+    # For patterns that begin with the literal `start`: each occurrence of
+    # `start` is found with str.find and the pattern is only tried there,
+    # bounded to the construct it opens (dart_lexer.construct_end), so a
+    # lazy DOTALL wildcard can't run on to a later construct and the cost
+    # follows the number of occurrences, not the length of the file.
+    # Case-sensitive patterns only.
+    def __init__(self, name, start, pattern, repl, flags=0, paths=None, anchors=(), limit=4000):
+        assert not flags & re.IGNORECASE, name
+        super().__init__(name, pattern, repl, flags, paths, (start,) + tuple(anchors))
+        self.start = start
+        self.bracketed = any(char in start for char in '([{')
+        self.limit = limit
+
+    def matches(self, content):
+        last = 0
+        pos = content.find(self.start)
+        while pos != -1:
+            end = construct_end(content, pos, self.bracketed, self.limit)
+            m = self.pattern.match(content, pos, end)
+            if m:
+                yield m
+                last = m.end()
+            pos = content.find(self.start, max(pos + 1, last))
+
+    def subn(self, content):
+        # No re.subn for matches found this way: join the edits
+        return Rule.subn(self, content)
+
+class LiteralRule(Rule):
+    # Plain str.replace of a known bad snippet; `old` is its own anchor
+    def __init__(self, name, old, new, paths=None):
+        super().__init__(name, paths, (old,))
+        self.old = old
+        self.new = new
+
+    def edits(self, content):
+        pos = content.find(self.old)
+        while pos != -1:
+            yield Edit(pos, pos + len(self.old), self.new, self.name)
+            pos = content.find(self.old, pos + len(self.old))
+
+    def subn(self, content):
+        matches = content.count(self.old)
+        if not matches:
+            return content, 0
+        return content.replace(self.old, self.new), matches
+
+class TableRule(Rule):
+    # A whole replacement table in one scan (see replace_engine)
+    def __init__(self, name, replacements, paths=None):
+        super().__init__(name, paths)
+        self.replacer = Replacer(replacements)
+        # Any key of the table will do, found in one scan of the bytes
+        pattern = self.replacer.pattern
+        self.byte_pattern = re.compile(pattern.pattern.encode('utf-8')) if pattern else None
+
+    def may_match_bytes(self, data):
+        return self.byte_pattern is not None and self.byte_pattern.search(data) is not None
+
+    def edits(self, content):
+        if self.replacer.pattern is None:
+            return
+        table = self.replacer.table
+        for m in self.replacer.pattern.finditer(content):
+            yield Edit(m.start(), m.end(), table[m.group()], self.name)
+
+    def subn(self, content):
+        return self.replacer.subn(content)
+
+# Escapes in a pattern and in a replacement template; group 1 is a numbered
+# group reference (`\0`, `\012` and `\123` are octal escapes)
+_PATTERN_ESCAPE = re.compile(r"\\(?:0[0-7]{0,2}|[0-7]{3}|([1-9][0-9]?)|.)", re.DOTALL)
+_TEMPLATE_ESCAPE = re.compile(r"\\(?:g<(\w+)>|0[0-7]{0,2}|[0-7]{3}|([1-9][0-9]?)|.)", re.DOTALL)
+_CLASS_OPEN = re.compile(r"\[\^?\]?")
+_GROUP_NAME = re.compile(r"\(\?(P<|P=|\()(\w+)")
+_GLOBAL_FLAGS = re.compile(r"\(\?([aiLmsux]+)\)")
+_SCOPED_FLAGS = {re.IGNORECASE: 'i', re.MULTILINE: 'm', re.DOTALL: 's', re.ASCII: 'a'}
+_INLINE_FLAGS = {'a': re.ASCII, 'i': re.IGNORECASE, 'L': re.LOCALE, 'm': re.MULTILINE, 's': re.DOTALL,
+                 'u': re.UNICODE, 'x': re.VERBOSE}
+
+def _relocate(source, offset, prefix):
+    # The pattern with its numbered groups shifted by `offset` and its named
+    # groups prefixed, so it can sit inside a larger pattern, and whether it
+    # has a top-level `|`
+    out = []
+    i = 0
+    depth = 0
+    branches = False
+    in_class = False
+    while i < len(source):
+        char = source[i]
+        if char == '\\':
+            m = _PATTERN_ESCAPE.match(source, i)
+            if m.group(1) and not in_class:
+                out.append(f"(?:\\{int(m.group(1)) + offset})")
+            else:
+                out.append(m.group())
+            i = m.end()
+            continue
+        if in_class:
+            in_class = char != ']'
+            out.append(char)
+            i += 1
+            continue
+        if char == '[':
+            m = _CLASS_OPEN.match(source, i)
+            in_class = True
+            out.append(m.group())
+            i = m.end()
+            continue
+        m = _GROUP_NAME.match(source, i)
+        if m is None:
+            depth += (char == '(') - (char == ')')
+            branches = branches or (char == '|' and not depth)
+            out.append(char)
+            i += 1
+            continue
+        # (?P<name>, (?P=name) and the (?(name)...) / (?(1)...) conditionals
+        name = m.group(2)
+        name = str(int(name) + offset) if name.isdigit() else prefix + name
+        out.append(f"(?{m.group(1)}{name}")
+        # a conditional's `)` after the name closes a second `(`
+        depth += 2 if m.group(1) == '(' else 1
+        i = m.end()
+    return ''.join(out), branches
+
+_EMPTY = re.compile('')
+
+def _template_expander(template, offset, prefix):
+    # expand(m) for a replacement template of a rule inside a Phase's
+    # pattern, with its group references moved the way _relocate moved the
+    # groups. Parsed once here; Match.expand would parse it on every hit.
+    pieces = []
+    literal = []
+    pos = 0
+    for m in _TEMPLATE_ESCAPE.finditer(template):
+        literal.append(template[pos:m.start()])
+        pos = m.end()
+        name = m.group(1) or m.group(2)
+        if name is None:
+            literal.append(m.group())
+            continue
+        # the escapes in the text before, expanded the way re.sub would
+        pieces.append(_EMPTY.sub(''.join(literal), ''))
+        literal = []
+        if not name.isdigit():
+            pieces.append(prefix + name)
+        else:
+            pieces.append(int(name) + offset if int(name) else 0)
+    literal.append(template[pos:])
+    pieces.append(_EMPTY.sub(''.join(literal), ''))
+    if len(pieces) == 1:
+        return lambda m, text=pieces[0]: text
+    texts = pieces[0::2]
+    groups = pieces[1::2]
+
+    def expand(m):
+        values = m.group(*groups) if len(groups) > 1 else (m.group(groups[0]),)
+        out = [texts[0]]
+        for value, text in zip(values, texts[1:]):
+            out.append(value or '')
+            out.append(text)
+        return ''.join(out)
+    return expand
+
+def _pattern_flags(rule):
+    # (source, flags) with any leading inline flags like `(?i)` moved into
+    # the flags
+    if isinstance(rule, LiteralRule):
+        return re.escape(rule.old), 0
+    source = rule.pattern.pattern
+    flags = rule.pattern.flags
+    m = _GLOBAL_FLAGS.match(source)
+    while m:
+        for letter in m.group(1):
+            flags |= _INLINE_FLAGS[letter]
+        source = source[m.end():]
+        m = _GLOBAL_FLAGS.match(source)
+    if flags & re.VERBOSE:
+        raise ValueError(f"{rule.name}: verbose patterns can't share a Phase")
+    return source, flags & (re.IGNORECASE | re.MULTILINE | re.DOTALL | re.ASCII)
+
+def _alternative(rule, index, offset, shared):
+    # (pattern source, replacer) for one rule inside a Phase's pattern. An
+    # empty group `_r<index>` closes the rule's alternative, so it is the
+    # match's lastgroup and says which rule matched. Flags that not every
+    # rule of the scan has are scoped to the rule.
+    if isinstance(rule, LiteralRule):
+        return f"{re.escape(rule.old)}(?P<_r{index}>)", lambda m, new=rule.new: new
+    source, flags = _pattern_flags(rule)
+    source, branches = _relocate(source, offset, f"_r{index}_")
+    if flags != shared:
+        scoped = ''.join(letter for flag, letter in _SCOPED_FLAGS.items() if flags & flag)
+        source = f"(?{scoped}:{source})" if scoped else f"(?:{source})"
+    elif branches:
+        source = f"(?:{source})"
+    pattern = f"{source}(?P<_r{index}>)"
+    if callable(rule.repl):
+        # The callback gets a match of its own pattern, found again at the hit
+        return pattern, lambda m, rule=rule: rule.repl(rule.pattern.match(m.string, m.start()))
+    return pattern, _template_expander(rule.repl, offset, f"_r{index}_")
+
+# A run of literal characters, and a leading group of alternative runs
+_LITERAL_RUN = r"(?:[^\\.^$*+?{}\[\]|()]|\\[^A-Za-z0-9])+"
+_LEADING_RUN = re.compile(_LITERAL_RUN)
+_LEADING_GROUP = re.compile(rf"\((?:\?:)?({_LITERAL_RUN}(?:\|{_LITERAL_RUN})*)\)")
+_ESCAPED = re.compile(r"\\(.)")
+
+def _literal_prefixes(rule):
+    # Texts every match of the rule starts with one of, e.g. ['Text('] for
+    # `Text\(\s*` or ['final', 'var'] for `(final|var)\s+`; [] when the
+    # pattern doesn't start that plainly
+    if isinstance(rule, LiteralRule):
+        return [rule.old]
+    source = _pattern_flags(rule)[0]
+    if _relocate(source, 0, '')[1]:
+        # `a|b`: the first run only starts the first branch
+        return []
+    m = _LEADING_GROUP.match(source)
+    if m:
+        if source[m.end():m.end() + 1] in ('*', '+', '?', '{'):
+            return []
+        runs = [run.group() for run in _LEADING_RUN.finditer(m.group(1))]
+    else:
+        m = _LEADING_RUN.match(source)
+        if m is None:
+            return []
+        runs = [m.group()]
+        if source[m.end():m.end() + 1] in ('*', '+', '?', '{'):
+            # the quantifier is on the last character only
+            runs = [runs[0][:-2] if runs[0][-2:-1] == '\\' else runs[0][:-1]]
+    return [_ESCAPED.sub(r"\1", run) for run in runs if run]
+
+@lru_cache(maxsize=None)
+def _casefree(text):
+    return re.compile(re.escape(text), re.IGNORECASE)
+
+def _finder(text, ignorecase, content):
+    # find(pos): the next offset of `text` in content from pos, or -1. A
+    # case-insensitive text is looked up in the lowered content when that
+    # lines up with the content and lowering finds everything the regex
+    # engine would: the only other characters it matches to ASCII letters
+    # are U+0130, which lowers to two characters, and U+0131 and U+017F,
+    # which don't lower to 'i' and 's'.
+    if not ignorecase:
+        return lambda pos: content.find(text, pos)
+    lowered = _lowered(content)
+    if content.isascii() or (len(lowered) == len(content) and '\u0131' not in content
+                             and '\u017f' not in content):
+        needle = text.lower()
+        return lambda pos: lowered.find(needle, pos)
+    pattern = _casefree(text)
+
+    def find(pos):
+        m = pattern.search(content, pos)
+        return m.start() if m else -1
+    return find
+
+class Phase:
+    # Several whole-file rules run as one scan: their patterns are joined
+    # into one alternation, and every hit goes to the replacement of the
+    # rule that matched. At any position the rules are tried in order and
+    # the earliest match wins, so the rules of a phase must not depend on
+    # each other's rewrites; a rule that has to see another's output
+    # belongs in a later phase. A pass runs its phases
+    # in order, one scan per phase instead of one per rule.
+    #
+    # Only RegexRule and LiteralRule can share a phase. The combined
+    # pattern is built per set of rules that pass their path and anchor
+    # checks on a file, and kept. The regex engine can't skip ahead through
+    # an alternation the way it can to a single pattern's literal start, so
+    # when every rule starts with a literal (or a group of them) the scan
+    # finds those with str.find and only tries the combined pattern where
+    # one occurs; otherwise it is a plain re.sub.
+    def __init__(self, name, rules):
+        self.name = name
+        self.rules = tuple(rules)
+        for rule in self.rules:
+            if type(rule) not in (RegexRule, LiteralRule):
+                raise TypeError(f"{self.name}: {rule!r} can't share a Phase")
+            # fails here, not on the first file, if it can't be combined
+            _pattern_flags(rule)
+        self._scanners = {}
+
+    def _scanner(self, rules):
+        scanner = self._scanners.get(rules)
+        if scanner is None:
+            flags = {_pattern_flags(rule)[1] for rule in rules}
+            shared = flags.pop() if len(flags) == 1 else 0
+            sources = []
+            replacers = {}
+            offset = 0
+            for index, rule in enumerate(rules):
+                source, replacers[f"_r{index}"] = _alternative(rule, index, offset, shared)
+                sources.append(source)
+                # the rule's own groups, then the one that ends it
+                offset += (rule.pattern.groups if isinstance(rule, RegexRule) else 0) + 1
+            starts = None
+            prefixes = [(_literal_prefixes(rule), _pattern_flags(rule)[1] & re.IGNORECASE) for rule in rules]
+            if all(texts for texts, _ in prefixes):
+                starts = sorted({(text, bool(ignorecase)) for texts, ignorecase in prefixes for text in texts})
+            pattern = re.compile('|'.join(sources), shared)
+            scanner = self._scanners[rules] = (pattern, starts, replacers)
+        return scanner
+
+    def _scan(self, rules, content, replace):
+        pattern, starts, _ = self._scanner(rules)
+        if starts is None:
+            return pattern.sub(replace, content)
+        # (next offset, finder) for every literal start, nearest first
+        heads = []
+        for text, ignorecase in starts:
+            find = _finder(text, ignorecase, content)
+            pos = find(0)
+            if pos != -1:
+                heads.append((pos, len(heads), find))
+        heapq.heapify(heads)
+        parts = []
+        last = 0
+        while heads:
+            pos, index, find = heads[0]
+            if pos >= last:
+                m = pattern.match(content, pos)
+                if m:
+                    parts.append(content[last:pos])
+                    parts.append(replace(m))
+                    last = m.end()
+            pos = find(max(pos + 1, last))
+            if pos == -1:
+                heapq.heappop(heads)
+            else:
+                heapq.heapreplace(heads, (pos, index, find))
+        if not parts:
+            return content
+        parts.append(content[last:])
+        return ''.join(parts)
+
+    def _scan_counted(self, rules, content):
+        # Also returns {rule name: [matches, bytes delta]}, for the report
+        _, _, replacers = self._scanner(rules)
+        counts = {rule.name: [0, 0] for rule in rules}
+        names = {f"_r{index}": rule.name for index, rule in enumerate(rules)}
+
+        def dispatch(m):
+            new = replacers[m.lastgroup](m)
+            entry = counts[names[m.lastgroup]]
+            entry[0] += 1
+            entry[1] += _byte_delta(m.group(), new)
+            return new
+
+        return self._scan(rules, content, dispatch), counts
+
+    def apply(self, content, filepath=None):
+        rules = tuple(rule for rule in self.rules if rule.applies_to(filepath) and rule.may_match(content))
+        if not rules:
+            return content
+        if len(rules) == 1:
+            return rules[0].apply(content, filepath)
+        if not STATS.enabled:
+            replacers = self._scanner(rules)[2]
+            return self._scan(rules, content, lambda m: replacers[m.lastgroup](m))
+        start = time.perf_counter()
+        new_content, counts = self._scan_counted(rules, content)
+        # One scan for all of them; its time is shared out evenly
+        seconds = (time.perf_counter() - start) / len(rules)
+        for name, (matches, delta) in counts.items():
+            STATS.record(name, matches, seconds, delta)
+        return new_content
+
+    def __repr__(self):
+        return f"Phase({self.name!r}, {len(self.rules)} rules)"
+
+def module_rules(module):
+    # The rules a pass module defines, or None if it defines none (and so
+    # rewrites some other way that can't be prefiltered)
+    rules = [value for value in vars(module).values() if isinstance(value, Rule)]
+    return rules or None
+
+def apply_rules(rules, content, filepath=None):
+    for rule in rules:
+        content = rule.apply(content, filepath)
+    return content
+
+def edit_rules(rules, content, filepath=None):
+    # Every rule matched against `content` itself and all the edits applied
+    # in one join; raises EditConflict if two of them overlap
+    edits = []
+    for rule in rules:
+        if not rule.applies_to(filepath) or not rule.may_match(content):
+            continue
+        if not STATS.enabled:
+            edits.extend(rule.edits(content))
+            continue
+        start = time.perf_counter()
+        found = list(rule.edits(content))
+        seconds = time.perf_counter() - start
+        delta = sum(_byte_delta(content[edit.start:edit.end], edit.text) for edit in found)
+        STATS.record(rule.name, len(found), seconds, delta)
+        edits.extend(found)
+    return apply_edits(content, edits)
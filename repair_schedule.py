@@ -0,0 +1,94 @@
+import hashlib
+import sys
+
+import dart_validate
+
+# Fixed-point scheduling for the repair pipeline.
+#
+# Each pass module may list the passes whose output it expects to see in
+# DEPENDS_ON. Every pass runs once, in dependency order; after that a pass
+# is due again when it changed the file itself (a rewrite can leave or make
+# more of what it fixes), or when a pass it depends on changed the file
+# after it ran. A file is done when a sweep runs every due pass and none of
+# them changes it, so a file no pass touches takes one sweep and one they
+# fix usually two: the second checks the fixed point. A file gets at most
+# `max_rounds` sweeps, and a file that comes back to a state it was already
+# in is reported as oscillating rather than looped on.
+
+MAX_ROUNDS = 10
+
+def depends_on(fix_content):
+    return list(getattr(sys.modules[fix_content.__module__], 'DEPENDS_ON', ()))
+
+def order_passes(passes):
+    # Dependencies first, otherwise in the given order. Raises ValueError
+    # on an unknown dependency or a cycle.
+    by_name = dict(passes)
+    ordered = []
+    state = {}
+
+    def visit(name, chain):
+        if state.get(name) == 'done':
+            return
+        if state.get(name) == 'visiting':
+            raise ValueError("pass dependency cycle: " + " -> ".join(chain + [name]))
+        if name not in by_name:
+            raise ValueError(f"{chain[-1]} depends on unknown pass {name}")
+        state[name] = 'visiting'
+        for dependency in depends_on(by_name[name]):
+            visit(dependency, chain + [name])
+        state[name] = 'done'
+        ordered.append((name, by_name[name]))
+
+    for name, _ in passes:
+        visit(name, [])
+    return ordered
+
+def dependents(passes):
+    # name -> the passes that depend on it directly
+    result = {name: set() for name, _ in passes}
+    for name, fix_content in passes:
+        for dependency in depends_on(fix_content):
+            if dependency in result:
+                result[dependency].add(name)
+    return result
+
+def _digest(content):
+    return hashlib.sha256(content.encode('utf-8')).digest()
+
+def converge(filepath, content, passes, max_rounds=MAX_ROUNDS):
+    # Runs the (ordered) passes on one file until nothing is due. Returns
+    # (content, rounds, status) with status 'converged', 'oscillating' or
+    # 'capped'.
+    due_after = dependents(passes)
+    due = {name for name, _ in passes}
+    seen = {_digest(content)}
+    for rounds in range(1, max_rounds + 1):
+        for name, fix_content in passes:
+            if name not in due:
+                continue
+            due.discard(name)
+            new_content = dart_validate.guard(name, fix_content, filepath, content)
+            if new_content != content:
+                content = new_content
+                # Its dependents later in the order run on this output in
+                # this sweep; it and the ones before it in the next
+                due.update(due_after[name])
+                due.add(name)
+        if not due:
+            return content, rounds, 'converged'
+        digest = _digest(content)
+        if digest in seen:
+            return content, rounds, 'oscillating'
+        seen.add(digest)
+    return content, max_rounds, 'capped'
+
+def converge_content(filepath, content, passes, max_rounds=MAX_ROUNDS):
+    # converge() as a plain content -> content pass, warning on stderr about
+    # files that didn't settle
+    content, rounds, status = converge(filepath, content, passes, max_rounds)
+    if status == 'oscillating':
+        print(f"warning: {filepath}: passes oscillate, stopped after {rounds} rounds", file=sys.stderr)
+    elif status == 'capped':
+        print(f"warning: {filepath}: still changing after {rounds} rounds", file=sys.stderr)
+    return content
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import sys
+import time
+
+from repair_cache import CACHE_DIR, ObjectStore
+
+# Pre-images of the files a repair run rewrote, for --rollback.
+#
+# Layout under the snapshot dir:
+#   objects/ab/cd...  zlib-compressed file contents, keyed by sha256
+#   runs/<run-id>.json  one manifest per run: path -> [before, after]
+#
+# Only the files a run writes are snapshotted, raw bytes and all, just
+# before they are overwritten; a file that is the same as in an earlier run
+# is stored once. Rolling a run back puts every file it touched back the way
+# it was, but leaves alone a file that has been edited since, so later work
+# is never lost. The newest KEEP_RUNS runs are kept.
+
+SNAPSHOT_DIR = os.path.join(CACHE_DIR, 'snapshots')
+KEEP_RUNS = 20
+
+def read_bytes(filepath):
+    with open(filepath, 'rb') as f:
+        return f.read()
+
+def snapshot_file(snapshot_dir, filepath):
+    # Stores the file as it is now; returns its digest. Safe to call from
+    # parallel workers.
+    return ObjectStore(os.path.join(snapshot_dir, 'objects')).put(read_bytes(filepath))
+
+def file_digest(filepath):
+    try:
+        return hashlib.sha256(read_bytes(filepath)).hexdigest()
+    except FileNotFoundError:
+        return None
+
+def new_run_id():
+    return time.strftime('%Y%m%d-%H%M%S') + f'-{os.getpid()}'
+
+class SnapshotStore:
+    def __init__(self, root=SNAPSHOT_DIR):
+        self.root = root
+        self.objects = ObjectStore(os.path.join(root, 'objects'))
+        self.runs_dir = os.path.join(root, 'runs')
+
+    def _run_path(self, run_id):
+        return os.path.join(self.runs_dir, run_id + '.json')
+
+    def runs(self):
+        # Run ids, oldest first
+        if not os.path.isdir(self.runs_dir):
+            return []
+        return sorted(name[:-len('.json')] for name in os.listdir(self.runs_dir) if name.endswith('.json'))
+
+    def resolve(self, run_id):
+        if run_id == 'last':
+            runs = self.runs()
+            if not runs:
+                raise KeyError("no runs recorded")
+            return runs[-1]
+        if not os.path.exists(self._run_path(run_id)):
+            raise KeyError(f"no run {run_id}")
+        return run_id
+
+    def load_run(self, run_id):
+        with open(self._run_path(run_id), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_run(self, run_id, files, argv):
+        os.makedirs(self.runs_dir, exist_ok=True)
+        path = self._run_path(run_id)
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'id': run_id, 'argv': argv, 'cwd': os.getcwd(), 'files': files}, f, indent=1)
+        os.replace(tmp, path)
+
+    def prune(self, keep=KEEP_RUNS):
+        # Drops the oldest runs, then every pre-image no remaining run needs
+        runs = self.runs()
+        dropped = runs[:-keep] if keep else runs
+        if not dropped:
+            return
+        for run_id in dropped:
+            os.remove(self._run_path(run_id))
+        live = set()
+        for run_id in self.runs():
+            live.update(before for before, _ in self.load_run(run_id)['files'].values())
+        for digest in list(self.objects.digests()):
+            if digest not in live:
+                self.objects.remove(digest)
+
+    def rollback(self, run_id, write=True):
+        # Returns (restored, conflicts): the files put back (or that would
+        # be) and the ones changed since the run, which are left alone. The
+        # manifest's paths are relative to where the run was started, not
+        # to where it is rolled back from.
+        run = self.load_run(run_id)
+        cwd = run.get('cwd', os.getcwd())
+        restored = []
+        conflicts = []
+        for filepath, (before, after) in sorted(run['files'].items()):
+            path = os.path.join(cwd, filepath)
+            current = file_digest(path)
+            if current == before:
+                continue
+            if current != after:
+                conflicts.append(filepath)
+                continue
+            if write:
+                data = self.objects.get(before)
+                tmp = path + f'.{os.getpid()}.rollback'
+                with open(tmp, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            restored.append(filepath)
+        return restored, conflicts
+
+def record_run(snapshot_dir, run_id, files):
+    # Writes (or updates, in --watch) the manifest of a run that wrote files
+    store = SnapshotStore(snapshot_dir)
+    store.save_run(run_id, files, sys.argv)
+    store.prune()
+
+def rollback_run(snapshot_dir, run_id, check=False):
+    store = SnapshotStore(snapshot_dir)
+    try:
+        run_id = store.resolve(run_id)
+    except KeyError as e:
+        sys.exit(f"error: {e.args[0]}")
+    restored, conflicts = store.rollback(run_id, write=not check)
+    for filepath in restored:
+        print(f"{'Would restore' if check else 'Restored'} {filepath}")
+    for filepath in conflicts:
+        print(f"Skipped {filepath}: changed since run {run_id}", file=sys.stderr)
+    if conflicts:
+        sys.exit(1)
+
+def list_runs(snapshot_dir):
+    store = SnapshotStore(snapshot_dir)
+    for run_id in store.runs():
+        run = store.load_run(run_id)
+        command = ' '.join([os.path.basename(run['argv'][0])] + run['argv'][1:])
+        print(f"{run_id}  {len(run['files']):>4} files  {command}")
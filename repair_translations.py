@@ -1,42 +1,63 @@
-import os
 import re
 
-def fix_file(filepath):
-    with open(filepath, 'r', encoding='utf-8') as f:
-        content = f.read()
+from repair_common import fix_path, run_pass
+from repair_rules import AnchoredRule, Phase, RegexRule
+
+# The DOTALL rules only look at the expression each anchor starts, so a
+# lazy wildcard can't reach a .translate( further down the file
+LANGUAGE_PROVIDER_TRANSLATE = AnchoredRule(
+    'repair_translations.language_provider_translate', 'languageProvider',
+    r"languageProvider\s*\.translate\s*\(\s*(['\"])(.*?)\1\s*\)", r"\1\2\1", re.DOTALL,
+    anchors=('translate',))
+PROVIDER_OF_TRANSLATE = AnchoredRule(
+    'repair_translations.provider_of_translate', 'Provider.of<LanguageProvider>',
+    r"Provider\.of<LanguageProvider>\s*\(.*?\)\s*\.translate\s*\(\s*(['\"])(.*?)\1\s*\)", r"\1\2\1", re.DOTALL,
+    anchors=('translate',))
+LP_TRANSLATE = AnchoredRule(
+    'repair_translations.lp_translate', 'lp',
+    r"\blp\s*\.translate\s*\(\s*(['\"])(.*?)\1\s*\)", r"\1\2\1", re.DOTALL,
+    anchors=('translate',))
+COMMENTED_CHILD_TEXT_TRANSLATE = RegexRule(
+    'repair_translations.commented_child_text_translate',
+    r"//\s*child:\s*Text\(Provider\.of<LanguageProvider>\(context\)\s*[\r\n]+\s*\.translate\((['\"])(.*?)\1\)\)\),?", r"child: Text('\2'),", re.IGNORECASE,
+    anchors=('//', 'child:', 'Provider.of<LanguageProvider>(context)', '.translate('))
+SPLIT_CHILD_TEXT_TRANSLATE = RegexRule(
+    'repair_translations.split_child_text_translate',
+    r"child:\s*Text\(Provider\.of<LanguageProvider>\(context\)\s*[\r\n]+\s*\.translate\((['\"])(.*?)\1\)\)", r"child: Text('\2')", re.IGNORECASE,
+    anchors=('child:', 'Provider.of<LanguageProvider>(context)', '.translate('))
+# The commented form starts at the `//`, ahead of where the split form
+# would, so one scan does both
+CHILD_TEXT_TRANSLATE = Phase('repair_translations.child_text_translate',
+                             [COMMENTED_CHILD_TEXT_TRANSLATE, SPLIT_CHILD_TEXT_TRANSLATE])
 
-    original_content = content
+# Analyzer codes these rules answer, for --diagnostics: the provider and
+# its `languageProvider` / `lp` variables no longer exist
+DIAGNOSTICS = {
+    'undefined_identifier': [LANGUAGE_PROVIDER_TRANSLATE, LP_TRANSLATE],
+    'undefined_class': [PROVIDER_OF_TRANSLATE, COMMENTED_CHILD_TEXT_TRANSLATE, SPLIT_CHILD_TEXT_TRANSLATE],
+    'non_type_as_type_argument': [PROVIDER_OF_TRANSLATE, COMMENTED_CHILD_TEXT_TRANSLATE,
+                                  SPLIT_CHILD_TEXT_TRANSLATE],
+}
 
+def fix_content(filepath, content):
     # 1. Handle multi-line `languageProvider.translate('key')`
     # Pattern: languageProvider .translate ('key') (with optional whitespace/newlines)
     # We strip it to just 'key'
-    content = re.sub(r"languageProvider\s*\.translate\s*\(\s*(['\"])(.*?)\1\s*\)", r"\1\2\1", content, flags=re.DOTALL)
+    content = LANGUAGE_PROVIDER_TRANSLATE.apply(content, filepath)
 
     # 2. Handle multi-line `Provider.of<LanguageProvider>(context).translate('key')`
-    content = re.sub(r"Provider\.of<LanguageProvider>\s*\(.*?\)\s*\.translate\s*\(\s*(['\"])(.*?)\1\s*\)", r"\1\2\1", content, flags=re.DOTALL)
+    content = PROVIDER_OF_TRANSLATE.apply(content, filepath)
 
     # 3. Handle `lp.translate('key')` multi-line
-    content = re.sub(r"\blp\s*\.translate\s*\(\s*(['\"])(.*?)\1\s*\)", r"\1\2\1", content, flags=re.DOTALL)
+    content = LP_TRANSLATE.apply(content, filepath)
 
     # 4. Handle broken commented out blocks in revenue_analytics_screen.dart
     # Pattern: // child: Text(Provider.of<LanguageProvider>(context)
     #          .translate('key')))
     # Becomes: child: Text('key'),
     # This regex looks for the comment line followed by the .translate line
-    content = re.sub(
-        r"//\s*child:\s*Text\(Provider\.of<LanguageProvider>\(context\)\s*[\r\n]+\s*\.translate\((['\"])(.*?)\1\)\)\),?",
-        r"child: Text('\2'),",
-        content,
-        flags=re.IGNORECASE
-    )
-
     # 5. Handle `child: Text(Provider.of<LanguageProvider>(context).translate('key'))` (if not commented but split)
-    content = re.sub(
-        r"child:\s*Text\(Provider\.of<LanguageProvider>\(context\)\s*[\r\n]+\s*\.translate\((['\"])(.*?)\1\)\)",
-        r"child: Text('\2')",
-        content,
-        flags=re.IGNORECASE
-    )
+    content = CHILD_TEXT_TRANSLATE.apply(content, filepath)
 
     # 6. Clean up any remaining `Provider.of<LanguageProvider>(context)` imports or usages that might be standalone?
     # No, risky.
@@ -64,19 +85,14 @@ def fix_file(filepath):
     # -> `Builder(builder: (context) { final lp = null; ... })`? Messy.
     # Maybe `Consumer<Object>` is safer for now? Or `Consumer<dynamic>`?
     # `content = re.sub(r"Consumer<LanguageProvider>", "Consumer<dynamic>", content)`
-    
-    
-    if content != original_content:
-        print(f"Repaired {filepath}")
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
+
+    return content
+
+def fix_file(filepath):
+    fix_path(filepath, fix_content)
 
 def main():
-    root_dir = 'lib'
-    for root, dirs, files in os.walk(root_dir):
-        for file in files:
-            if file.endswith(".dart"):
-                fix_file(os.path.join(root, file))
+    run_pass(fix_content)
 
 if __name__ == "__main__":
     main()
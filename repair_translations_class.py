@@ -1,31 +1,38 @@
-import os
 import re
 
-def fix_file(filepath):
-    with open(filepath, 'r', encoding='utf-8') as f:
-        content = f.read()
+from repair_common import fix_path, run_pass
+from repair_rules import AnchoredRule, RegexRule, edit_rules
+
+TRANSLATIONS_IMPORT = RegexRule(
+    'repair_translations_class.translations_import',
+    r"import\s+['\"].*?utils/translations\.dart['\"];", "",
+    anchors=('import', 'utils/translations.dart'))
+TRANSLATIONS_TRANSLATE = AnchoredRule(
+    'repair_translations_class.translations_translate', 'Translations.translate(',
+    r"Translations\.translate\(\s*(['\"])(.*?)\1\s*,.*?\)", r"\1\2\1", re.DOTALL)
 
-    original_content = content
+# Analyzer codes these rules answer, for --diagnostics
+DIAGNOSTICS = {
+    'uri_does_not_exist': [TRANSLATIONS_IMPORT],
+    'undefined_identifier': [TRANSLATIONS_TRANSLATE],
+}
 
-    # 1. Remove import
-    content = re.sub(r"import\s+['\"].*?utils/translations\.dart['\"];", "", content)
+def fix_content(filepath, content):
+    return edit_rules([
+        # 1. Remove import
+        TRANSLATIONS_IMPORT,
 
-    # 2. Replace Translations.translate('key', ...) with 'key'
-    # Pattern: Translations.translate('key', anything)
-    # This might be multi-line
-    content = re.sub(r"Translations\.translate\(\s*(['\"])(.*?)\1\s*,.*?\)", r"\1\2\1", content, flags=re.DOTALL)
+        # 2. Replace Translations.translate('key', ...) with 'key'
+        # Pattern: Translations.translate('key', anything)
+        # This might be multi-line
+        TRANSLATIONS_TRANSLATE,
+    ], content, filepath)
 
-    if content != original_content:
-        print(f"Repaired {filepath}")
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
+def fix_file(filepath):
+    fix_path(filepath, fix_content)
 
 def main():
-    root_dir = 'lib'
-    for root, dirs, files in os.walk(root_dir):
-        for file in files:
-            if file.endswith(".dart"):
-                fix_file(os.path.join(root, file))
+    run_pass(fix_content)
 
 if __name__ == "__main__":
     main()
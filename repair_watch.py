@@ -0,0 +1,164 @@
+import ctypes
+import os
+import select
+import struct
+import sys
+import time
+
+# Change notification for --watch.
+#
+# On Linux the tree is watched through inotify (via ctypes, no extra
+# package): one watch per directory, and a saved file shows up as a single
+# event without anything being walked or stat'ed. Elsewhere, or if inotify
+# can't be set up, a poller compares the stat of every watched file at a
+# fixed interval. Either way, bursts of events are debounced: a batch is
+# handed out once nothing has changed for `debounce` seconds.
+
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE_SELF = 0x400
+IN_Q_OVERFLOW = 0x4000
+IN_ISDIR = 0x40000000
+
+_EVENT = struct.Struct('iIII')
+
+def _wanted(path, filepaths):
+    if filepaths is not None:
+        return os.path.normpath(path) in filepaths
+    return path.endswith('.dart')
+
+class PollingWatcher:
+    def __init__(self, root_dir, filepaths=None, interval=0.25):
+        self.root_dir = root_dir
+        self.filepaths = filepaths
+        self.interval = interval
+        self.stats = self._snapshot()
+
+    def _paths(self):
+        if self.filepaths is not None:
+            return [p for p in self.filepaths if os.path.exists(p)]
+        paths = []
+        for root, dirs, files in os.walk(self.root_dir):
+            paths.extend(os.path.join(root, f) for f in files if f.endswith('.dart'))
+        return paths
+
+    def _snapshot(self):
+        stats = {}
+        for path in self._paths():
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            stats[path] = (st.st_mtime_ns, st.st_size)
+        return stats
+
+    def poll(self, timeout):
+        # Changed or new files since the last call, waiting up to `timeout`
+        deadline = time.monotonic() + timeout
+        while True:
+            stats = self._snapshot()
+            changed = {p for p, st in stats.items() if self.stats.get(p) != st}
+            self.stats = stats
+            if changed or time.monotonic() >= deadline:
+                return changed
+            time.sleep(min(self.interval, max(0.0, deadline - time.monotonic())))
+
+    def close(self):
+        pass
+
+class InotifyWatcher:
+    MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF
+
+    def __init__(self, root_dir, filepaths=None):
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self.libc.inotify_init()
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init failed")
+        self.root_dir = root_dir
+        self.filepaths = filepaths
+        self.dirs = {}
+        self.pending = set()
+        if filepaths is not None:
+            for directory in sorted({os.path.dirname(p) for p in filepaths}):
+                if os.path.isdir(directory):
+                    self._add(directory)
+        else:
+            self._add_tree(root_dir)
+
+    def _add(self, directory):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK)
+        if wd >= 0:
+            self.dirs[wd] = directory
+
+    def _add_tree(self, directory):
+        for root, dirs, files in os.walk(directory):
+            self._add(root)
+            if root != directory:
+                # Files may have landed before the watch was in place
+                self.pending.update(os.path.join(root, f) for f in files
+                                    if _wanted(os.path.join(root, f), self.filepaths))
+
+    def poll(self, timeout):
+        changed, self.pending = self.pending, set()
+        if changed:
+            timeout = 0
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return changed
+        data = os.read(self.fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b'\0')
+            offset += _EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                raise OverflowError("inotify queue overflowed")
+            directory = self.dirs.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and self.filepaths is None:
+                    self._add_tree(path)
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO) and _wanted(path, self.filepaths):
+                changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+def make_watcher(root_dir, filepaths=None, interval=0.25):
+    if filepaths is not None:
+        filepaths = {os.path.normpath(p) for p in filepaths}
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(root_dir, filepaths)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(root_dir, filepaths, interval)
+
+def watch_batches(root_dir, filepaths=None, debounce=0.2, interval=0.25):
+    # Yields sorted lists of changed files forever, one per burst of saves
+    watcher = make_watcher(root_dir, filepaths, interval)
+    try:
+        while True:
+            try:
+                batch = watcher.poll(3600)
+                while batch:
+                    more = watcher.poll(debounce)
+                    if not more:
+                        break
+                    batch |= more
+            except OverflowError:
+                # Too many events to tell which files changed; fall back to
+                # a full snapshot comparison from here on
+                watcher.close()
+                watcher = PollingWatcher(root_dir, watcher.filepaths, interval)
+                watcher.stats = {}
+                continue
+            batch = sorted(p for p in batch if os.path.exists(p))
+            if batch:
+                yield batch
+    finally:
+        watcher.close()
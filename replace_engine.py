@@ -0,0 +1,61 @@
+import re
+
+# Single-pass multi-literal replacement for the UI text restore tables.
+#
+# The keys are compiled once into a trie-shaped alternation, e.g.
+# 'ab', 'abc', 'ad' -> a(?:b(?:c)?|d). Branches at each node start with
+# different characters so the engine never tries more than one of them, and
+# the optional tails are greedy, which gives leftmost-longest matches. The
+# cost of a scan depends on the file size and the longest key, not on how
+# many keys the table holds.
+
+def with_quote_variants(replacements, quotes="'\""):
+    # Expand each quoted key with its quote-flipped variant up front,
+    # e.g. "'route'" -> "'Route'" also gives '"route"' -> '"Route"'.
+    # Only keys opening with one of `quotes` get a variant; entries that are
+    # already in the table always win over generated ones.
+    table = {}
+    for key, value in replacements.items():
+        q = key[:1]
+        if q in quotes and len(key) > 1 and key.endswith(q):
+            other = '"' if q == "'" else "'"
+            table[other + key[1:-1] + other] = other + value[1:-1] + other
+    table.update(replacements)
+    return table
+
+def _node_pattern(node):
+    branches = [re.escape(ch) + _node_pattern(child)
+                for ch, child in sorted(node.items()) if ch]
+    if not branches:
+        return ''
+    if len(branches) == 1:
+        body = branches[0]
+    else:
+        body = '(?:' + '|'.join(branches) + ')'
+    if '' in node:
+        # A key ends here; prefer the longer keys below it when they match
+        return '(?:' + body + ')?'
+    return body
+
+def compile_keys(keys):
+    trie = {}
+    for key in keys:
+        node = trie
+        for ch in key:
+            node = node.setdefault(ch, {})
+        node[''] = True
+    return re.compile(_node_pattern(trie))
+
+class Replacer:
+    def __init__(self, replacements):
+        self.table = {k: v for k, v in replacements.items() if k}
+        self.pattern = compile_keys(self.table) if self.table else None
+
+    def subn(self, content):
+        if self.pattern is None:
+            return content, 0
+        table = self.table
+        return self.pattern.subn(lambda m: table[m.group()], content)
+
+    def sub(self, content):
+        return self.subn(content)[0]
@@ -1,5 +1,13 @@
 import os
 
+from arb_index import CatalogRule, catalog_paths
+from replace_engine import with_quote_variants
+from repair_common import fix_path, run_pass
+from repair_rules import TableRule
+
+# Keys only show up as plain literals once translate calls and comments are gone
+DEPENDS_ON = ['fix_translations', 'repair_comments', 'repair_final_syntax']
+
 # Map of raw key -> English text
 # We include quotes in the key to ensure we only replace string literals
 replacements = {
@@ -7,17 +15,9 @@ replacements = {
     "'route_management'": "'Route Management'",
     "'route_management_desc'": "'Manage your routes, trips, and bookings.'",
     "'add_new_trip'": "'Add New Trip'",
-    "'add_route'": "'Add Route'",
-    "'manage_routes'": "'Manage Routes'",
-    "'bookings'": "'Bookings'",
-    "'refunds'": "'Refunds'",
-    "'analytics'": "'Analytics'",
     "'app_feedback'": "'App Feedback'",
     "'find_routes'": "'Find Routes'",
-    "'select_date'": "'Select Date'",
     "'search_action'": "'Search'",
-    "'no_routes_found'": "'No Routes Found'",
-    "'adjust_filters'": "'Adjust filters to see results'",
     
     # Ticket Screen (some use double quotes in original)
     '"bulk_booking"': '"Bulk Booking"',
@@ -103,51 +103,35 @@ replacements = {
     # My dict above targets specific known keys. I will stick to exact matches.
 }
 
+def fix_content(filepath, content):
+    # Only screens under lib/views carry UI text
+    if not os.path.normpath(filepath).startswith(os.path.normpath('lib/views') + os.sep):
+        return content
+    return restore_text(content)
+
+# Built once: the table plus the single/double quote flipped variant of each
+# key, so inconsistent quoting in the screens is caught in the same scan
+REPLACEMENTS = TableRule('restore_ui_text.replacements', with_quote_variants(replacements))
+
+# Keys the ARB catalogs have are looked up there instead (see arb_index), so
+# a string added to app_en.arb is restored on every screen. The table above
+# only keeps provider keys the catalogs don't have, and wins over them. This
+# is the only pass that applies the catalog: it walks all of lib/views, the
+# home screen included.
+CATALOG = CatalogRule('restore_ui_text.arb_catalog')
+
+# Catalog edits must invalidate --incremental results for this pass
+CACHE_INPUTS = catalog_paths()
+
+def restore_text(content):
+    return CATALOG.apply(REPLACEMENTS.apply(content))
+
 def process_file(filepath):
-    with open(filepath, 'r') as f:
-        content = f.read()
-    
-    original = content
-    
-    for key, value in replacements.items():
-        content = content.replace(key, value)
-        
-    # Also try replacing single quoted versions of double quote keys and vice versa
-    # to catch inconsistencies
-    for key, value in replacements.items():
-        if key.startswith("'") and key.endswith("'"):
-            # Try double quote
-            dq_key = '"' + key[1:-1] + '"'
-            dq_val = '"' + value[1:-1] + '"'
-            content = content.replace(dq_key, dq_val)
-        elif key.startswith('"') and key.endswith('"'):
-             # Try single quote
-            sq_key = "'" + key[1:-1] + "'"
-            sq_val = "'" + value[1:-1] + "'"
-            content = content.replace(sq_key, sq_val)
-
-    if content != original:
-        with open(filepath, 'w') as f:
-            f.write(content)
-        print(f"Updated {filepath}")
+    fix_path(filepath, fix_content, "Updated {path}")
 
 def main():
-    target_files = [
-        'lib/views/admin/admin_dashboard.dart',
-        'lib/views/ticket/ticket_screen.dart',
-        'lib/views/admin/refunds/admin_refund_list.dart',
-        'lib/views/admin/refunds/admin_refund_details.dart',
-        'lib/views/admin/bookings/booking_details_screen.dart',
-        'lib/views/admin/analytics/admin_analytics_dashboard.dart',
-        'lib/views/booking/my_trips_stats_widget.dart',
-    ]
-
     # Walk lib views to catch others
-    for root, _, files in os.walk('lib/views'):
-        for file in files:
-            if file.endswith('.dart'):
-                path = os.path.join(root, file)
-                process_file(path)
+    run_pass(fix_content, "Updated {path}", root_dir='lib/views')
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,33 @@
+import json
+import os
+
+import arb_index
+from arb_index import CatalogRule, load_index
+
+def write_catalog(path, messages, tick=0):
+    path.write_text(json.dumps(messages), encoding='utf-8')
+    # Past the mtime of the previous version, however coarse the clock
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + tick * 1_000_000_000))
+
+def test_catalog_edit_is_seen_without_restarting(tmp_path, monkeypatch):
+    monkeypatch.setattr(arb_index, 'ARB_DIR', str(tmp_path))
+    catalog = tmp_path / 'app_en.arb'
+    cache_dir = str(tmp_path / 'cache')
+    write_catalog(catalog, {'addTrip': 'Add trip'})
+    assert load_index(cache_dir)["'addTrip'"] == "'Add trip'"
+    write_catalog(catalog, {'addTrip': 'Add a trip'}, tick=1)
+    assert load_index(cache_dir)["'addTrip'"] == "'Add a trip'"
+
+def test_rule_follows_the_catalog(tmp_path, monkeypatch):
+    # The rule loads the index from the default cache dir
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(arb_index, 'ARB_DIR', str(tmp_path))
+    catalog = tmp_path / 'app_en.arb'
+    rule = CatalogRule('test.catalog')
+    write_catalog(catalog, {'addTrip': 'Add trip'})
+    assert rule.apply("Text('addTrip')") == "Text('Add trip')"
+    assert not rule.may_match_bytes(b"Text('search')")
+    write_catalog(catalog, {'search': 'Search'}, tick=1)
+    assert rule.may_match_bytes(b"Text('search')")
+    assert rule.apply("Text('search')") == "Text('Search')"
@@ -0,0 +1,86 @@
+import migrate_calls
+from call_index import MigrationRule, calls_to, index_calls, note_manual
+from repair_common import run_passes
+from repair_rules import NOTICES
+
+SOURCE = """class Screen extends StatefulWidget {
+  final EnrichedTrip trip;
+  final fallback = Screen(trip: other);
+  const Screen({super.key, required this.trip});
+  Screen.empty() : this(trip: none());
+  Future<void> load(String id);
+
+  Widget build(BuildContext context) {
+    save(trip);
+    return ready ? Text('a') : Text('b');
+  }
+
+  int get count => size(trip);
+}
+
+void main() => run(Screen(trip: t));
+"""
+
+def declarations(content):
+    return {(site.callee, site.declaration) for site in index_calls(content)}
+
+def test_declarations_are_told_from_calls():
+    found = declarations(SOURCE)
+    # A constructor without a body, one with an initializer list, an
+    # abstract method, a method and a top-level function
+    for name in ['Screen', 'Screen.empty', 'load', 'build', 'main']:
+        assert (name, True) in found
+    # Calls, whatever follows them
+    for name in ['Screen', 'none', 'save', 'Text', 'size', 'run']:
+        assert (name, False) in found
+
+def test_field_initializer_is_a_call():
+    field, constructor, call = calls_to(SOURCE, 'Screen')
+    assert not field.declaration and constructor.declaration and not call.declaration
+    assert [arg.name for arg in field.args] == ['trip']
+
+def test_call_statement_and_ternary_are_calls():
+    content = "void f() {\n  save(1);\n  x = a ? g(1) : h(2);\n}\n"
+    assert {site.callee: site.declaration for site in index_calls(content)} == {
+        'f': True, 'save': False, 'g': False, 'h': False}
+
+RULE = MigrationRule('test.screen', 'Screen', rename={'tripId': 'trip'}, drop=['legacy'],
+                     retype={'trip': (r"t\.trip(?:Id)?", "t")})
+
+def test_migration_renames_retypes_and_drops():
+    content = "push(Screen( tripId: t.tripId, legacy: true));\npush(Screen(trip: t.trip));\n"
+    assert RULE.apply(content) == "push(Screen( trip: t));\npush(Screen(trip: t));\n"
+
+def test_migration_leaves_declarations_alone():
+    content = "class Screen {\n  const Screen({this.tripId, this.legacy});\n}\n"
+    assert RULE.apply(content) == content
+
+def test_unknown_expression_is_left_for_manual_migration():
+    content = "push(Screen(tripId: ride.tripId));\n"
+    assert RULE.apply(content) == content
+    (site, arg, why), = RULE.manual(content)
+    assert content[arg.value:arg.end] == 'ride.tripId'
+    note_manual('lib/a.dart', content, [RULE])
+    (message,) = NOTICES.take()
+    assert message.startswith('lib/a.dart:1:13: test.screen')
+
+def test_call_already_passing_the_new_name_is_left_for_manual_migration():
+    content = "push(Screen(tripId: t.tripId, trip: t));\n"
+    assert RULE.apply(content) == content
+    (site, arg, why), = RULE.manual(content)
+    assert arg.name == 'tripId' and why == "the call already passes `trip`"
+
+def test_manual_sites_are_reported_once_per_run(tmp_path, capsys):
+    path = tmp_path / 'lib' / 'a.dart'
+    path.parent.mkdir()
+    path.write_text("push(ConductorTripManagementScreen(tripId: ride.tripId));\n", encoding='utf-8')
+    # The pass running twice on the same file raises the same notice twice
+    passes = [('first', migrate_calls.fix_content), ('again', migrate_calls.fix_content)]
+    run_passes(passes, root_dir=str(tmp_path / 'lib'), argv=['--no-snapshot', '--no-prefilter'])
+    err = capsys.readouterr().err
+    assert err.count('not migrated') == 1
+
+def test_argument_already_renamed_is_left_as_it_is():
+    content = "push(Screen(trip: widget.trip));\n"
+    assert RULE.apply(content) == content
+    assert RULE.manual(content) == []
@@ -0,0 +1,59 @@
+import pytest
+
+import dart_lexer
+from dart_lexer import BLOCK_COMMENT, IDENT, STRING, UNTERMINATED_STRING, tokenize
+
+SOURCE = """import 'package:flutter/material.dart';
+
+class Card extends StatelessWidget {
+  @override
+  Widget build(BuildContext context) {
+    // child: Text('title'),
+    return Text("${count} items", style: const TextStyle(fontSize: 1.5e+2));
+  }
+}
+"""
+
+def fresh(content):
+    dart_lexer.clear_cache()
+    return tokenize(content)
+
+@pytest.mark.parametrize('old, new', [
+    ("    // child: Text('title'),\n", "    child: Text('title'),\n"),
+    ("1.5e+2", "1.5"),
+    ("fontSize: 1", "fontSize: 12"),
+    ('"${count} items"', '"${count} items'),
+    ("import", "/* import"),
+    ("}\n}\n", "}\n"),
+])
+def test_relexed_tokens_match_a_fresh_lex(old, new):
+    edited = SOURCE.replace(old, new, 1)
+    assert edited != SOURCE
+    expected = fresh(edited)
+    dart_lexer.clear_cache()
+    tokenize(SOURCE)
+    assert tokenize(edited) == expected
+
+def test_edits_far_apart_are_relexed_like_a_fresh_lex():
+    old = SOURCE * 8
+    new = old.replace("'title'", "AppLocalizations.of(context)!.title").replace("1.5e+2", "15")
+    expected = fresh(new)
+    dart_lexer.clear_cache()
+    tokenize(old)
+    assert tokenize(new) == expected
+
+@pytest.mark.parametrize('content, kind', [
+    (r"r'a\' x", STRING),
+    ("'''it's''' x", STRING),
+    ("/* a /* b */ c */ x", BLOCK_COMMENT),
+    ("'${f(x)} ${y}' x", STRING),
+    (r"'$a \'' x", STRING),
+])
+def test_literal_is_one_token_however_it_is_lexed(content, kind):
+    assert [token.kind for token in fresh(content)] == [kind, IDENT]
+
+def test_strings_are_single_tokens():
+    content = "x = 'a ${b + '}'} c'; y = 'open\n"
+    kinds = [token.kind for token in fresh(content)]
+    assert kinds.count(STRING) == 1
+    assert kinds[-1] == UNTERMINATED_STRING
@@ -0,0 +1,80 @@
+import sys
+import types
+
+import dart_validate
+from dart_validate import check, guard, introduced
+from repair_rules import Edit, EditConflict
+
+BROKEN = "Column(children: [\n  Text(\n    // 'title'),\n]);\n"
+
+def test_sound_file_has_no_problems():
+    assert check("Text('a (', style: s[0]);\n") == ()
+
+def test_swallowed_closer_is_named():
+    problem, = check(BROKEN)
+    assert (problem.line, problem.col) == (2, 7)
+    assert problem.message.endswith("the comment at 3:5 swallows `)`")
+
+def test_rewrite_that_fixes_a_broken_file_is_kept():
+    fixed = BROKEN.replace("// 'title'", "'title'")
+    assert len(check(BROKEN)) > len(check(fixed))
+    assert introduced(BROKEN, fixed) == []
+
+def test_rewrite_that_breaks_a_broken_file_further_is_rejected():
+    # Already broken, so the old check (reject only if the input was sound)
+    # let this through
+    worse = BROKEN + "Text(\n"
+    assert check(BROKEN)
+    assert introduced(BROKEN, worse)
+
+def test_rewrite_that_breaks_a_sound_file_is_rejected():
+    assert introduced("f(a);\n", "f(a;\n")
+
+def test_guard_keeps_the_input_of_a_rejected_pass(capsys):
+    def unbalance(filepath, content):
+        return content + "Text(\n"
+
+    assert guard('unbalance', unbalance, 'a.dart', BROKEN) == BROKEN
+    assert 'unbalance rewrite rejected' in capsys.readouterr().err
+
+def test_guard_keeps_the_input_on_edit_conflicts(capsys):
+    def conflicting(filepath, content):
+        raise EditConflict(Edit(0, 3, '', 'a'), Edit(1, 2, '', 'b'))
+
+    assert guard('conflicting', conflicting, 'a.dart', BROKEN) == BROKEN
+    assert 'both rewrite this text' in capsys.readouterr().err
+
+def test_chained_passes_are_not_guarded_again(monkeypatch):
+    # repair_all's scheduler guards each pass it runs; the chain as a whole
+    # is passed through without being checked a second time
+    module = types.ModuleType('fake_chain')
+    module.PASSES = []
+
+    def repair_content(filepath, content):
+        return content + "Text(\n"
+
+    repair_content.__module__ = module.__name__
+    monkeypatch.setitem(sys.modules, module.__name__, module)
+    calls = []
+    monkeypatch.setattr(dart_validate, 'introduced', lambda *args: calls.append(args) or [])
+    assert guard('repair_all', repair_content, 'a.dart', BROKEN) == BROKEN + "Text(\n"
+    assert calls == []
+
+def test_rewrite_that_trades_one_problem_for_another_is_rejected(capsys):
+    # Fixes the `(` of f and breaks the one of g: as many problems as before
+    old = "f(a;\ng(b);\n"
+    new = "f(a);\ng(b;\n"
+    assert len(check(old)) == len(check(new))
+    (problem,) = introduced(old, new)
+    assert (problem.line, problem.col) == (2, 2)
+
+    def trade(filepath, content):
+        return new
+
+    assert guard('trade', trade, 'a.dart', old) == old
+    assert 'a.dart:2:2: trade rewrite rejected' in capsys.readouterr().err
+
+def test_problem_moved_by_an_edit_before_it_is_not_new():
+    old = "x;\nf(a;\n"
+    new = "longer(x);\nf(a;\n"
+    assert introduced(old, new) == []
@@ -0,0 +1,99 @@
+import json
+
+from extract_strings import Catalog, find_literals, key_for, rewrite
+
+def test_key_is_made_of_the_first_words():
+    assert key_for("Seats for {route} today, all aboard") == 'seatsForTodayAll'
+    assert key_for("Step 2") == 'step2'
+    assert key_for("Version 1.0.0") == 'version100'
+    assert key_for("Continue") == 'continueText'
+
+def test_message_with_no_words_has_no_key():
+    # Currency codes, sample numbers and single letters aren't words
+    for message in ["LKR {price}", "{hours}h {minutes}m", "e.g. 15", "°C", "07xxxxxxxx or 947xxxxxxxx", "12"]:
+        assert key_for(message) is None
+
+def catalog(tmp_path, messages):
+    path = tmp_path / 'app_en.arb'
+    path.write_text(json.dumps(messages, indent=4) + '\n', encoding='utf-8')
+    return Catalog(str(path))
+
+def test_catalog_reuses_keys_of_identical_messages(tmp_path):
+    messages = catalog(tmp_path, {'cancel': 'Cancel'})
+    assert messages.key('Cancel', []) == 'cancel'
+    assert messages.key('Save changes', []) == 'saveChanges'
+    assert messages.key('Save changes', []) == 'saveChanges'
+    assert list(messages.added) == ['saveChanges']
+
+def test_case_variants_keep_their_own_text(tmp_path):
+    messages = catalog(tmp_path, {'exit': 'EXIT'})
+    assert messages.key('Exit', []) == 'exit2'
+    assert messages.key('TOTAL PRICE', []) == 'totalPrice'
+    assert messages.key('Total Price', []) == 'totalPrice2'
+    assert messages.added == {'exit2': ('Exit', []), 'totalPrice': ('TOTAL PRICE', []),
+                              'totalPrice2': ('Total Price', [])}
+
+def test_catalog_numbers_clashing_keys(tmp_path):
+    messages = catalog(tmp_path, {'logout': 'Log Out'})
+    assert messages.key('Logout', []) == 'logout2'
+    assert messages.key('Via {via}', ['via']) == 'via'
+    assert messages.key('Via {value}', ['value']) == 'via2'
+    assert messages.key('LKR {price}', ['price']) is None
+
+def test_catalog_write_appends_entries(tmp_path):
+    messages = catalog(tmp_path, {'cancel': 'Cancel'})
+    messages.key('Seats for {route}', ['route'])
+    messages.write()
+    assert json.loads((tmp_path / 'app_en.arb').read_text(encoding='utf-8')) == {
+        'cancel': 'Cancel', 'seatsFor': 'Seats for {route}', '@seatsFor': {'placeholders': {'route': {}}}}
+
+APP = """class App extends StatelessWidget {
+  Widget build(BuildContext context) {
+    if (!ready) {
+      return MaterialApp(home: Scaffold(body: const Text('Starting up')));
+    }
+    return MaterialApp(
+      title: 'BusLink',
+      localizationsDelegates: const [AppLocalizations.delegate],
+      home: Scaffold(body: Text('Welcome back')),
+      routes: {'/': (context) => Scaffold(body: Text('Pick a route'))},
+    );
+  }
+}
+"""
+
+def messages(content):
+    found, skipped = find_literals(content)
+    return [literal.message for literal in found], {literal.text: literal.reason for literal in skipped}
+
+def test_literals_without_localizations_above_are_left_alone():
+    found, skipped = messages(APP)
+    assert found == ['BusLink', 'Pick a route']
+    assert skipped == {"'Starting up'": "no Localizations above its context",
+                       "'Welcome back'": "no Localizations above its context"}
+
+def test_app_title_becomes_on_generate_title(tmp_path):
+    found, _ = find_literals(APP)
+    new_content = rewrite(APP, found, catalog(tmp_path, {'appTitle': 'BusLink'}))
+    assert "onGenerateTitle: (context) => AppLocalizations.of(context)!.appTitle," in new_content
+    assert "Text(AppLocalizations.of(context)!.pickARoute)" in new_content
+
+def test_only_widget_build_methods_are_extracted():
+    content = """class AuthService {
+  void fail(BuildContext context) => show(SnackBar(content: Text('Sign in failed')));
+}
+
+class Card extends StatelessWidget {
+  Widget _row(BuildContext context) => Text('Seat map');
+  Widget _plain() => Text('Unknown context');
+  Widget build(BuildContext context) => Column(children: [Text('Your trips'), _row(context)]);
+}
+
+class _ScreenState extends State<Screen> {
+  Widget _header() => Text('Upcoming');
+  void _save() => show(Text('Saved'));
+}
+"""
+    found, skipped = messages(content)
+    assert found == ['Seat map', 'Your trips', 'Upcoming']
+    assert set(skipped) == {"'Sign in failed'", "'Unknown context'", "'Saved'"}
@@ -0,0 +1,42 @@
+import time
+
+import pytest
+
+import repair_common
+from repair_common import run_passes
+
+def slow(filepath, content):
+    time.sleep(0.5)
+    return content.replace('broken', 'fixed')
+
+def quick(filepath, content):
+    return content.replace('broken', 'fixed')
+
+def run(tmp_path, fix_content, *options):
+    run_passes([('fix', fix_content)], root_dir=str(tmp_path / 'lib'),
+               argv=['--budget', '0.2', '--no-snapshot', '--cache-dir', str(tmp_path / 'cache'), *options])
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'lib' / 'a.dart'
+    path.parent.mkdir()
+    path.write_text('broken\n', encoding='utf-8')
+    return path
+
+@pytest.mark.parametrize('options', [[], ['--incremental']])
+def test_file_out_of_time_is_left_unchanged(tmp_path, source, capsys, options):
+    run(tmp_path, slow, *options)
+    assert source.read_text(encoding='utf-8') == 'broken\n'
+    assert 'left unchanged' in capsys.readouterr().err
+
+@pytest.mark.parametrize('options', [[], ['--incremental']])
+def test_budget_never_interrupts_the_write(tmp_path, source, monkeypatch, options):
+    write_file = repair_common.write_file
+
+    def slow_write(filepath, content):
+        time.sleep(0.4)
+        write_file(filepath, content)
+
+    monkeypatch.setattr(repair_common, 'write_file', slow_write)
+    run(tmp_path, quick, *options)
+    assert source.read_text(encoding='utf-8') == 'fixed\n'
@@ -0,0 +1,78 @@
+import importlib
+import os
+import sys
+
+from repair_cache import RepairCache, apply_passes_cached, content_hash, pass_fingerprint
+from repair_common import run_passes
+
+CALLS = []
+
+def fix_content(filepath, content):
+    CALLS.append(filepath)
+    return content.replace('broken', 'fixed')
+
+def run(tmp_path):
+    CALLS.clear()
+    run_passes([('fix', fix_content)], root_dir=str(tmp_path / 'lib'),
+               argv=['--incremental', '--no-snapshot', '--cache-dir', str(tmp_path / 'cache')])
+    return list(CALLS)
+
+def write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding='utf-8')
+
+def test_new_fingerprint_drops_only_that_pass(tmp_path):
+    cache = RepairCache(str(tmp_path))
+    cache.results('a', 'fp1')['in'] = 'out'
+    cache.results('b', 'fp1')['in'] = 'out'
+    assert cache.results('a', 'fp2') == {}
+    assert cache.results('b', 'fp1') == {'in': 'out'}
+    assert cache.dropped
+
+def test_results_survive_a_reload(tmp_path):
+    cache = RepairCache(str(tmp_path))
+    passes = [('fix', 'fp', fix_content)]
+    content, digest, new_results = apply_passes_cached('a.dart', 'broken', passes, cache)
+    cache.merge(new_results)
+    cache.save()
+    assert (content, digest) == ('fixed', content_hash('fixed'))
+
+    CALLS.clear()
+    again = RepairCache(str(tmp_path))
+    assert apply_passes_cached('a.dart', 'broken', passes, again)[:2] == ('fixed', digest)
+    assert CALLS == []
+
+def test_unchanged_files_are_not_reprocessed(tmp_path):
+    write(tmp_path / 'lib' / 'a.dart', 'broken\n')
+    write(tmp_path / 'lib' / 'b.dart', 'clean\n')
+    assert len(run(tmp_path)) == 2
+    assert (tmp_path / 'lib' / 'a.dart').read_text(encoding='utf-8') == 'fixed\n'
+    # The file the first run rewrote is recorded clean as well
+    assert run(tmp_path) == []
+
+def test_edited_file_is_reprocessed(tmp_path):
+    write(tmp_path / 'lib' / 'a.dart', 'clean\n')
+    write(tmp_path / 'lib' / 'b.dart', 'clean\n')
+    run(tmp_path)
+    path = tmp_path / 'lib' / 'b.dart'
+    write(path, 'broken again\n')
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert run(tmp_path) == [str(path)]
+    assert path.read_text(encoding='utf-8') == 'fixed again\n'
+
+def test_editing_a_module_the_pass_reaches_indirectly_changes_its_fingerprint(tmp_path, monkeypatch):
+    # pass -> engine (imported for one name) -> lexer, a module the pass
+    # never names itself
+    write(tmp_path / 'fake_pass.py', "from fake_engine import apply\n\ndef fix_content(filepath, content):\n"
+                                     "    return apply(content)\n")
+    write(tmp_path / 'fake_engine.py', "import fake_lexer\n\ndef apply(content):\n"
+                                       "    return fake_lexer.lex(content)\n")
+    write(tmp_path / 'fake_lexer.py', "def lex(content):\n    return content\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    for name in ['fake_pass', 'fake_engine', 'fake_lexer']:
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    fix = importlib.import_module('fake_pass').fix_content
+    before = pass_fingerprint('fake', fix)
+    write(tmp_path / 'fake_lexer.py', "def lex(content):\n    return content.strip()\n")
+    assert pass_fingerprint('fake', fix) != before
@@ -0,0 +1,37 @@
+import subprocess
+
+import pytest
+
+from repair_common import run_passes
+from repair_git import git, write_blobs
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    git('init', '-q')
+    (tmp_path / 'lib').mkdir()
+    for name in ('a', 'b', 'c'):
+        (tmp_path / 'lib' / f'{name}.dart').write_text(f'broken {name}\n', encoding='utf-8')
+    git('add', 'lib')
+    return tmp_path
+
+def test_write_blobs_stores_every_content_in_order(repo):
+    contents = [b'one\n', b'two\r\n', b'']
+    blobs = write_blobs(contents)
+    assert blobs == [git('hash-object', '--stdin', input=data).decode().strip() for data in contents]
+    assert [git('cat-file', 'blob', blob) for blob in blobs] == contents
+    assert write_blobs([]) == []
+
+def test_staged_run_stages_every_repaired_file(repo, monkeypatch):
+    calls = []
+    real_run = subprocess.run
+    monkeypatch.setattr(subprocess, 'run', lambda args, **kwargs: calls.append(args[1]) or real_run(args, **kwargs))
+
+    def fix(filepath, content):
+        return content.replace('broken', 'fixed')
+
+    run_passes([('fix', fix)], root_dir='lib', argv=['--staged', '--no-snapshot'])
+    for name in ('a', 'b', 'c'):
+        assert git('show', f':lib/{name}.dart') == f'fixed {name}\n'.encode()
+        assert (repo / 'lib' / f'{name}.dart').read_text(encoding='utf-8') == f'broken {name}\n'
+    assert calls.count('hash-object') == 1
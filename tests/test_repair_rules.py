@@ -0,0 +1,45 @@
+import pytest
+
+import repair_comments
+from repair_rules import Edit, EditConflict, LiteralRule, RegexRule, Rule, apply_edits, edit_rules
+
+def test_rule_without_edits_fails_when_instantiated():
+    class Incomplete(Rule):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete('incomplete')
+
+def test_edits_are_applied_in_offset_order():
+    edits = [Edit(4, 5, 'X', 'b'), Edit(0, 1, 'Y', 'a')]
+    assert apply_edits('abcdefg', edits) == 'YbcdXfg'
+
+def test_overlapping_edits_conflict():
+    with pytest.raises(EditConflict) as e:
+        apply_edits('abcdefg', [Edit(0, 3, '', 'a'), Edit(2, 4, '', 'b')])
+    assert {e.value.first.rule, e.value.second.rule} == {'a', 'b'}
+
+def test_insertions_at_the_same_offset_conflict():
+    with pytest.raises(EditConflict):
+        apply_edits('abc', [Edit(1, 1, 'x', 'a'), Edit(1, 1, 'y', 'b')])
+
+def test_edit_rules_match_the_same_text():
+    rules = [LiteralRule('a', 'foo', 'bar'), RegexRule('b', r"ba+z", 'quux')]
+    # `bar` from the first rule is not seen by the second one
+    assert edit_rules(rules, 'foo baaz') == 'bar quux'
+
+def test_edit_rules_refuse_rules_rewriting_the_same_text():
+    rules = [LiteralRule('a', 'foo(', 'bar('), RegexRule('b', r"o\(", 'x(')]
+    with pytest.raises(EditConflict):
+        edit_rules(rules, 'foo(1)')
+
+def test_commented_string_is_restored_in_a_text_uncommented_first():
+    # The admin_booking_list pattern: TEXT_COMMENTED_STRING only matches on
+    # the `Text(` CHILD_TEXT uncomments, so it needs a second round
+    content = ("            // child: Text(\n"
+               "              // 'status_$s'\n"
+               "                  .toUpperCase(),\n"
+               "            ),\n")
+    assert repair_comments.fix_content('lib/views/admin/admin_booking_list.dart', content) == (
+        "            child: Text('status_$s'.toUpperCase(),\n"
+        "            ),\n")
@@ -0,0 +1,84 @@
+import sys
+import types
+
+import pytest
+
+from repair_schedule import converge, order_passes
+
+def make_pass(monkeypatch, name, rewrite, depends_on=(), calls=None):
+    # A pass living in a module of its own, as the repair passes do, so
+    # DEPENDS_ON can be read off it
+    module = types.ModuleType(f'fake_{name}')
+    module.DEPENDS_ON = list(depends_on)
+
+    def fix_content(filepath, content):
+        if calls is not None:
+            calls.append(name)
+        return rewrite(content)
+
+    fix_content.__module__ = module.__name__
+    monkeypatch.setitem(sys.modules, module.__name__, module)
+    return name, fix_content
+
+def test_dependencies_run_first(monkeypatch):
+    first = make_pass(monkeypatch, 'first', str.upper)
+    second = make_pass(monkeypatch, 'second', str.upper, depends_on=['first'])
+    assert [name for name, _ in order_passes([second, first])] == ['first', 'second']
+
+def test_cycle_is_rejected(monkeypatch):
+    a = make_pass(monkeypatch, 'a', str.upper, depends_on=['b'])
+    b = make_pass(monkeypatch, 'b', str.upper, depends_on=['a'])
+    with pytest.raises(ValueError):
+        order_passes([a, b])
+
+def test_ordered_passes_check_the_fixed_point(monkeypatch):
+    calls = []
+    passes = order_passes([
+        make_pass(monkeypatch, 'translations', lambda c: c.replace('tr(x)', 'x'), calls=calls),
+        make_pass(monkeypatch, 'comments', lambda c: c.replace('// x', 'x'), ['translations'], calls),
+        make_pass(monkeypatch, 'text', lambda c: c.replace('x', 'X'), ['comments'], calls),
+    ])
+    # Every pass changed the file, so each runs once more on the result
+    assert converge('a.dart', 'tr(x) // x', passes) == ('X X', 2, 'converged')
+    assert calls == ['translations', 'comments', 'text'] * 2
+
+def test_untouched_file_takes_one_sweep(monkeypatch):
+    calls = []
+    passes = [make_pass(monkeypatch, 'text', lambda c: c.replace('x', 'X'), calls=calls)]
+    assert converge('a.dart', 'done', passes) == ('done', 1, 'converged')
+    assert calls == ['text']
+
+def test_pass_needing_two_applications_runs_until_stable(monkeypatch):
+    calls = []
+    # Strips one layer of brackets at a time
+    unwrap = make_pass(monkeypatch, 'unwrap', lambda c: c[1:-1] if c.startswith('[[') else c, calls=calls)
+    assert converge('a.dart', '[[[x]]]', [unwrap]) == ('[x]', 3, 'converged')
+    assert calls == ['unwrap'] * 3
+
+def test_pass_before_its_dependency_runs_again(monkeypatch):
+    calls = []
+    # Out of dependency order: `text` leaves commented-out code alone, so it
+    # only rewrites the `x` in the second sweep
+    passes = [
+        make_pass(monkeypatch, 'text', lambda c: c if '//' in c else c.replace('x', 'X'), ['comments'], calls),
+        make_pass(monkeypatch, 'comments', lambda c: c.replace('// x', 'x'), calls=calls),
+    ]
+    assert converge('a.dart', '// x', passes) == ('X', 3, 'converged')
+    assert calls == ['text', 'comments', 'text', 'comments', 'text']
+
+def test_oscillation_is_detected(monkeypatch):
+    # Two passes that undo each other bring the file back to where it was
+    passes = [
+        make_pass(monkeypatch, 'quote', lambda c: c.replace('"', "'"), ['unquote']),
+        make_pass(monkeypatch, 'unquote', lambda c: c.replace("'", '"'), ['quote']),
+    ]
+    content, rounds, status = converge('a.dart', "'a'", passes)
+    assert status == 'oscillating'
+    assert rounds < 10
+
+def test_rounds_are_capped(monkeypatch):
+    passes = [
+        make_pass(monkeypatch, 'grow', lambda c: c + 'x', ['shrink']),
+        make_pass(monkeypatch, 'shrink', lambda c: c[1:], ['grow']),
+    ]
+    assert converge('a.dart', 'abc', passes, max_rounds=3)[1:] == (3, 'capped')
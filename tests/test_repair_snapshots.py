@@ -0,0 +1,33 @@
+import os
+
+from repair_snapshots import SnapshotStore, file_digest, record_run, snapshot_file
+
+def rewrite_in_run(tmp_path, monkeypatch):
+    # A run started from the project dir that rewrote lib/a.dart
+    project = tmp_path / 'project'
+    (project / 'lib').mkdir(parents=True)
+    (project / 'lib' / 'a.dart').write_text('broken\n', encoding='utf-8')
+    snapshots = str(tmp_path / 'snapshots')
+    monkeypatch.chdir(project)
+    before = snapshot_file(snapshots, 'lib/a.dart')
+    (project / 'lib' / 'a.dart').write_text('fixed\n', encoding='utf-8')
+    record_run(snapshots, 'run', {'lib/a.dart': [before, file_digest('lib/a.dart')]})
+    return project, SnapshotStore(snapshots)
+
+def test_rollback_restores_the_files_of_a_run(tmp_path, monkeypatch):
+    project, store = rewrite_in_run(tmp_path, monkeypatch)
+    assert store.rollback('run') == (['lib/a.dart'], [])
+    assert (project / 'lib' / 'a.dart').read_text(encoding='utf-8') == 'broken\n'
+
+def test_rollback_from_another_directory(tmp_path, monkeypatch):
+    project, store = rewrite_in_run(tmp_path, monkeypatch)
+    monkeypatch.chdir(tmp_path)
+    assert store.rollback('run') == (['lib/a.dart'], [])
+    assert (project / 'lib' / 'a.dart').read_text(encoding='utf-8') == 'broken\n'
+    assert not os.path.exists(tmp_path / 'lib')
+
+def test_file_edited_since_the_run_is_left_alone(tmp_path, monkeypatch):
+    project, store = rewrite_in_run(tmp_path, monkeypatch)
+    (project / 'lib' / 'a.dart').write_text('edited\n', encoding='utf-8')
+    assert store.rollback('run') == ([], ['lib/a.dart'])
+    assert (project / 'lib' / 'a.dart').read_text(encoding='utf-8') == 'edited\n'